@@ -8,12 +8,16 @@ import sys
 import time
 from typing import Optional
 
+import midi_recorder
+import midi_trace
 from configuration import load_config
 from ledbar import LedBar
 from services_common import (
     LoggerWriter,
     configure_logging,
     create_state_manager,
+    install_latency_signal,
+    install_trace_signal,
     setup_child_logger,
 )
 from mouse_ipc import MouseCommandServer
@@ -181,8 +185,17 @@ def _run_gui_helpers(config, args, logger, vnc_logger, mouse_logger) -> None:
         enable_midi_io=True,
         pianoteq_config=config.pianoteq,
         pedals_config=config.pedals,
+        listener_mode=config.midi.listener_mode,
+        hotplug=config.midi.hotplug,
+        latency_stats=config.midi.latency_stats,
+        config_reload=config.config_reload,
         parent_logger=logger,
     )
+    install_latency_signal(state_manager)
+    midi_trace.enable(config.midi.trace_size)
+    install_trace_signal(logger)
+    if config.midi.record_file:
+        midi_recorder.start_recording(config.midi.record_file)
 
     app = QtWidgets.QApplication(sys.argv)
 
@@ -210,6 +223,8 @@ def _run_gui_helpers(config, args, logger, vnc_logger, mouse_logger) -> None:
         led_bar.close()
         state_manager.set_ledbar(None)
         mouse_server.stop()
+        state_manager.log_latency_report()
+        midi_recorder.stop_recording()
 
 
 if __name__ == "__main__":
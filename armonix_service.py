@@ -8,8 +8,7 @@ import sys
 import time
 from typing import Optional
 
-from configuration import load_config
-from services_common import LoggerWriter, configure_logging, create_state_manager
+import startup_profile
 from version import __version__ as ARMONIX_VERSION
 
 
@@ -18,6 +17,23 @@ def main(argv: Optional[list[str]] = None) -> None:
 
     if argv is None:
         argv = sys.argv[1:]
+    if "--profile-startup" in argv:
+        startup_profile.enable()
+
+    # Import differiti: con --profile-startup vengono cronometrati anche
+    # statemanager, i filtri e le loro dipendenze.
+    import midi_recorder
+    import midi_trace
+    from configuration import load_config
+    from services_common import (
+        LoggerWriter,
+        configure_logging,
+        create_state_manager,
+        install_latency_signal,
+        install_trace_signal,
+    )
+
+    startup_profile.mark("import moduli")
 
     base_parser = argparse.ArgumentParser(add_help=False)
     base_parser.add_argument(
@@ -63,6 +79,13 @@ def main(argv: Optional[list[str]] = None) -> None:
         help=argparse.SUPPRESS,
     )
 
+    parser.add_argument(
+        "--profile-startup",
+        dest="profile_startup",
+        action="store_true",
+        help="Print per-phase and per-import startup timings. / Stampa i tempi di avvio per fase e per import.",
+    )
+
     parser.set_defaults(
         verbose=config.verbose,
         master=config.master,
@@ -71,6 +94,7 @@ def main(argv: Optional[list[str]] = None) -> None:
     )
 
     args = parser.parse_args(remaining)
+    startup_profile.mark("configurazione")
 
     logger = configure_logging(args.verbose)
 
@@ -89,6 +113,7 @@ def main(argv: Optional[list[str]] = None) -> None:
         args.config,
         args.master,
     )
+    startup_profile.mark("logging")
 
     state_manager = create_state_manager(
         verbose=args.verbose,
@@ -101,8 +126,24 @@ def main(argv: Optional[list[str]] = None) -> None:
         enable_midi_io=True,
         pianoteq_config=config.pianoteq,
         pedals_config=config.pedals,
+        listener_mode=config.midi.listener_mode,
+        hotplug=config.midi.hotplug,
+        latency_stats=config.midi.latency_stats,
+        config_reload=config.config_reload,
         parent_logger=logger,
     )
+    startup_profile.mark("StateManager e filtri")
+    install_latency_signal(state_manager)
+    midi_trace.enable(config.midi.trace_size)
+    install_trace_signal(logger)
+    if config.midi.record_file:
+        midi_recorder.start_recording(config.midi.record_file)
+    startup_profile.mark("segnali e traccia")
+    if startup_profile.is_enabled():
+        # stdout/stderr sono già rediretti verso il log.
+        for line in startup_profile.report():
+            print(line, file=sys.__stderr__)
+        sys.__stderr__.flush()
 
     try:
         logger.info("Headless mode active. / Modalità headless attiva.")
@@ -112,7 +153,8 @@ def main(argv: Optional[list[str]] = None) -> None:
         logger.info("Shutdown requested by user. / Arresto richiesto dall'utente.")
     finally:
         # The state manager threads terminate automatically on exit. / I thread del state manager terminano automaticamente all'uscita.
-        pass
+        state_manager.log_latency_report()
+        midi_recorder.stop_recording()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,13 @@
+"""Benchmark dei filtri MIDI di Armonix senza hardware.
+
+Uso::
+
+    python -m benchmarks                 # esegue tutti gli scenari
+    python -m benchmarks -k launchkey    # solo gli scenari che contengono "launchkey"
+    python -m benchmarks --save base     # salva benchmarks/baselines/base.json
+    python -m benchmarks --compare base  # confronta con una baseline salvata
+
+Ogni scenario invia uno stream sintetico (note, pad, fader, pedale...) a una
+funzione del percorso critico tramite porte finte e riporta messaggi al
+secondo e microsecondi per chiamata.
+"""
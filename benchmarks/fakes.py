@@ -0,0 +1,72 @@
+"""Porte e StateManager finti usati dagli scenari di benchmark."""
+
+import logging
+
+from configuration import PianoteqConfig
+
+
+class FakePort:
+    """Porta di uscita che conta i messaggi invece di inviarli."""
+
+    name = "fake"
+
+    def __init__(self):
+        self.count = 0
+
+    def send(self, msg):
+        self.count += 1
+
+    def send_bytes(self, data):
+        self.count += 1
+
+
+class FakeStateManager:
+    """Sottoinsieme di :class:`statemanager.StateManager` letto dai filtri."""
+
+    def __init__(self, pianoteq_mode=None, octave_shift=0):
+        self.verbose = False
+        self.state = "ready"
+        self.ketron_port = "fake"
+        self.disable_realtime_display = True
+        self.listener_mode = "poll"
+        self.pianoteq_config = PianoteqConfig()
+        self.pianoteq_mode = pianoteq_mode
+        self.pianoteq_octave_shift = octave_shift
+        self.logger = logging.getLogger("armonix.benchmark")
+        self.ketron_out = FakePort()
+
+    def get_ketron_output(self):
+        return self.ketron_out
+
+    def set_pianoteq_mode(self, mode, octave_shift=0):
+        self.pianoteq_mode = None if mode == self.pianoteq_mode else mode
+        return self.pianoteq_mode
+
+    def load_pianoteq_preset(self, preset_name):
+        pass
+
+    def system_pause_on(self):
+        pass
+
+    def system_pause_off(self):
+        pass
+
+    def find_port(self, keyword):
+        return None
+
+    def find_output_port(self, keyword):
+        return None
+
+
+class PedalState:
+    """Oggetto minimo su cui chiamare ``StateManager._build_pedal_msgs``."""
+
+    def __init__(self):
+        from statemanager import StateManager
+
+        self.logger = logging.getLogger("armonix.benchmark")
+        self._pedal_midi_cfg = StateManager._load_pedal_midi_config(self)
+        self._build = StateManager._build_pedal_msgs
+
+    def build(self, pedal_key, value, dest):
+        return self._build(self, pedal_key, value, dest)
@@ -0,0 +1,282 @@
+"""Scenari di benchmark ed esecuzione da riga di comando."""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import time
+
+from benchmarks import streams
+from benchmarks.fakes import FakePort, FakeStateManager, PedalState
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+
+PIANOTEQ_MODES = (None, "full", "full-solo", "split", "split-solo")
+
+# Ogni scenario restituisce (elementi, funzione da chiamare per elemento).
+SCENARIOS = {}
+
+
+def scenario(name):
+    def register(func):
+        SCENARIOS[name] = func
+        return func
+    return register
+
+
+# --- Fantom ---------------------------------------------------------------
+
+def _fantom(items):
+    import fantom_midi_filter as fantom
+
+    out = FakePort()
+    sm = FakeStateManager()
+    filt = fantom.filter_and_translate_msg
+    return items, lambda msg: filt(msg, out, sm)
+
+
+@scenario("fantom/note_flood")
+def _fantom_note_flood():
+    return _fantom(streams.note_flood())
+
+
+@scenario("fantom/aftertouch")
+def _fantom_aftertouch():
+    return _fantom(streams.aftertouch_stream())
+
+
+@scenario("fantom/slider_sweep")
+def _fantom_sliders():
+    return _fantom(streams.cc_sweep(range(0x15, 0x26), channel=1))
+
+
+@scenario("fantom/footswitch_notes")
+def _fantom_footswitch():
+    msgs = []
+    for velocity in (1, 2, 3):
+        for msg in streams.pad_hits(range(0, 128, 4), channel=1, repeat=2):
+            msgs.append(msg.copy(velocity=velocity) if msg.type == "note_on" else msg)
+    return _fantom(msgs)
+
+
+@scenario("fantom/program_change")
+def _fantom_program_change():
+    import fantom_midi_filter as fantom
+
+    triplets = sorted(fantom.program_change_mapping()) or [(85, 0, 0)]
+    return _fantom(streams.fantom_program_changes(triplets))
+
+
+# --- Launchkey porta master -------------------------------------------------
+
+def _launchkey_master(items, pianoteq_mode=None):
+    import launchkey_midi_filter as launchkey
+
+    # Sostituisce la porta virtuale "Armonix" con una finta.
+    launchkey._armonix_virtual_out = FakePort()
+    out = FakePort()
+    sm = FakeStateManager(pianoteq_mode=pianoteq_mode)
+    filt = launchkey.filter_and_translate_msg
+    return items, lambda msg: filt(msg, out, sm)
+
+
+def _register_pianoteq_modes():
+    for mode in PIANOTEQ_MODES:
+        label = mode or "off"
+
+        def note_flood(mode=mode):
+            return _launchkey_master(streams.note_flood(), mode)
+
+        def sustain(mode=mode):
+            return _launchkey_master(streams.sustain_ramp(), mode)
+
+        SCENARIOS[f"launchkey/note_flood[pianoteq={label}]"] = note_flood
+        SCENARIOS[f"launchkey/sustain_ramp[pianoteq={label}]"] = sustain
+
+
+_register_pianoteq_modes()
+
+
+# --- Launchkey porta DAW ----------------------------------------------------
+
+def _daw_rules(section, exclude=("MOUSE", "PIANOTEQ", "PIANOTEQ_PRESET")):
+    import launchkey_midi_filter as launchkey
+
+    rules = []
+    for channel, entries in launchkey.LAUNCHKEY_FILTERS[section].items():
+        for pid, rule in entries.items():
+            if rule.get("type") not in exclude:
+                rules.append((channel, pid, rule))
+    return rules
+
+
+def _launchkey_daw(items):
+    import launchkey_midi_filter as launchkey
+
+    daw_out = FakePort()
+    sm = FakeStateManager()
+    filt = launchkey.filter_and_translate_launchkey_daw_msg
+    return items, lambda msg: filt(msg, daw_out, sm)
+
+
+@scenario("launchkey_daw/pad_hits")
+def _daw_pads():
+    msgs = []
+    for channel, note, _rule in _daw_rules("NOTE"):
+        msgs.extend(streams.pad_hits([note], channel=channel, repeat=10))
+    return _launchkey_daw(msgs)
+
+
+@scenario("launchkey_daw/fader_sweep")
+def _daw_faders():
+    msgs = []
+    for channel, control, rule in _daw_rules("CC"):
+        if rule.get("type") == "CC":
+            msgs.extend(streams.cc_sweep([control], channel=channel))
+    return _launchkey_daw(msgs)
+
+
+@scenario("launchkey_daw/buttons")
+def _daw_buttons():
+    msgs = []
+    for channel, control, rule in _daw_rules("CC"):
+        if rule.get("type") != "CC":
+            msgs.extend(streams.cc_sweep([control], channel=channel, steps=2))
+    return _launchkey_daw(msgs * 10)
+
+
+# --- Tastierino e pedali ----------------------------------------------------
+
+@scenario("keypad/key_presses")
+def _keypad():
+    from keypad_midi_callback import KEYPAD_CONFIG, keypad_midi_callback
+
+    out = FakePort()
+    sm = FakeStateManager()
+    events = streams.key_presses(sorted(KEYPAD_CONFIG))
+    return events, lambda ev: keypad_midi_callback(ev[0], ev[1], out, state_manager=sm)
+
+
+def _register_pedals():
+    for pedal_key in ("right", "center", "left"):
+        for dest in ("evm", "pianoteq"):
+            def run(pedal_key=pedal_key, dest=dest):
+                pedals = PedalState()
+                build = pedals.build
+                return streams.pedal_values(pedal_key), lambda v: build(pedal_key, v, dest)
+
+            SCENARIOS[f"pedals/{pedal_key}[{dest}]"] = run
+
+
+_register_pedals()
+
+
+# --- Esecuzione ---------------------------------------------------------------
+
+def measure(items, call, min_time=0.2, repeat=5):
+    """Esegue ``call`` su tutti gli ``items`` e restituisce il miglior µs/chiamata."""
+    clock = time.perf_counter
+    # Riscaldamento: riempie cache e tabelle lazy.
+    for item in items:
+        call(item)
+    best = None
+    for _ in range(repeat):
+        calls = 0
+        start = clock()
+        while True:
+            for item in items:
+                call(item)
+            calls += len(items)
+            elapsed = clock() - start
+            if elapsed >= min_time:
+                break
+        per_call = elapsed / calls
+        if best is None or per_call < best:
+            best = per_call
+    return best * 1e6
+
+
+def run_scenarios(pattern=None, min_time=0.2, repeat=5):
+    results = {}
+    for name, factory in SCENARIOS.items():
+        if pattern and pattern not in name:
+            continue
+        items, call = factory()
+        if not items:
+            continue
+        us = measure(items, call, min_time=min_time, repeat=repeat)
+        results[name] = {"us_per_call": round(us, 3), "msgs_per_s": round(1e6 / us)}
+    return results
+
+
+def _baseline_path(name):
+    if os.sep in name or name.endswith(".json"):
+        return name
+    return os.path.join(BASELINE_DIR, f"{name}.json")
+
+
+def save_baseline(name, results):
+    path = _baseline_path(name)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    data = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "results": results,
+    }
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    return path
+
+
+def load_baseline(name):
+    with open(_baseline_path(name)) as f:
+        return json.load(f)["results"]
+
+
+def format_results(results, baseline=None):
+    width = max((len(n) for n in results), default=10)
+    header = f"{'scenario':<{width}}  {'µs/call':>9}  {'msg/s':>10}"
+    if baseline is not None:
+        header += f"  {'baseline':>9}  {'delta':>7}"
+    lines = [header, "-" * len(header)]
+    for name, r in results.items():
+        line = f"{name:<{width}}  {r['us_per_call']:>9.3f}  {r['msgs_per_s']:>10}"
+        if baseline is not None:
+            base = baseline.get(name)
+            if base:
+                delta = (r["us_per_call"] - base["us_per_call"]) / base["us_per_call"] * 100
+                line += f"  {base['us_per_call']:>9.3f}  {delta:>+6.1f}%"
+            else:
+                line += f"  {'-':>9}  {'-':>7}"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Benchmark dei filtri MIDI di Armonix",
+    )
+    parser.add_argument("-k", dest="pattern", help="esegue solo gli scenari che contengono questa stringa")
+    parser.add_argument("--list", action="store_true", help="elenca gli scenari disponibili")
+    parser.add_argument("--min-time", type=float, default=0.2, help="durata minima di ogni ripetizione (s)")
+    parser.add_argument("--repeat", type=int, default=5, help="ripetizioni per scenario (vince la migliore)")
+    parser.add_argument("--save", metavar="NOME", help="salva i risultati come baseline")
+    parser.add_argument("--compare", metavar="NOME", help="confronta con una baseline salvata")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        print("\n".join(SCENARIOS))
+        return 0
+
+    # I filtri loggano errori di configurazione: non servono nel report.
+    logging.basicConfig(level=logging.ERROR)
+
+    baseline = load_baseline(args.compare) if args.compare else None
+    results = run_scenarios(args.pattern, min_time=args.min_time, repeat=args.repeat)
+    print(format_results(results, baseline))
+    if args.save:
+        print(f"\nBaseline salvata in {save_baseline(args.save, results)}")
+    return 0
@@ -0,0 +1,79 @@
+"""Stream MIDI sintetici per gli scenari di benchmark.
+
+Ogni funzione restituisce una lista già costruita, così il tempo di
+creazione dei messaggi non entra nella misura.
+"""
+
+import random
+
+import mido
+
+
+def note_flood(count=2000, channel=0, low=36, high=96, seed=1):
+    """Note on/off alternati su tutta la tastiera con velocity variabile."""
+    rnd = random.Random(seed)
+    msgs = []
+    while len(msgs) < count:
+        note = rnd.randint(low, high)
+        msgs.append(mido.Message("note_on", channel=channel, note=note, velocity=rnd.randint(20, 127)))
+        msgs.append(mido.Message("note_off", channel=channel, note=note, velocity=0))
+    return msgs[:count]
+
+
+def aftertouch_stream(count=2000, channel=0):
+    """Pressione polifonica e pitch bend, come un controller espressivo."""
+    msgs = []
+    for i in range(count):
+        if i % 2:
+            msgs.append(mido.Message("polytouch", channel=channel, note=60 + i % 12, value=i % 128))
+        else:
+            msgs.append(mido.Message("pitchwheel", channel=channel, pitch=(i * 64) % 16383 - 8192))
+    return msgs
+
+
+def cc_sweep(controls, channel=0, steps=128):
+    """Ogni controllo percorre 0..127..0 (fader o potenziometri)."""
+    values = list(range(steps)) + list(range(steps - 1, -1, -1))
+    return [
+        mido.Message("control_change", channel=channel, control=control, value=value)
+        for control in controls
+        for value in values
+    ]
+
+
+def sustain_ramp(channel=0, control=64, steps=128):
+    """Pedale di sustain continuo: pressione lenta e rilascio."""
+    return cc_sweep([control], channel=channel, steps=steps)
+
+
+def pad_hits(notes, channel=0, repeat=20):
+    """Pressione e rilascio dei pad indicati."""
+    msgs = []
+    for _ in range(repeat):
+        for note in notes:
+            msgs.append(mido.Message("note_on", channel=channel, note=note, velocity=100))
+            msgs.append(mido.Message("note_off", channel=channel, note=note, velocity=0))
+    return msgs
+
+
+def fantom_program_changes(triplets, channel=0, repeat=20):
+    """Bank select MSB/LSB seguiti da program change."""
+    msgs = []
+    for _ in range(repeat):
+        for msb, lsb, program in triplets:
+            msgs.append(mido.Message("control_change", channel=channel, control=0, value=msb))
+            msgs.append(mido.Message("control_change", channel=channel, control=32, value=lsb))
+            msgs.append(mido.Message("program_change", channel=channel, program=program))
+    return msgs
+
+
+def key_presses(keycodes, repeat=50):
+    """Eventi ``(keycode, is_down)`` del tastierino."""
+    return [(key, down) for _ in range(repeat) for key in keycodes for down in (True, False)]
+
+
+def pedal_values(pedal_key, steps=128):
+    """Valori del pedalino: rampa continua per il destro, on/off per gli altri."""
+    if pedal_key == "right":
+        return list(range(steps)) + list(range(steps - 1, -1, -1))
+    return [127, 0] * 64
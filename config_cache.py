@@ -0,0 +1,140 @@
+"""Cache su disco delle configurazioni JSON già elaborate.
+
+All'avvio ``launchkey_config.json``, ``keypad_config.json`` e
+``pedals_config.json`` vengono letti, ripuliti dai commenti, decodificati e
+validati.  :func:`load` salva il risultato (con :mod:`pickle`) in
+:data:`paths.USER_CACHE_DIR` insieme a percorso, mtime e dimensione del
+file sorgente: finché il file non cambia, gli avvii successivi leggono
+direttamente la versione elaborata.
+
+La chiave comprende anche la versione di Armonix e un'impronta (percorso,
+mtime, dimensione) del modulo che contiene il loader: un aggiornamento che
+cambia il modo in cui i file vengono elaborati invalida la cache senza
+bisogno di toccare le configurazioni.
+Una cache illeggibile, corrotta, di un'altra versione o non più allineata
+al file viene ignorata e sovrascritta dopo un'elaborazione completa.
+Gli errori di scrittura (directory non scrivibile...) non sono mai fatali.
+
+:func:`read_json` è il lettore comune dei file JSON con commenti ``//`` e
+``#`` usato dai loader.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import pickle
+import re
+import sys
+import tempfile
+
+from paths import USER_CACHE_DIR
+from version import __version__
+
+logger = logging.getLogger(__name__)
+
+_loader_stamps = {}
+
+
+def read_json(path):
+    """Legge un file JSON rimuovendo i commenti ``//`` e ``#``; solleva un'eccezione se non valido."""
+    with open(path, "r") as f:
+        lines = f.readlines()
+    cleaned = []
+    for line in lines:
+        line = re.sub(r"//.*", "", line)
+        line = re.sub(r"#.*", "", line)
+        cleaned.append(line)
+    return json.loads("".join(cleaned))
+
+
+def _cache_file(kind, path):
+    digest = hashlib.sha1(os.fsencode(path)).hexdigest()[:16]
+    return os.path.join(USER_CACHE_DIR, f"{kind}-{digest}.pickle")
+
+
+def _loader_stamp(loader):
+    """Impronta del modulo che definisce ``loader`` (None se non determinabile)."""
+    module_name = getattr(loader, "__module__", None)
+    if module_name in _loader_stamps:
+        return _loader_stamps[module_name]
+    stamp = None
+    source = getattr(sys.modules.get(module_name), "__file__", None)
+    if source:
+        try:
+            st = os.stat(source)
+            stamp = (os.path.abspath(source), st.st_mtime_ns, st.st_size)
+        except OSError:
+            pass
+    _loader_stamps[module_name] = stamp
+    return stamp
+
+
+def _source_key(kind, path, loader):
+    st = os.stat(path)
+    return (
+        __version__,
+        sys.version_info[:2],
+        _loader_stamp(loader),
+        kind,
+        path,
+        st.st_mtime_ns,
+        st.st_size,
+    )
+
+
+def _read(cache_path, key):
+    try:
+        with open(cache_path, "rb") as f:
+            stored_key, data = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as exc:
+        logger.debug("Cache configurazione %s non valida: %s", cache_path, exc)
+        return None
+    if stored_key != key:
+        return None
+    return data
+
+
+def _write(cache_path, key, data):
+    try:
+        os.makedirs(USER_CACHE_DIR, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=USER_CACHE_DIR, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump((key, data), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, cache_path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+    except Exception as exc:
+        logger.debug("Impossibile scrivere la cache %s: %s", cache_path, exc)
+
+
+def load(kind, path, loader):
+    """Restituisce ``loader(path)``, dalla cache se ``path`` non è cambiato.
+
+    ``kind`` distingue i loader che leggono lo stesso file.  Le eccezioni di
+    ``loader`` (file mancante, JSON non valido...) si propagano al chiamante
+    e in quel caso non viene scritto nulla.
+    """
+
+    path = os.path.abspath(path)
+    try:
+        key = _source_key(kind, path, loader)
+    except OSError:
+        return loader(path)
+    cache_path = _cache_file(kind, path)
+    data = _read(cache_path, key)
+    if data is not None:
+        return data
+    data = loader(path)
+    # Il file potrebbe essere cambiato durante la lettura: si salva solo se
+    # è ancora quello descritto dalla chiave.
+    try:
+        if _source_key(kind, path, loader) == key:
+            _write(cache_path, key, data)
+    except OSError:
+        pass
+    return data
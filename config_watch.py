@@ -0,0 +1,185 @@
+"""Ricaricamento a caldo dei file di configurazione.
+
+:class:`ConfigWatcher` osserva un insieme di file (``launchkey_config.json``,
+``keypad_config.json``, ``pedals_config.json``...) e, quando uno cambia,
+chiama in un thread dedicato la funzione di ricaricamento registrata per quel
+file.  Backend:
+
+``inotify``
+    Eventi del kernel Linux sulla directory che contiene il file (via
+    ``ctypes``, nessuna dipendenza): copre anche gli editor che salvano
+    scrivendo un file temporaneo e rinominandolo.
+``poll``
+    Controllo di mtime e dimensione ogni :data:`POLL_INTERVAL` secondi, usato
+    dove inotify non è disponibile (macOS).
+
+Le funzioni di ricaricamento devono validare il nuovo contenuto e, se non è
+valido, lasciare attiva la configurazione precedente.
+"""
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import threading
+import time
+
+# Gli editor scrivono un file in più passaggi: si attende che gli eventi
+# si fermino per questo intervallo prima di ricaricare.
+SETTLE_WINDOW = 0.2
+POLL_INTERVAL = 1.0
+
+_IN_MODIFY = 0x002
+_IN_CLOSE_WRITE = 0x008
+_IN_MOVED_TO = 0x080
+_IN_CREATE = 0x100
+_IN_DELETE = 0x200
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_EVENT = struct.Struct("iIII")
+
+
+def _file_state(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+class ConfigWatcher:
+    """Chiama ``callback(path)`` quando un file osservato cambia."""
+
+    def __init__(self, logger=None):
+        self.logger = logger or logging.getLogger(__name__)
+        self._callbacks = {}
+        self._states = {}
+        self._pending = {}
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._libc = None
+        self._fd = None
+        self._dirs = {}
+        self.backend = "poll"
+
+    def watch(self, path, callback):
+        path = os.path.abspath(path)
+        self._callbacks[path] = callback
+        self._states[path] = _file_state(path)
+
+    def start(self):
+        if self._thread is not None or not self._callbacks:
+            return
+        self._stop_event.clear()
+        self._open_inotify()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="config-watch")
+        self._thread.start()
+        self.logger.info(
+            "Ricaricamento configurazione attivo (%s): %s",
+            self.backend,
+            ", ".join(os.path.basename(p) for p in self._callbacks),
+        )
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    # --- inotify ------------------------------------------------------------
+
+    def _open_inotify(self):
+        libc_path = ctypes.util.find_library("c")
+        if not libc_path:
+            return
+        try:
+            libc = ctypes.CDLL(libc_path, use_errno=True)
+            init = libc.inotify_init1
+            add_watch = libc.inotify_add_watch
+        except (OSError, AttributeError):
+            return
+        add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        fd = init(_IN_NONBLOCK | _IN_CLOEXEC)
+        if fd < 0:
+            return
+        mask = _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE | _IN_MODIFY
+        for directory in {os.path.dirname(p) for p in self._callbacks}:
+            wd = add_watch(fd, os.fsencode(directory), mask)
+            if wd < 0:
+                self.logger.debug(
+                    "inotify: impossibile osservare %s (errno %s)", directory, ctypes.get_errno()
+                )
+                continue
+            self._dirs[wd] = directory
+        if not self._dirs:
+            os.close(fd)
+            return
+        self._libc = libc
+        self._fd = fd
+        self.backend = "inotify"
+
+    def _read_events(self):
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return
+        now = time.monotonic()
+        offset = 0
+        while offset + _EVENT.size <= len(data):
+            wd, _mask, _cookie, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            directory = self._dirs.get(wd)
+            if directory is None or not name:
+                continue
+            path = os.path.join(directory, os.fsdecode(name))
+            if path in self._callbacks:
+                self._pending[path] = now
+
+    # --- ciclo principale -------------------------------------------------
+
+    def _poll_states(self):
+        now = time.monotonic()
+        for path in self._callbacks:
+            state = _file_state(path)
+            if state != self._states.get(path):
+                self._pending[path] = now
+
+    def _run(self):
+        poller = None
+        if self._fd is not None:
+            poller = select.poll()
+            poller.register(self._fd, select.POLLIN)
+        next_poll = time.monotonic() + POLL_INTERVAL
+        while not self._stop_event.is_set():
+            timeout = SETTLE_WINDOW if self._pending else POLL_INTERVAL
+            if poller is not None:
+                if poller.poll(timeout * 1000):
+                    self._read_events()
+            else:
+                self._stop_event.wait(timeout)
+                if time.monotonic() >= next_poll:
+                    self._poll_states()
+                    next_poll = time.monotonic() + POLL_INTERVAL
+            self._fire_settled()
+
+    def _fire_settled(self):
+        now = time.monotonic()
+        for path, last in list(self._pending.items()):
+            if now - last < SETTLE_WINDOW:
+                continue
+            del self._pending[path]
+            state = _file_state(path)
+            if state is None or state == self._states.get(path):
+                continue  # file rimosso (es. durante il salvataggio) o identico
+            self._states[path] = state
+            try:
+                self._callbacks[path](path)
+            except Exception:
+                self.logger.exception("Errore nel ricaricamento di %s", path)
@@ -46,6 +46,7 @@ class PianoteqConfig:
     port_keyword: str = "Pianoteq"
     split_note: int = 60
     jsonrpc_url: str = "http://127.0.0.1:8081/jsonrpc"
+    prelaunch: bool = False
 
     @property
     def enabled(self) -> bool:
@@ -67,6 +68,11 @@ class MidiConfig:
     master_port_keyword: Optional[str] = None
     ketron_port_keyword: str = "MIDI Gadget"
     bluetooth_port_keyword: str = "Bluetooth"
+    listener_mode: str = "poll"
+    hotplug: str = "auto"
+    latency_stats: bool = False
+    record_file: Optional[str] = None
+    trace_size: int = 4096
 
 
 @dataclass(frozen=True)
@@ -75,6 +81,7 @@ class ArmonixConfig:
     headless: bool = True
     verbose: bool = False
     disable_realtime_display: bool = False
+    config_reload: bool = False
     keypad_device: str = (
         "/dev/input/by-id/usb-1189_USB_Composite_Device_CD70134330363235-if01-event-kbd"
     )
@@ -102,6 +109,7 @@ def load_config(path: Optional[str] = None) -> ArmonixConfig:
     disable_display = _as_bool(
         parser.get("armonix", "disable_realtime_display", fallback="false"), False
     )
+    config_reload = _as_bool(parser.get("armonix", "config_reload", fallback="false"), False)
 
     keypad_device = parser.get(
         "keypad", "device_path", fallback=ArmonixConfig().keypad_device
@@ -113,6 +121,16 @@ def load_config(path: Optional[str] = None) -> ArmonixConfig:
         parser.get("midi", "bluetooth_port_keyword", fallback="Bluetooth").strip()
     )
 
+    listener_mode = parser.get("midi", "listener_mode", fallback="poll").strip().lower()
+    if listener_mode not in {"poll", "callback", "raw"}:
+        listener_mode = "poll"
+    hotplug = parser.get("midi", "hotplug", fallback="auto").strip().lower()
+    if hotplug not in {"auto", "alsa", "poll"}:
+        hotplug = "auto"
+    latency_stats = _as_bool(parser.get("midi", "latency_stats", fallback="false"), False)
+    record_file = parser.get("midi", "record_file", fallback="").strip() or None
+    trace_size = max(0, _as_int(parser.get("midi", "trace_size", fallback="4096"), 4096))
+
     vnc_cmd = parser.get("vnc", "command", fallback="").strip()
     vnc_interval = _as_int(parser.get("vnc", "poll_interval", fallback="5"), 5)
 
@@ -129,18 +147,25 @@ def load_config(path: Optional[str] = None) -> ArmonixConfig:
         parser.get("pianoteq", "jsonrpc_url", fallback="http://127.0.0.1:8081/jsonrpc").strip()
         or "http://127.0.0.1:8081/jsonrpc"
     )
+    pianoteq_prelaunch = _as_bool(parser.get("pianoteq", "prelaunch", fallback="false"), False)
     pianoteq_cfg = PianoteqConfig(
         executable=pianoteq_exec,
         options=pianoteq_options,
         port_keyword=pianoteq_keyword,
         split_note=pianoteq_split,
         jsonrpc_url=pianoteq_rpc_url,
+        prelaunch=pianoteq_prelaunch,
     )
 
     midi_cfg = MidiConfig(
         master_port_keyword=master_keyword,
         ketron_port_keyword=ketron_keyword,
         bluetooth_port_keyword=bluetooth_keyword,
+        listener_mode=listener_mode,
+        hotplug=hotplug,
+        latency_stats=latency_stats,
+        record_file=record_file,
+        trace_size=trace_size,
     )
 
     vnc_cfg = VncConfig(
@@ -153,6 +178,7 @@ def load_config(path: Optional[str] = None) -> ArmonixConfig:
         headless=headless,
         verbose=verbose,
         disable_realtime_display=disable_display,
+        config_reload=config_reload,
         keypad_device=keypad_device,
         midi=midi_cfg,
         vnc=vnc_cfg,
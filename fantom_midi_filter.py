@@ -1,164 +1,335 @@
+import logging
+
+import config_cache
 from footswitch_lookup import FOOTSWITCH_LOOKUP
 from tabs_lookup import TABS_LOOKUP
-from custom_sysex_lookup import CUSTOM_SYSEX_LOOKUP
+from paths import get_config_path
 from sysex_utils import (
-    send_sysex_to_ketron,
-    sysex_tabs,
-    sysex_footswitch_std,
+    custom_sysex,
+    footswitch_sysex,
     sysex_footswitch_ext,
-    sysex_custom,
+    sysex_message,
+    tabs_sysex,
 )
 import mido
 
+logger = logging.getLogger(__name__)
+# Messaggi della modalità verbose: chiamate lazy, formattate dal thread
+# di logging (vedi services_common.configure_logging).
+verbose_logger = logging.getLogger("armonix.midi")
+
 MASTER_PORT_KEYWORD = "FANTOM-06 07"
 
-_last_msb = None
-_last_lsb = None
+# Bank select per canale: il program change usa l'MSB/LSB ricevuto sullo
+# stesso canale.
+_bank_msb = [None] * 16
+_bank_lsb = [None] * 16
 
 
 def filter_and_translate_msg(msg, ketron_outport, state_manager, armonix_enabled=True, state="ready", verbose=False):
-    global _last_msb, _last_lsb
-
     # --- NOTE ON/OFF ---
     if msg.type in ("note_on", "note_off"):
         if msg.channel == 0:
             ketron_outport.send(msg)
             if verbose:
-                print(f"[FANTOM-FILTER] Inviato inalterato: {msg}")
+                verbose_logger.debug("[FANTOM-FILTER] Inviato inalterato: %s", msg)
         elif armonix_enabled and msg.type == "note_on":
-            if msg.velocity == 1:
-                name = footswitch_lookup_name(msg.note)
-                if name:
-                    for v in [0x7F, 0x00]:  # ON/OFF
-                        data = sysex_footswitch_std(FOOTSWITCH_LOOKUP[name], v)
-                        send_sysex_to_ketron(ketron_outport, data)
-                    if verbose:
-                        print(f"[FANTOM-FILTER] Footswitch std: {name} note={msg.note}")
-            elif msg.velocity == 2:
-                name = footswitch_lookup_name(msg.note + 128)
-                if name:
-                    for v in [0x7F, 0x00]:
-                        data = sysex_footswitch_ext(FOOTSWITCH_LOOKUP[name] + 128, v)
-                        send_sysex_to_ketron(ketron_outport, data)
+            table = _NOTE_ACTIONS.get(msg.velocity)
+            if table is not None:
+                entry = table[msg.note]
+                if entry:
+                    label, name, shown_note, on_msg, off_msg = entry
+                    ketron_outport.send(on_msg)
+                    ketron_outport.send(off_msg)
                     if verbose:
-                        print(f"[FANTOM-FILTER] Footswitch ext: {name} note={msg.note+128}")
-            elif msg.velocity == 3:
-                name = tabs_lookup_name(msg.note)
-                if name:
-                    for v in [0x7F, 0x00]:
-                        data = sysex_tabs(TABS_LOOKUP[name], v)
-                        send_sysex_to_ketron(ketron_outport, data)
-                    if verbose:
-                        print(f"[FANTOM-FILTER] Tabs: {name} note={msg.note}")
+                        verbose_logger.debug("[FANTOM-FILTER] %s: %s note=%s", label, name, shown_note)
             else:
                 if verbose:
-                    print(f"[FANTOM-FILTER] Ignorato note_on velocity={msg.velocity}, note={msg.note}, channel={msg.channel}")
+                    verbose_logger.debug("[FANTOM-FILTER] Ignorato note_on velocity=%s, note=%s, channel=%s", msg.velocity, msg.note, msg.channel)
 
     # --- CONTROL CHANGE ---
     elif msg.type == "control_change" and armonix_enabled:
         if msg.control == 0:
-            _last_msb = msg.value
+            _bank_msb[msg.channel] = msg.value
             if verbose:
-                print(f"[FANTOM-FILTER] Salvato MSB: {_last_msb}")
+                verbose_logger.debug("[FANTOM-FILTER] Salvato MSB: %s (canale %s)", msg.value, msg.channel)
         elif msg.control == 32:
-            _last_lsb = msg.value
+            _bank_lsb[msg.channel] = msg.value
             if verbose:
-                print(f"[FANTOM-FILTER] Salvato LSB: {_last_lsb}")
+                verbose_logger.debug("[FANTOM-FILTER] Salvato LSB: %s (canale %s)", msg.value, msg.channel)
         elif 0x15 <= msg.control <= 0x25:
             new_control = msg.control + 81
             cc_msg = msg.copy(channel=0, control=new_control)
             ketron_outport.send(cc_msg)
             if verbose:
-                print(f"[FANTOM-FILTER] Slider filtrato e inviato: {cc_msg}")
+                verbose_logger.debug("[FANTOM-FILTER] Slider filtrato e inviato: %s", cc_msg)
         elif msg.control == 40:
             name = "Art. Toggle"
-            val = 0x7F if msg.value == 127 else 0x00
             if name in FOOTSWITCH_LOOKUP:
-                data = sysex_footswitch_ext(FOOTSWITCH_LOOKUP[name], val)
-                send_sysex_to_ketron(ketron_outport, data)
+                ketron_outport.send(footswitch_sysex(name, msg.value == 127))
                 if verbose:
-                    print(f"[FANTOM-FILTER] S1 switch: {name} note={msg}")
+                    verbose_logger.debug("[FANTOM-FILTER] S1 switch: %s note=%s", name, msg)
         elif msg.control == 41:
             name = "VOICETR.ON/OFF"
-            val = 0x7F if msg.value == 127 else 0x00
             if name in FOOTSWITCH_LOOKUP:
-                data = sysex_footswitch_std(FOOTSWITCH_LOOKUP[name], val)
-                send_sysex_to_ketron(ketron_outport, data)
+                ketron_outport.send(footswitch_sysex(name, msg.value == 127))
                 if verbose:
-                    print(f"[FANTOM-FILTER] S2 switch: {name} note={msg}")
+                    verbose_logger.debug("[FANTOM-FILTER] S2 switch: %s note=%s", name, msg)
         else:
             ketron_outport.send(msg)
             if verbose:
-                print(f"[FANTOM-FILTER] CC inalterato: {msg}")
+                verbose_logger.debug("[FANTOM-FILTER] CC inalterato: %s", msg)
 
     # --- PROGRAM CHANGE ---
     elif msg.type == "program_change" and armonix_enabled:
-        msb = _last_msb if _last_msb is not None else 0
-        lsb = _last_lsb if _last_lsb is not None else 0
+        msb = _bank_msb[msg.channel]
+        lsb = _bank_lsb[msg.channel]
+        msb = msb if msb is not None else 0
+        lsb = lsb if lsb is not None else 0
         key = (msb, lsb, msg.program)
         if verbose:
-            print(f"[FANTOM-FILTER] Program Change tripletta: MSB={msb}, LSB={lsb}, PC={msg.program}")
+            verbose_logger.debug("[FANTOM-FILTER] Program Change tripletta: MSB=%s, LSB=%s, PC=%s", msb, lsb, msg.program)
 
         # --- se sono sul canale 15 attivo e disattivo ---
         if msg.channel == 15:
             if (msb == 85 and lsb == 3 and msg.program <= 3):
                 if verbose:
-                    print("[FANTOM-FILTER] Ricevuta attivazione.")
+                    verbose_logger.debug("[FANTOM-FILTER] Ricevuta attivazione.")
                 state_manager.system_pause_off()
             else:
                 if verbose:
-                    print("[FANTOM-FILTER] Ricevuta PAUSA")
+                    verbose_logger.debug("[FANTOM-FILTER] Ricevuta PAUSA")
                 state_manager.system_pause_on()
         else:
-            action_num = program_change_mapping().get(key)
-            if action_num:
-                key_pressed(action_num, ketron_outport.name, verbose)
+            if key_pressed(key, ketron_outport, state_manager, verbose):
                 if verbose:
-                    print(f"[FANTOM-FILTER] Azione {action_num} inviata da program change {key}")
+                    verbose_logger.debug("[FANTOM-FILTER] Azione inviata da program change %s", key)
             else:
                 if verbose:
-                    print(f"[FANTOM-FILTER] Program Change {key} non mappato, ignorato")
+                    verbose_logger.debug("[FANTOM-FILTER] Program Change %s non mappato, ignorato", key)
     else:
         ketron_outport.send(msg)
         if verbose:
-            print(f"[FANTOM-FILTER] msg inalterato: {msg}")
+            verbose_logger.debug("[FANTOM-FILTER] msg inalterato: %s", msg)
+
+
+# Tipi inoltrati sempre inalterati da filter_and_translate_msg: aftertouch
+# polifonico, aftertouch di canale e pitch bend (qualunque canale).
+_RAW_PASSTHROUGH = (0xA0, 0xD0, 0xE0)
+
+
+def filter_raw_msg(data, ketron_outport, state_manager, armonix_enabled=True, verbose=False):
+    """Percorso veloce per ``listener_mode = raw``.
+
+    Note sul canale 1, aftertouch e pitch bend vengono inoltrati come byte
+    grezzi; tutto il resto (False) passa da :func:`filter_and_translate_msg`.
+    """
+    if verbose or ketron_outport is None:
+        return False
+    status = data[0]
+    kind = status & 0xF0
+    if (kind in (0x80, 0x90) and status & 0x0F == 0) or kind in _RAW_PASSTHROUGH:
+        ketron_outport.send_bytes(data)
+        return True
+    return False
 
 
 # --- HELPERS ---
 
+def _reverse_index(lookup):
+    """Valore -> nome; a parità di valore vince il primo nome (come la scansione lineare)."""
+    index = {}
+    for name, value in lookup.items():
+        index.setdefault(value, name)
+    return index
+
+
+_FOOTSWITCH_BY_VALUE = _reverse_index(FOOTSWITCH_LOOKUP)
+_TABS_BY_VALUE = _reverse_index(TABS_LOOKUP)
+
+
 def footswitch_lookup_name(note):
-    for name, value in FOOTSWITCH_LOOKUP.items():
-        if value == note:
-            return name
-    return None
+    return _FOOTSWITCH_BY_VALUE.get(note)
 
 def tabs_lookup_name(note):
-    for name, value in TABS_LOOKUP.items():
-        if value == note:
-            return name
+    return _TABS_BY_VALUE.get(note)
+
+
+def _compile_note_actions():
+    """Precompila le azioni delle note con velocity 1, 2 e 3 (canali != 1).
+
+    velocity 1: footswitch standard con valore = nota
+    velocity 2: footswitch esteso con valore = nota + 128
+    velocity 3: tabs con valore = nota
+    Ogni voce è ``(etichetta, nome, nota mostrata, sysex ON, sysex OFF)``.
+    """
+    std = [None] * 128
+    ext = [None] * 128
+    tabs = [None] * 128
+    for note in range(128):
+        name = footswitch_lookup_name(note)
+        if name:
+            std[note] = (
+                "Footswitch std", name, note,
+                footswitch_sysex(name, True), footswitch_sysex(name, False),
+            )
+        name = footswitch_lookup_name(note + 128)
+        if name:
+            value = FOOTSWITCH_LOOKUP[name] + 128
+            ext[note] = (
+                "Footswitch ext", name, note + 128,
+                sysex_message(sysex_footswitch_ext(value, 0x7F)),
+                sysex_message(sysex_footswitch_ext(value, 0x00)),
+            )
+        name = tabs_lookup_name(note)
+        if name:
+            tabs[note] = (
+                "Tabs", name, note,
+                tabs_sysex(name, True), tabs_sysex(name, False),
+            )
+    return {1: std, 2: ext, 3: tabs}
+
+
+_NOTE_ACTIONS = _compile_note_actions()
+
+
+# --- Program change -> azione ---------------------------------------------
+
+_config_path = get_config_path("fantom_config.json")
+# File osservato da StateManager per il ricaricamento a caldo.
+CONFIG_PATH = _config_path
+
+
+def _compile_program_action(entry):
+    """Trasforma una voce di ``PROGRAM_CHANGE`` in ``action(outport, state_manager, verbose)``."""
+    atype = entry.get("type")
+    name = entry.get("name")
+
+    if atype is None:
+        # Voce senza azione: resta non mappata, come un tipo sconosciuto.
+        return None
+
+    if atype in ("FOOTSWITCH", "TABS"):
+        lookup = footswitch_sysex if atype == "FOOTSWITCH" else tabs_sysex
+        on_msg = lookup(name, True)
+        off_msg = lookup(name, False)
+        if on_msg is None:
+            logger.warning("fantom_config.json: %s '%s' non trovato", atype, name)
+            return None
+
+        def ketron_button(outport, state_manager, verbose):
+            outport.send(on_msg)
+            outport.send(off_msg)
+            if verbose:
+                verbose_logger.debug("[FANTOM-FILTER] %s: %s", atype, name)
+        return ketron_button
+
+    if atype == "CUSTOM":
+        value = entry.get("value", "toggle")
+        custom_msg = custom_sysex(name, value)
+        if custom_msg is None:
+            logger.warning("fantom_config.json: CUSTOM '%s' (%s) non trovato", name, value)
+            return None
+
+        def custom(outport, state_manager, verbose):
+            outport.send(custom_msg)
+            if verbose:
+                verbose_logger.debug("[FANTOM-FILTER] CUSTOM: %s %s", name, value)
+        return custom
+
+    if atype == "PIANOTEQ":
+        mode = entry.get("mode")
+        octave_shift = entry.get("octave_shift", 0)
+
+        def pianoteq(outport, state_manager, verbose):
+            if state_manager is not None:
+                state_manager.set_pianoteq_mode(mode, octave_shift)
+        return pianoteq
+
+    if atype == "PIANOTEQ_PRESET":
+        preset = entry.get("preset")
+        if not preset:
+            logger.warning("fantom_config.json: PIANOTEQ_PRESET senza campo 'preset'")
+            return None
+
+        def pianoteq_preset(outport, state_manager, verbose):
+            if state_manager is not None:
+                state_manager.load_pianoteq_preset(preset)
+        return pianoteq_preset
+
+    logger.warning("fantom_config.json: tipo azione '%s' non gestito", atype)
     return None
 
+
+def _read_fantom_config(path):
+    """Legge fantom_config.json e restituisce le voci valide ``[(key, entry)]``.
+
+    ``key`` è la tripletta ``(msb, lsb, program)``; solleva un'eccezione se
+    il file non è leggibile.
+    """
+    data = config_cache.read_json(path)
+    entries = []
+    for entry in data.get("PROGRAM_CHANGE", []):
+        try:
+            key = (int(entry["msb"]), int(entry["lsb"]), int(entry["program"]))
+        except (KeyError, TypeError, ValueError):
+            logger.warning("fantom_config.json: voce PROGRAM_CHANGE non valida: %s", entry)
+            continue
+        entries.append((key, entry))
+    return entries
+
+
+def _compile_program_actions(entries):
+    actions = {}
+    for key, entry in entries:
+        action = _compile_program_action(entry)
+        if action is not None:
+            actions[key] = action
+    return actions
+
+
+def _load_program_actions(path):
+    """Carica fantom_config.json (rimuovendo i commenti) e precompila le azioni.
+
+    Restituisce un dizionario ``(msb, lsb, program) -> action``.
+    """
+    try:
+        entries = config_cache.load("fantom", path, _read_fantom_config)
+    except Exception as exc:
+        logger.error("Impossibile caricare il file di configurazione Fantom '%s': %s", path, exc)
+        entries = []
+    return _compile_program_actions(entries)
+
+
+_PROGRAM_ACTIONS = _load_program_actions(_config_path)
+
+
 def program_change_mapping():
-    return {
-        (0x69, 0x00, 0x7F): 1,
-        (0x69, 0x01, 0x7F): 2,
-        (0x57, 0x42, 0x34): 3,
-        (0x57, 0x42, 0x2C): 4,
-        (0x57, 0x5D, 0x4E): 5,
-        (0x57, 0x41, 0x09): 6,
-        (0x59, 0x41, 0x00): 7,
-        (0x57, 0x42, 0x09): 8,
-        (0x59, 0x41, 0x37): 9,
-        (0x59, 0x41, 0x0A): 10,
-        (0x57, 0x5C, 0x42): 11,
-        (0x57, 0x5C, 0x18): 12,
-        (0x57, 0x5C, 0x7D): 13,
-        (0x56, 0x40, 0x00): 14,
-        (0x59, 0x00, 0x00): 15,
-        (0x56, 0x00, 0x00): 16,
-    }
-
-def key_pressed(val, ketron_port_name, verbose):
-    # Placeholder: aggiungi la tua azione qui per ogni valore (1-16)
-    if verbose:
-        print(f"[FANTOM-FILTER] Key_pressed chiamato con {val} -- azione da implementare")
+    """Tabella ``(msb, lsb, program) -> azione`` caricata da fantom_config.json."""
+    return _PROGRAM_ACTIONS
+
+def reload_config(path=None):
+    """Ricarica fantom_config.json mantenendo le azioni attuali se non valido.
+
+    La tabella viene sostituita con un solo assegnamento.  Restituisce True
+    se il ricaricamento è riuscito.
+    """
+    global _PROGRAM_ACTIONS
+    path = path or CONFIG_PATH
+    try:
+        actions = _compile_program_actions(config_cache.load("fantom", path, _read_fantom_config))
+    except Exception as exc:
+        logger.error("Configurazione Fantom '%s' non valida, resta quella attuale: %s", path, exc)
+        return False
+    _PROGRAM_ACTIONS = actions
+    logger.info("Configurazione Fantom ricaricata: %d program change", len(actions))
+    return True
+
+
+def key_pressed(key, ketron_outport, state_manager, verbose):
+    """Esegue l'azione associata alla tripletta ``key``; False se non mappata."""
+    action = _PROGRAM_ACTIONS.get(key)
+    if action is None:
+        return False
+    action(ketron_outport, state_manager, verbose)
+    return True
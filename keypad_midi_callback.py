@@ -3,32 +3,63 @@ import logging
 
 import mido
 
-from tabs_lookup import TABS_LOOKUP
-from footswitch_lookup import FOOTSWITCH_LOOKUP
-from custom_sysex_lookup import CUSTOM_SYSEX_LOOKUP
+import config_cache
 from nrpn_lookup import resolve_nrpn_value
-from sysex_utils import (
-    send_sysex_to_ketron,
-    sysex_tabs,
-    sysex_footswitch_std,
-    sysex_footswitch_ext,
-    sysex_custom,
-)
+from sysex_utils import custom_sysex, footswitch_sysex, tabs_sysex
 from paths import get_config_path
 
 logger = logging.getLogger(__name__)
 
 json_path = get_config_path("keypad_config.json")
+# File osservato da StateManager per il ricaricamento a caldo.
+CONFIG_PATH = json_path
+
+
+def _read_keypad_config(path):
+    with open(path) as f:
+        return json.load(f)
+
 
 try:
-    with open(json_path) as f:
-        KEYPAD_CONFIG = json.load(f)
+    KEYPAD_CONFIG = config_cache.load("keypad", json_path, _read_keypad_config)
 except Exception:
     logger.exception(
         "Impossibile caricare la configurazione del keypad '%s'", json_path
     )
     KEYPAD_CONFIG = {}
 
+
+def _validate_keypad_config(data):
+    """Raise ``ValueError`` unless every key maps to an object with ``type`` and ``name``."""
+
+    if not isinstance(data, dict):
+        raise ValueError("atteso un oggetto JSON")
+    for key, mapping in data.items():
+        if not isinstance(mapping, dict) or "type" not in mapping or "name" not in mapping:
+            raise ValueError(f"{key}: servono i campi 'type' e 'name'")
+    return data
+
+
+def reload_config(path=None):
+    """Reload keypad_config.json, keeping the current mapping if it is invalid.
+
+    The new mapping replaces ``KEYPAD_CONFIG`` with a single assignment, so
+    a key press being handled is not affected.  Returns True on success.
+    """
+
+    global KEYPAD_CONFIG
+    path = path or CONFIG_PATH
+    try:
+        data = _validate_keypad_config(
+            config_cache.load("keypad", path, _read_keypad_config)
+        )
+    except Exception as exc:
+        logger.error("Configurazione keypad '%s' non valida, resta quella attuale: %s", path, exc)
+        return False
+    KEYPAD_CONFIG = data
+    logger.info("Configurazione keypad ricaricata: %d tasti", len(data))
+    return True
+
 DEFAULT_NRPN_CHANNEL = 15  # zero-based, corresponds to MIDI channel 16
 
 
@@ -63,40 +94,31 @@ def keypad_midi_callback(keycode, is_down, ketron_outport, verbose=False, state_
 
     cmd_type = mapping["type"]
     name = mapping["name"]
-    sysex_bytes = None
+    sysex_msg = None
     nrpn_sequence = None
     nrpn_channel = DEFAULT_NRPN_CHANNEL
 
     # Risolvi il comando e la stringa Sysex
     if cmd_type == "FOOTSWITCH":
-        value = FOOTSWITCH_LOOKUP.get(name)
-        if value is None:
+        sysex_msg = footswitch_sysex(name, is_down)
+        if sysex_msg is None:
             if verbose:
                 logger.debug("FOOTSWITCH '%s' non trovato", name)
             return
-        status = 0x7F if is_down else 0x00
-        if value > 0x7F:
-            sysex_bytes = sysex_footswitch_ext(value, status)
-        else:
-            sysex_bytes = sysex_footswitch_std(value, status)
 
     elif cmd_type == "TABS":
-        value = TABS_LOOKUP.get(name)
-        if value is None:
+        sysex_msg = tabs_sysex(name, is_down)
+        if sysex_msg is None:
             if verbose:
                 logger.debug("TABS '%s' non trovato", name)
             return
-        status = 0x7F if is_down else 0x00
-        sysex_bytes = sysex_tabs(value, status)
 
     elif cmd_type == "CUSTOM":
-        custom = CUSTOM_SYSEX_LOOKUP.get(name)
-        if not custom:
+        sysex_msg = custom_sysex(name, "toggle" if is_down else "off")
+        if sysex_msg is None:
             if verbose:
                 logger.debug("Custom Sysex '%s' non trovato", name)
             return
-        param = custom["switch_map"]["toggle"] if is_down else custom["switch_map"]["off"]
-        sysex_bytes = sysex_custom(custom["format"], param)
 
     elif cmd_type == "PIANOTEQ":
         if not is_down:
@@ -162,13 +184,13 @@ def keypad_midi_callback(keycode, is_down, ketron_outport, verbose=False, state_
 
     # Stampa verbose
     if verbose:
-        if sysex_bytes is not None:
+        if sysex_msg is not None:
             logger.debug(
                 "Tasto %s: tipo=%s, comando='%s', sysex=%s",
                 keycode,
                 cmd_type,
                 name,
-                sysex_bytes,
+                list(sysex_msg.data),
             )
         elif nrpn_sequence is not None:
             logger.debug(
@@ -181,8 +203,8 @@ def keypad_midi_callback(keycode, is_down, ketron_outport, verbose=False, state_
             )
 
     # Invia il sysex (solo se tutto è corretto)
-    if sysex_bytes:
-        send_sysex_to_ketron(ketron_outport, sysex_bytes)
+    if sysex_msg is not None:
+        ketron_outport.send(sysex_msg)
     elif nrpn_sequence:
         for control, value in nrpn_sequence:
             msg = mido.Message(
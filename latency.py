@@ -0,0 +1,172 @@
+"""Istogrammi di latenza ricezione -> invio per i percorsi MIDI.
+
+Ogni percorso (``master``, ``daw``, ``pedal``, ``keypad``, ``ble``) segna
+l'istante di ricezione con :func:`begin`; ogni invio su una destinazione
+(``ketron``, ``pianoteq``...) chiama :func:`sent`, che registra il tempo
+trascorso nell'istogramma ``(percorso, destinazione)``.  Lo stato di
+ricezione è per thread, quindi i listener non interferiscono tra loro.
+
+L'istante di ricezione è quello in cui rtmidi consegna il messaggio:
+:mod:`midi_listener` lo prende con :func:`now` nella callback di rtmidi
+(prima dell'eventuale coda della modalità ``poll``) e lo passa con
+:func:`arrived` al thread che esegue il filtro; :func:`begin` lo usa al
+posto dell'orologio.  La misura comprende quindi attesa in coda, dispatch
+della callback e filtro.  Dove l'istante di consegna non è disponibile
+(Bluetooth, pedali seriali, tastierino, riproduzione) si misura dal
+:func:`begin`, cioè solo il tempo del filtro.
+
+Disattivata per default (``[midi] latency_stats`` in ``armonix.conf``):
+in quel caso :func:`begin`, :func:`sent` e :func:`end` tornano subito.
+"""
+
+import bisect
+import threading
+import time
+
+# Limiti superiori dei bucket in microsecondi: quattro bucket per ottava da
+# 1 µs a ~1 s (errore massimo sui percentili ~19%), più l'overflow.
+BUCKET_BOUNDS_US = tuple(2 ** (i / 4) for i in range(81))
+
+_clock = time.perf_counter
+_local = threading.local()
+_stats = None
+
+
+class LatencyHistogram:
+    """Istogramma a bucket fissi con conteggio, massimo e somma."""
+
+    __slots__ = ("counts", "count", "total_us", "max_us")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS_US) + 1)
+        self.count = 0
+        self.total_us = 0.0
+        self.max_us = 0.0
+
+    def add(self, us):
+        self.counts[bisect.bisect_left(BUCKET_BOUNDS_US, us)] += 1
+        self.count += 1
+        self.total_us += us
+        if us > self.max_us:
+            self.max_us = us
+
+    def percentile(self, fraction):
+        """Limite superiore del bucket che contiene il percentile richiesto."""
+        if not self.count:
+            return 0.0
+        target = fraction * self.count
+        seen = 0
+        for index, n in enumerate(self.counts):
+            seen += n
+            if n and seen >= target:
+                if index >= len(BUCKET_BOUNDS_US):
+                    return self.max_us
+                return min(BUCKET_BOUNDS_US[index], self.max_us)
+        return self.max_us
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "p50_us": round(self.percentile(0.50), 1),
+            "p99_us": round(self.percentile(0.99), 1),
+            "max_us": round(self.max_us, 1),
+            "mean_us": round(self.total_us / self.count, 1) if self.count else 0.0,
+        }
+
+
+class LatencyStats:
+    """Raccolta degli istogrammi per ``(percorso, destinazione)``."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+
+    def record(self, path, dest, us):
+        key = (path, dest)
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = LatencyHistogram()
+            hist.add(us)
+
+    def report(self):
+        """``{"percorso -> destinazione": {count, p50_us, p99_us, max_us, mean_us}}``."""
+        with self._lock:
+            items = sorted(self._histograms.items())
+            return {f"{path} -> {dest}": hist.summary() for (path, dest), hist in items}
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+
+def enable():
+    """Attiva la raccolta (idempotente) e restituisce l'oggetto statistiche."""
+    global _stats
+    if _stats is None:
+        _stats = LatencyStats()
+    return _stats
+
+
+def disable():
+    global _stats
+    _stats = None
+
+
+def is_enabled():
+    return _stats is not None
+
+
+def now():
+    """Istante corrente per :func:`arrived`, o None se la raccolta è disattivata."""
+    return _clock() if _stats is not None else None
+
+
+def arrived(t0):
+    """Imposta (o azzera, con None) l'istante di consegna usato dal prossimo :func:`begin`."""
+    _local.arrival = t0
+
+
+def begin(path):
+    """Segna la ricezione di un messaggio sul percorso ``path`` (thread corrente)."""
+    if _stats is None:
+        return
+    _local.path = path
+    arrival = getattr(_local, "arrival", None)
+    _local.t0 = arrival if arrival is not None else _clock()
+
+
+def end():
+    """Chiude la misura del messaggio corrente: gli invii successivi non contano."""
+    if _stats is None:
+        return
+    _local.t0 = None
+
+
+def sent(dest):
+    """Registra la latenza dall'ultimo :func:`begin` fino a questo invio."""
+    stats = _stats
+    if stats is None:
+        return
+    t0 = getattr(_local, "t0", None)
+    if t0 is None:
+        return
+    stats.record(_local.path, dest, (_clock() - t0) * 1e6)
+
+
+def report():
+    return _stats.report() if _stats is not None else {}
+
+
+def format_report(data=None):
+    """Righe di testo leggibili (una per percorso/destinazione)."""
+    data = report() if data is None else data
+    if not data:
+        return ["Statistiche di latenza MIDI non disponibili"]
+    lines = []
+    for key, s in data.items():
+        lines.append(
+            f"{key}: n={s['count']} p50={s['p50_us']}us p99={s['p99_us']}us "
+            f"max={s['max_us']}us media={s['mean_us']}us"
+        )
+    return lines
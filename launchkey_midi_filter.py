@@ -1,30 +1,36 @@
-import json
+import functools
 import logging
-import re
 import threading
+import time
 
 import mido
 
-from footswitch_lookup import FOOTSWITCH_LOOKUP
-from tabs_lookup import TABS_LOOKUP
 from sysex_utils import (
-    send_sysex_to_ketron,
-    sysex_tabs,
-    sysex_footswitch_std,
-    sysex_footswitch_ext,
-    sysex_custom,
+    custom_sysex,
+    footswitch_sysex,
+    sysex_message,
+    tabs_sysex,
 )
 from custom_sysex_lookup import CUSTOM_SYSEX_LOOKUP
 from paths import get_config_path
 from version import __version__ as ARMONIX_VERSION
-from mouse_ipc import send_mouse_press, send_mouse_release
 from color_names import resolve_color
+from midi_listener import DEFAULT_LISTENER_MODE, listen
+import config_cache
+import latency
+import midi_recorder
+import midi_trace
 
 logger = logging.getLogger(__name__)
+# Messaggi della modalità verbose: chiamate lazy, formattate dal thread
+# di logging (vedi services_common.configure_logging).
+verbose_logger = logging.getLogger("armonix.midi")
 
 MASTER_PORT_KEYWORD = "Launchkey MK3 88 LKMK3 MIDI In"
 DAW_IN_PORT_KEYWORD = "Launchkey MK3 88 LKMK3 DAW In"
 DAW_OUT_PORT_KEYWORD = "Launchkey MK3 88 LKMK3 DAW In"
+# Parole chiave aggiuntive cercate da StateManager a ogni ciclo di polling.
+PORT_KEYWORDS = (DAW_IN_PORT_KEYWORD, DAW_OUT_PORT_KEYWORD)
 
 
 # --- Config loading -------------------------------------------------------
@@ -32,30 +38,21 @@ DAW_OUT_PORT_KEYWORD = "Launchkey MK3 88 LKMK3 DAW In"
 _config_path = get_config_path("launchkey_config.json")
 
 
-def _load_launchkey_filters(path):
-    """Load launchkey_config.json stripping comments.
+def _read_launchkey_config(path):
+    """Read launchkey_config.json stripping comments; raise on errors."""
 
-    Besides the regular NOTE/CC mappings this loader also initializes
-    ``LAUNCHKEY_GROUPS`` which describes selector groups.  Each group is a
-    dictionary with ``on_color`` and ``off_color`` along with the list of
-    member controls.
+    return config_cache.read_json(path)
+
+
+def _parse_launchkey_config(data):
+    """Return ``(filters, groups)`` built from the parsed JSON ``data``.
+
+    Each group is a dictionary with ``on_color`` and ``off_color`` along
+    with the list of member controls.
     """
 
     filters = {"NOTE": {}, "CC": {}}
     groups = {}
-    try:
-        with open(path, "r") as f:
-            lines = f.readlines()
-        cleaned = []
-        for line in lines:
-            line = re.sub(r"//.*", "", line)
-            line = re.sub(r"#.*", "", line)
-            cleaned.append(line)
-        data = json.loads("".join(cleaned))
-    except Exception as exc:
-        logger.error("Impossibile caricare il file di configurazione Launchkey '%s': %s", path, exc)
-        data = {}
-
     for grp in data.get("SELECTOR_GROUPS", []):
         gid = grp.get("group_id")
         if gid is None:
@@ -90,6 +87,28 @@ def _load_launchkey_filters(path):
                 "members"
             ].append(("CC", int(cc)))
 
+    return filters, groups
+
+
+def _read_parsed_config(path):
+    """Read and parse launchkey_config.json into ``(filters, groups)``."""
+
+    return _parse_launchkey_config(_read_launchkey_config(path))
+
+
+def _load_launchkey_filters(path):
+    """Load launchkey_config.json stripping comments.
+
+    Besides the regular NOTE/CC mappings this loader also initializes
+    ``LAUNCHKEY_GROUPS`` which describes selector groups.
+    """
+
+    try:
+        filters, groups = config_cache.load("launchkey", path, _read_parsed_config)
+    except Exception as exc:
+        logger.error("Impossibile caricare il file di configurazione Launchkey '%s': %s", path, exc)
+        filters, groups = _parse_launchkey_config({})
+
     global LAUNCHKEY_GROUPS
     LAUNCHKEY_GROUPS = groups
 
@@ -101,7 +120,6 @@ LAUNCHKEY_FILTERS = _load_launchkey_filters(_config_path)
 
 CUSTOM_TOGGLE_STATES = {}
 
-_display_timer = None
 _default_lines = ("", "")
 
 _daw_connected = False
@@ -112,18 +130,123 @@ _daw_listener_stop = None
 _daw_outport_obj = None  # open mido output handle, cached for out-of-band writes
 
 
+# --- LCD display ------------------------------------------------------------
+
+_LCD_HEADER = (0x00, 0x20, 0x29, 0x02, 0x12, 0x04)
+# Durata dei messaggi temporanei e finestra in cui gli aggiornamenti
+# ravvicinati si fondono in un'unica scrittura (secondi).
+TEMP_DISPLAY_SECONDS = 3.0
+DISPLAY_FRAME = 0.02
+
+
+@functools.lru_cache(maxsize=256)
+def _line_sysex(row, text):
+    """Sysex (cached) che scrive ``text`` sulla riga ``row`` (0/1) del display."""
+    data = _LCD_HEADER + (row,) + tuple(ord(c) & 0x7F for c in text)
+    return mido.Message("sysex", data=data)
+
+
+class DisplayScheduler:
+    """Un solo thread che aggiorna il display del Launchkey.
+
+    Le richieste impostano il testo desiderato; il thread lo scrive al più
+    una volta per :data:`DISPLAY_FRAME` (l'ultima richiesta vince), invia
+    solo le righe cambiate rispetto a quanto già mostrato e, alla scadenza
+    di un messaggio temporaneo, torna a ``_default_lines``.
+    """
+
+    def __init__(self, frame=DISPLAY_FRAME):
+        self.frame = frame
+        self._cond = threading.Condition()
+        self._thread = None
+        self._outport = None
+        self._verbose = False
+        self._shown = (None, None)
+        self._wanted = None
+        self._flush_at = None
+        self._revert_at = None
+        self._last_flush = float("-inf")
+
+    def reset(self, outport):
+        """Nuova porta (o ``None``): il contenuto del display non è più noto."""
+        with self._cond:
+            self._outport = outport
+            self._shown = (None, None)
+            self._wanted = None
+            self._flush_at = None
+            self._revert_at = None
+
+    def show(self, outport, line1, line2, duration=None, verbose=False):
+        """Mostra due righe; con ``duration`` torna al default dopo N secondi."""
+        lines = (line1.ljust(16)[:16], line2.ljust(16)[:16])
+        now = time.monotonic()
+        with self._cond:
+            if outport is not self._outport:
+                self._outport = outport
+                self._shown = (None, None)
+            self._verbose = verbose
+            self._wanted = lines
+            self._revert_at = now + duration if duration is not None else None
+            if self._flush_at is None:
+                self._flush_at = max(now, self._last_flush + self.frame)
+            self._ensure_thread()
+            self._cond.notify()
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, daemon=True, name="launchkey-display")
+            self._thread.start()
+
+    def _next_deadline(self):
+        deadlines = [t for t in (self._flush_at, self._revert_at) if t is not None]
+        return min(deadlines) if deadlines else None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                deadline = self._next_deadline()
+                now = time.monotonic()
+                while deadline is None or deadline > now:
+                    self._cond.wait(None if deadline is None else deadline - now)
+                    deadline = self._next_deadline()
+                    now = time.monotonic()
+                if self._revert_at is not None and self._revert_at <= now:
+                    self._revert_at = None
+                    self._wanted = _default_lines
+                    if self._flush_at is None:
+                        self._flush_at = now
+                    continue
+                self._flush_at = None
+                self._last_flush = now
+                outport, wanted, shown = self._outport, self._wanted, self._shown
+                verbose = self._verbose
+                if outport is None or wanted is None:
+                    continue
+                self._shown = wanted
+            self._write(outport, wanted, shown, verbose)
+
+    def _write(self, outport, wanted, shown, verbose):
+        for row, (text, old) in enumerate(zip(wanted, shown)):
+            if text == old:
+                continue
+            msg = _line_sysex(row, text)
+            if verbose:
+                verbose_logger.debug("[DAW] set display sysex %s", list(msg.data))
+            try:
+                outport.send(msg)
+            except Exception as exc:
+                logger.error("Errore aggiornamento display Launchkey: %s", exc)
+                with self._cond:
+                    if self._outport is outport:
+                        self._shown = (None, None)
+                return
+
+
+_display = DisplayScheduler()
+
+
 def _send_display(outport, line1, line2, verbose=False):
-    hdr = [0x00, 0x20, 0x29, 0x02, 0x12, 0x04]
-    line1 = line1.ljust(16)[:16]
-    line2 = line2.ljust(16)[:16]
-    data = hdr + [0x00] + [ord(c) & 0x7F for c in line1]
-    if verbose:
-        print(f"[DAW] set display sysex {data}")
-    outport.send(mido.Message("sysex", data=data))
-    data = hdr + [0x01] + [ord(c) & 0x7F for c in line2]
-    if verbose:
-        print(f"[DAW] set display sysex {data}")
-    outport.send(mido.Message("sysex", data=data))
+    _display.show(outport, line1, line2, verbose=verbose)
 
 
 def init_default_display(outport, verbose=False):
@@ -133,6 +256,7 @@ def init_default_display(outport, verbose=False):
     line1 = "Armonix".center(16)
     line2 = f"v. {ARMONIX_VERSION}".center(16)
     _default_lines = (line1[:16], line2[:16])
+    _display.reset(outport)
     _send_display(outport, *_default_lines, verbose=verbose)
     # Apri subito la porta virtuale così Pianoteq la vede nell'elenco ALSA.
     get_pianoteq_virtual_out()
@@ -143,12 +267,7 @@ def show_default_display(outport, verbose=False):
 
 
 def show_temp_display(outport, line1, line2, verbose=False):
-    global _display_timer
-    if _display_timer:
-        _display_timer.cancel()
-    _send_display(outport, line1, line2, verbose=verbose)
-    _display_timer = threading.Timer(3.0, show_default_display, args=(outport, verbose))
-    _display_timer.start()
+    _display.show(outport, line1, line2, duration=TEMP_DISPLAY_SECONDS, verbose=verbose)
 
 
 def show_temp_pianoteq_display(preset_name, verbose=False):
@@ -163,7 +282,7 @@ def update_pianoteq_display(mode, verbose=False):
     Called by StateManager after set_pianoteq_mode() so the display stays in
     sync regardless of whether the trigger came from a pad or the keypad.
     """
-    global _default_lines, _display_timer
+    global _default_lines
     if mode:
         line1 = "Pianoteq".center(16)
         line2 = mode.center(16)
@@ -171,51 +290,46 @@ def update_pianoteq_display(mode, verbose=False):
         line1 = "Armonix".center(16)
         line2 = f"v. {ARMONIX_VERSION}".center(16)
     _default_lines = (line1[:16], line2[:16])
-    if _display_timer:
-        _display_timer.cancel()
-        _display_timer = None
     if _daw_outport_obj is not None:
+        # Sostituisce anche un eventuale messaggio temporaneo in corso.
         _send_display(_daw_outport_obj, *_default_lines, verbose=verbose)
 
 
 _COLOR_STATE = {}
 _PRESSED_ACTIVE = set()
 
+_COLORMODE_ALIAS = {"static": "stationary"}
+_COLORMODE_CHANNEL = {"stationary": 0, "flashing": 1, "pulsing": 2}
+
 
 def _color_key(section, pid):
     return (section, int(pid) & 0x7F)
 
 
-def _mouse_press(x, y):
-    try:
-        px = int(float(x))
-        py = int(float(y))
-    except (TypeError, ValueError) as exc:
-        logger.error("Coordinate mouse non valide (%s, %s): %s", x, y, exc)
-        return
-    send_mouse_press(px, py, logger=logger)
-
+def _mouse_coords(x, y):
+    """Convert MOUSE coordinates to ints; ``None`` if they are not valid."""
 
-def _mouse_release(x, y):
     try:
-        px = int(float(x))
-        py = int(float(y))
+        return int(float(x)), int(float(y))
     except (TypeError, ValueError) as exc:
         logger.error("Coordinate mouse non valide (%s, %s): %s", x, y, exc)
-        return
-    send_mouse_release(px, py, logger=logger)
+        return None
 
 
-def _send_color(outport, section, pid, color, mode="static", remember=True):
-    """Send a color update to the Launchkey for a pad or control."""
+def _build_color(section, pid, color, mode="static"):
+    """Precompute a LED update for a pad or control.
+
+    Returns ``(key, value, colormode, message)`` or ``None`` when ``color``
+    is ``None``.  The tuple is what :func:`_emit_color` sends and what
+    ``_COLOR_STATE`` remembers, so a press never has to resolve colour names
+    or build a ``mido.Message`` again.
+    """
 
     if color is None:
-        return
+        return None
 
-    mode_alias = {"static": "stationary"}
-    mode_to_channel = {"stationary": 0, "flashing": 1, "pulsing": 2}
-    colormode = mode_alias.get(mode, mode)
-    chan = mode_to_channel.get(colormode, 0)
+    colormode = _COLORMODE_ALIAS.get(mode, mode)
+    chan = _COLORMODE_CHANNEL.get(colormode, 0)
     try:
         val = resolve_color(color)
     except (ValueError, TypeError) as exc:
@@ -223,60 +337,243 @@ def _send_color(outport, section, pid, color, mode="static", remember=True):
         val = 0
     pid = int(pid) & 0x7F
 
-    if remember:
-        _COLOR_STATE[_color_key(section, pid)] = (val, colormode)
-
     if section == "NOTE":
         msg = mido.Message("note_on", channel=chan, note=pid, velocity=val)
     else:
         msg = mido.Message("control_change", channel=chan, control=pid, value=val)
-    outport.send(msg)
+    return (_color_key(section, pid), val, colormode, msg)
 
 
-def _handle_pressed_feedback(outport, section, pid, rule, is_pressed):
-    pressed_color = rule.get("color_pressed")
-    if pressed_color is None:
-        return
+class LedFrame:
+    """Framebuffer of the Launchkey NOTE/CC LEDs.
 
-    key = _color_key(section, pid)
-
-    if is_pressed:
-        _PRESSED_ACTIVE.add(key)
-        _send_color(
-            outport,
-            section,
-            pid,
-            pressed_color,
-            rule.get("colormode", "static"),
-            remember=False,
-        )
+    ``target`` holds the colour every LED should show, ``sent`` the
+    ``(value, colormode)`` last transmitted.  :meth:`flush` sends only the
+    staged LEDs whose target differs from what the device already shows, so
+    switching a selector group costs two messages instead of one per member.
+    """
+
+    def __init__(self):
+        self.target = {}
+        self.sent = {}
+        self._dirty = []
+        self._lock = threading.Lock()
+
+    def clear(self):
+        """Forget everything (new DAW connection: the device state is unknown)."""
+        with self._lock:
+            self.target.clear()
+            self.sent.clear()
+            self._dirty.clear()
+
+    def stage(self, color):
+        key = color[0]
+        with self._lock:
+            self.target[key] = color
+            self._dirty.append(key)
+
+    def set_target(self, color):
+        """Set a target without queueing it (sent later by :meth:`sync`)."""
+        with self._lock:
+            self.target.setdefault(color[0], color)
+
+    def _send_changed(self, outport, keys):
+        count = 0
+        for key in keys:
+            color = self.target.get(key)
+            if color is None:
+                continue
+            state = (color[1], color[2])
+            if self.sent.get(key) == state:
+                continue
+            outport.send(color[3])
+            self.sent[key] = state
+            count += 1
+        return count
+
+    def flush(self, outport):
+        """Send the staged LEDs that changed; return the number of messages."""
+        if not self._dirty:
+            return 0
+        with self._lock:
+            dirty, self._dirty = self._dirty, []
+            return self._send_changed(outport, dict.fromkeys(dirty))
+
+    def sync(self, outport, keys):
+        """Send ``keys`` whose target differs from the device (bulk init)."""
+        with self._lock:
+            return self._send_changed(outport, keys)
+
+
+_LEDS = LedFrame()
+
+
+def _stage_color(color, remember=True):
+    """Record a LED update in the framebuffer without sending it."""
+
+    if color is None:
         return
+    if remember:
+        _COLOR_STATE[color[0]] = color
+    _LEDS.stage(color)
 
-    if key in _PRESSED_ACTIVE:
-        color, mode = _COLOR_STATE.get(
-            key,
-            (0, rule.get("colormode", "static")),
-        )
-        _send_color(outport, section, pid, color, mode, remember=False)
-        _PRESSED_ACTIVE.discard(key)
 
+def _emit_color(outport, color, remember=True):
+    """Stage a LED update prepared by :func:`_build_color` and flush the frame."""
 
-def _apply_group_colors(outport, section, pid, group_id, mode="static"):
-    """Color helper for selector groups."""
+    _stage_color(color, remember)
+    _LEDS.flush(outport)
 
-    group = LAUNCHKEY_GROUPS.get(int(group_id))
-    if not group:
-        return
 
-    on_color = group.get("on_color")
-    off_color = group.get("off_color")
+def _send_color(outport, section, pid, color, mode="static", remember=True):
+    """Send a color update to the Launchkey for a pad or control."""
+
+    _emit_color(outport, _build_color(section, pid, color, mode), remember)
 
-    _send_color(outport, section, pid, on_color, mode)
 
-    for sec, member_pid in group.get("members", []):
-        if sec == section and member_pid == pid:
-            continue
-        _send_color(outport, sec, member_pid, off_color, mode)
+# --- DAW connection initialisation -----------------------------------------
+
+# Il burst iniziale (colori e nomi LCD) viene inviato a blocchi: con molte
+# regole il Launchkey perde parte dei messaggi se arrivano tutti insieme.
+INIT_CHUNK_SIZE = 16
+INIT_CHUNK_PAUSE = 0.004
+INIT_CONFIRM_TIMEOUT = 1.0
+
+_DAW_HANDSHAKE = (
+    mido.Message("note_on", channel=15, note=0x0C, velocity=0x7F),
+    mido.Message("note_off", channel=15, note=0x0D, velocity=0x7F),
+    mido.Message("note_off", channel=15, note=0x0A, velocity=0x7F),
+    mido.Message("note_on", channel=15, note=0x0C, velocity=0x7F),
+)
+_IDENTITY_REQUEST = mido.Message("sysex", data=(0x7E, 0x7F, 0x06, 0x01))
+
+
+class _LockedOutput:
+    """Serializes writes to the DAW port (listener, init and display threads)."""
+
+    def __init__(self, port):
+        self.port = port
+        self._lock = threading.Lock()
+
+    def send(self, msg):
+        with self._lock:
+            self.port.send(msg)
+
+
+def _build_init_frame(verbose=False):
+    """Return ``(led_colors, lcd_messages)`` for every configured control."""
+
+    colors = []
+    lcd_msgs = []
+    hdr = [0x00, 0x20, 0x29, 0x02, 0x12]
+    for section, ch_map in LAUNCHKEY_FILTERS.items():
+        for ch, id_map in ch_map.items():
+            for pid, meta in id_map.items():
+                color = meta.get("color")
+                if color is None:
+                    color = meta.get("color_off")
+                    if color is None:
+                        color = meta.get("color_on")
+                if color is not None:
+                    colormode = meta.get("colormode", "static")
+                    if verbose:
+                        verbose_logger.debug(
+                            "[DAW] Colore %r %s su pid %s",
+                            color, colormode, int(pid) & 0x7F,
+                        )
+                    built = _build_color(section, pid, color, colormode)
+                    if built is not None:
+                        colors.append(built)
+
+                lcd_idx = meta.get("lcd_index")
+                lcd_name = meta.get("name")
+                if lcd_idx is not None and lcd_name:
+                    txt = str(lcd_name)[:16]
+                    data = hdr + [0x07, int(lcd_idx) & 0x7F] + [ord(c) & 0x7F for c in txt]
+                    if verbose:
+                        verbose_logger.debug("[DAW] invio sysex %s", data)
+                    lcd_msgs.append(mido.Message("sysex", data=data))
+    return colors, lcd_msgs
+
+
+class DawInitializer:
+    """Sends the LED frame and LCD names in paced chunks on a background thread.
+
+    The DAW listener starts handling pads right away; a pad pressed before
+    the init reaches it simply wins (:meth:`LedFrame.sync` skips LEDs that
+    are already up to date).  A universal device inquiry closes the burst:
+    the Launchkey processes messages in order, so its identity reply
+    confirms that the whole frame was accepted.
+    """
+
+    def __init__(self, outport, colors, lcd_msgs, stop, verbose=False):
+        self.outport = outport
+        self.colors = colors
+        self.lcd_msgs = lcd_msgs
+        self.stop = stop
+        self.verbose = verbose
+        self.confirmed = threading.Event()
+        self.done = threading.Event()
+        self._thread = None
+
+    def start(self):
+        for color in self.colors:
+            _COLOR_STATE.setdefault(color[0], color)
+            _LEDS.set_target(color)
+        self._thread = threading.Thread(target=self._run, daemon=True, name="daw-init")
+        self._thread.start()
+        return self
+
+    def check_reply(self, msg):
+        """True (and consumed) if ``msg`` is the identity reply to our inquiry."""
+        data = msg.data
+        if len(data) >= 4 and data[0] == 0x7E and data[2] == 0x06 and data[3] == 0x02:
+            self.confirmed.set()
+            return True
+        return False
+
+    def _paced(self, items, send):
+        for start in range(0, len(items), INIT_CHUNK_SIZE):
+            if self.stop.is_set():
+                return False
+            send(items[start:start + INIT_CHUNK_SIZE])
+            time.sleep(INIT_CHUNK_PAUSE)
+        return True
+
+    def _run(self):
+        started = time.monotonic()
+        sent = [0]
+
+        def send_leds(chunk):
+            sent[0] += _LEDS.sync(self.outport, [color[0] for color in chunk])
+
+        def send_lcd(chunk):
+            for msg in chunk:
+                self.outport.send(msg)
+
+        try:
+            if not self._paced(self.colors, send_leds) or not self._paced(self.lcd_msgs, send_lcd):
+                return
+            self.outport.send(_IDENTITY_REQUEST)
+            confirmed = self.confirmed.wait(INIT_CONFIRM_TIMEOUT)
+            elapsed = (time.monotonic() - started) * 1000
+            if self.verbose:
+                verbose_logger.debug("[DAW] Init inviata in %.0f ms, confermata=%s", elapsed, confirmed)
+            if confirmed:
+                logger.info(
+                    "Init Launchkey completata: %d LED, %d nomi LCD in %.0f ms (confermata dal dispositivo)",
+                    sent[0], len(self.lcd_msgs), elapsed,
+                )
+            else:
+                logger.warning(
+                    "Init Launchkey inviata (%d LED, %d nomi LCD) ma nessuna risposta dal dispositivo",
+                    sent[0], len(self.lcd_msgs),
+                )
+        except Exception as exc:
+            if not self.stop.is_set():
+                logger.error("Errore durante l'inizializzazione del Launchkey: %s", exc)
+        finally:
+            self.done.set()
 
 
 # --- DAW helper functions -------------------------------------------------
@@ -301,13 +598,13 @@ def poll_ports(state_manager):
         _daw_out_port = daw_out_port
         _daw_connected = True
         if state_manager.verbose:
-            print(f"Porta DAW collegata: in={daw_in_port}, out={daw_out_port}")
+            verbose_logger.debug("Porta DAW collegata: in=%s, out=%s", daw_in_port, daw_out_port)
         start_daw_listener(state_manager)
     elif _daw_connected and (
         not state_manager.ketron_port or not daw_in_port or not daw_out_port
     ):
         if state_manager.verbose:
-            print("Porta DAW scollegata")
+            verbose_logger.debug("Porta DAW scollegata")
         _daw_connected = False
         _daw_in_port = None
         _daw_out_port = None
@@ -329,84 +626,69 @@ def start_daw_listener(state_manager):
         # "un-stop" this thread.
         stop = _daw_listener_stop
         if state_manager.verbose:
-            print(
-                f"[DAW-THREAD] Avvio thread: porta DAW in={_daw_in_port}, out={_daw_out_port}"
+            verbose_logger.debug(
+                "[DAW-THREAD] Avvio thread: porta DAW in=%s, out=%s",
+                _daw_in_port, _daw_out_port,
             )
         try:
             with mido.open_input(_daw_in_port) as inport, mido.open_output(
                 _daw_out_port, exclusive=False
-            ) as outport:
+            ) as raw_outport:
+                outport = _LockedOutput(raw_outport)
                 _daw_outport_obj = outport
-                init_msg = mido.Message("note_on", channel=15, note=0x0C, velocity=0x7F)
-                outport.send(init_msg)
-                if state_manager.verbose:
-                    print(f"[DAW] Inviato init: {init_msg}")
-                init_msg = mido.Message("note_off", channel=15, note=0x0D, velocity=0x7F)
-                outport.send(init_msg)
-                if state_manager.verbose:
-                    print(f"[DAW] Inviato init: {init_msg}")
-                init_msg = mido.Message("note_off", channel=15, note=0x0A, velocity=0x7F)
-                outport.send(init_msg)
-                if state_manager.verbose:
-                    print(f"[DAW] Inviato init: {init_msg}")
-                init_msg = mido.Message("note_on", channel=15, note=0x0C, velocity=0x7F)
-                outport.send(init_msg)
-                if state_manager.verbose:
-                    print(f"[DAW] Inviato init: {init_msg}")
+                for init_msg in _DAW_HANDSHAKE:
+                    outport.send(init_msg)
+                    if state_manager.verbose:
+                        verbose_logger.debug("[DAW] Inviato init: %s", init_msg)
 
                 init_default_display(outport, verbose=state_manager.verbose)
                 CUSTOM_TOGGLE_STATES.clear()
                 _COLOR_STATE.clear()
                 _PRESSED_ACTIVE.clear()
+                _LEDS.clear()
 
                 if state_manager.verbose:
-                    print("[DAW] Invio i colori dei pulsanti se sono definiti")
-
-                for section, ch_map in LAUNCHKEY_FILTERS.items():
-                    for ch, id_map in ch_map.items():
-                        for pid, meta in id_map.items():
-                            color = meta.get("color")
-                            if color is None:
-                                color = meta.get("color_off")
-                                if color is None:
-                                    color = meta.get("color_on")
-                            if color is not None:
-                                colormode = meta.get("colormode", "static")
-                                if state_manager.verbose:
-                                    print(
-                                        f"[DAW] Colore {color!r} {colormode} su pid {int(pid) & 0x7F}"
-                                    )
-                                _send_color(outport, section, pid, color, colormode)
-
-                            lcd_idx = meta.get("lcd_index")
-                            lcd_name = meta.get("name")
-                            if lcd_idx is not None and lcd_name:
-                                hdr = [0x00, 0x20, 0x29, 0x02, 0x12]
-                                txt = str(lcd_name)[:16]
-                                data = hdr + [0x07, int(lcd_idx) & 0x7F] + [ord(c) & 0x7F for c in txt]
-                                if state_manager.verbose:
-                                    print(f"[DAW] invio sysex {data}")
-                                outport.send(mido.Message("sysex", data=data))
+                    verbose_logger.debug("[DAW] Invio i colori dei pulsanti se sono definiti")
+                colors, lcd_msgs = _build_init_frame(state_manager.verbose)
+                initializer = DawInitializer(
+                    outport, colors, lcd_msgs, stop, verbose=state_manager.verbose
+                ).start()
 
                 if state_manager.verbose:
-                    print("[DAW] In ascolto sulla porta DAW.")
-                import time as _time
-                while not stop.is_set():
-                    for msg in inport.iter_pending():
-                        if stop.is_set():
-                            break
+                    verbose_logger.debug("[DAW] In ascolto sulla porta DAW.")
+
+                def handle(msg):
+                    if msg.type == "sysex" and initializer.check_reply(msg):
+                        return
+                    midi_recorder.record("daw", msg)
+                    midi_trace.begin("daw", msg)
+                    latency.begin("daw")
+                    try:
                         filter_and_translate_launchkey_daw_msg(
                             msg, outport, state_manager, verbose=state_manager.verbose
                         )
-                    _time.sleep(0.001)
+                    except Exception:
+                        midi_trace.fail(state_manager.logger)
+                        raise
+                    finally:
+                        latency.end()
+                    midi_trace.end()
+
+                listen(
+                    inport,
+                    handle,
+                    stop,
+                    getattr(state_manager, "listener_mode", DEFAULT_LISTENER_MODE),
+                )
         except Exception as e:
             if state_manager.verbose:
-                print(f"[DAW] Errore: {e}")
+                verbose_logger.debug("[DAW] Errore: %s", e)
             state_manager.logger.exception(
                 "[DAW] Errore durante l'ascolto della porta DAW"
             )
         finally:
             _daw_outport_obj = None
+            _display.reset(None)
 
     _daw_listener_thread = threading.Thread(target=daw_listener, daemon=True, name="daw-listener")
     _daw_listener_thread.start()
@@ -414,19 +696,13 @@ def start_daw_listener(state_manager):
 
 def stop_daw_listener():
     """Stop the DAW listener thread."""
-    global _daw_listener_thread, _daw_listener_stop, _ketron_outport
+    global _daw_listener_thread, _daw_listener_stop
     if _daw_listener_stop:
         _daw_listener_stop.set()
     thread = _daw_listener_thread
     if thread:
         thread.join(timeout=1)
     _daw_listener_thread = None
-    try:
-        if _ketron_outport:
-            _ketron_outport.close()
-    except Exception:
-        pass
-    _ketron_outport = None
 
 # --- Master port filter ---------------------------------------------------
 
@@ -441,12 +717,12 @@ def filter_and_translate_msg(
 
     if msg.channel != 0:
         if verbose:
-            print(f"[LAUNCHKEY-FILTER] Ignorato canale {msg.channel}: {msg}")
+            verbose_logger.debug("[LAUNCHKEY-FILTER] Ignorato canale %s: %s", msg.channel, msg)
         return
 
     if not armonix_enabled:
         if verbose:
-            print(f"[LAUNCHKEY-FILTER] Bloccato: {msg}")
+            verbose_logger.debug("[LAUNCHKEY-FILTER] Bloccato: %s", msg)
         return
 
     pianoteq_mode = getattr(state_manager, "pianoteq_mode", None)
@@ -480,12 +756,29 @@ def filter_and_translate_msg(
 
     ketron_outport.send(msg)
     if verbose:
-        print(f"[LAUNCHKEY-FILTER] Inviato inalterato: {msg}")
+        verbose_logger.debug("[LAUNCHKEY-FILTER] Inviato inalterato: %s", msg)
 
 
-# --- DAW port filter ------------------------------------------------------
+def filter_raw_msg(data, ketron_outport, state_manager, armonix_enabled=True, verbose=False):
+    """Percorso veloce per ``listener_mode = raw``.
+
+    Inoltra alla Ketron i messaggi di canale sul canale 1 come byte grezzi,
+    nei casi in cui :func:`filter_and_translate_msg` li invierebbe
+    inalterati.  Restituisce False (decodifica normale) con Pianoteq attivo,
+    in verbose, per i messaggi di sistema e per gli altri canali.
+    """
+    if verbose or not armonix_enabled or ketron_outport is None:
+        return False
+    if getattr(state_manager, "pianoteq_mode", None):
+        return False
+    status = data[0]
+    if status >= 0xF0 or status & 0x0F:
+        return False
+    ketron_outport.send_bytes(data)
+    return True
+
 
-_ketron_outport = None
+# --- DAW port filter ------------------------------------------------------
 
 # Porta MIDI virtuale pubblicata da Armonix.  Pianoteq (e qualsiasi altro
 # synth) la vede nella propria lista di input come "Armonix" e vi si connette
@@ -526,331 +819,404 @@ def _send_to_pianoteq(msg, verbose=False, octave_shift=0):
         return
     try:
         port.send(msg)
+        latency.sent("pianoteq")
+        midi_recorder.record("pianoteq", msg)
+        midi_trace.sent("pianoteq", msg)
         if verbose:
-            print(f"[LAUNCHKEY-FILTER] -> Pianoteq (virtual): {msg}")
+            verbose_logger.debug("[LAUNCHKEY-FILTER] -> Pianoteq (virtual): %s", msg)
     except Exception as exc:
         logger.error("Errore invio a Pianoteq: %s", exc)
         global _armonix_virtual_out
         _armonix_virtual_out = None
 
 
-def filter_and_translate_launchkey_daw_msg(msg, daw_outport, state_manager, verbose=False):
-    """Filtro dedicato per la porta DAW del Launchkey."""
-    global _ketron_outport
+# --- Compiled DAW dispatch table -------------------------------------------
+#
+# ``LAUNCHKEY_FILTERS`` is compiled once into two 16x128 tables (NOTE and
+# CC) indexed by ``[channel][id]``.  Every rule becomes a handler that
+# already holds its sysex messages, LED messages and selector group
+# members, so the DAW hot path is a single indexed call.
 
-    if _ketron_outport is None:
-        try:
-            _ketron_outport = mido.open_output(state_manager.ketron_port, exclusive=False)
-            if verbose:
-                print(f"[LAUNCHKEY-DAW-FILTER] Aperta porta Ketron: {_ketron_outport.name}")
-        except Exception as e:
-            if verbose:
-                print(f"[LAUNCHKEY-DAW-FILTER] Errore apertura porta Ketron: {e}")
-            state_manager.logger.exception(
-                "Errore apertura porta Ketron dalla porta DAW Launchkey"
-            )
-            return
 
-    if verbose:
-        print(f"[LAUNCHKEY-DAW-FILTER] Ricevuto: {msg}")
-
-    rule = None
-
-    if msg.type in ("note_on", "note_off"):
-        rule = LAUNCHKEY_FILTERS["NOTE"].get(msg.channel, {}).get(getattr(msg, "note", None))
-        if rule:
-            is_on = msg.type == "note_on" and msg.velocity > 0
-            status = 0x7F if is_on else 0x00
-            rtype = rule.get("type")
-            name = rule.get("name")
-            if rtype == "CUSTOM" and name in CUSTOM_SYSEX_LOOKUP:
-                custom = CUSTOM_SYSEX_LOOKUP[name]
-                if "switch_map" in custom:
-                    if is_on:
-                        state = CUSTOM_TOGGLE_STATES.get(name, False)
-                        action = "on" if not state else "off"
-                        param = custom["switch_map"][action]
-                        data = sysex_custom(custom["format"], param)
-                        send_sysex_to_ketron(_ketron_outport, data)
-                        color_key = "color_on" if action == "on" else "color_off"
-                        _send_color(
-                            daw_outport,
-                            "NOTE",
-                            msg.note,
-                            rule.get(color_key),
-                            rule.get("colormode", "static"),
-                        )
-                        CUSTOM_TOGGLE_STATES[name] = not state
-                        if verbose:
-                            print(
-                                f"[LAUNCHKEY-DAW-FILTER] NOTE -> CUSTOM {name} {action.upper()}"
-                            )
-                        if not state_manager.disable_realtime_display:
-                            show_temp_display(daw_outport, "CUSTOM", name, verbose)
-                    _handle_pressed_feedback(
-                        daw_outport, "NOTE", msg.note, rule, is_on
-                    )
-                    return
-                elif "levels" in custom:
-                    velocity = msg.velocity if msg.type == "note_on" else 0
-                    level = next(
-                        (
-                            lvl
-                            for lvl in custom["levels"]
-                            if lvl["min"] <= velocity <= lvl["max"]
-                        ),
-                        None,
-                    )
-                    if level:
-                        for data in level["sysex"]:
-                            send_sysex_to_ketron(_ketron_outport, data)
-                        if is_on:
-                            group_id = rule.get("group")
-                            if group_id is not None:
-                                _apply_group_colors(
-                                    daw_outport,
-                                    "NOTE",
-                                    msg.note,
-                                    group_id,
-                                    rule.get("colormode", "static"),
-                                )
-                        if "color" in level:
-                            _send_color(
-                                daw_outport,
-                                "NOTE",
-                                msg.note,
-                                level["color"],
-                                rule.get("colormode", "static"),
-                            )
-                        disp_name = level.get("name", name)
-                        if verbose:
-                            print(
-                                f"[LAUNCHKEY-DAW-FILTER] NOTE -> CUSTOM {disp_name} (vel {velocity})"
-                            )
-                        if not state_manager.disable_realtime_display:
-                            show_temp_display(daw_outport, "CUSTOM", disp_name, verbose)
-                        _handle_pressed_feedback(
-                            daw_outport, "NOTE", msg.note, rule, is_on
-                        )
-                        return
-            if rtype == "FOOTSWITCH" and name in FOOTSWITCH_LOOKUP:
-                val = FOOTSWITCH_LOOKUP[name]
-                data = (
-                    sysex_footswitch_ext(val, status)
-                    if val > 0x7F
-                    else sysex_footswitch_std(val, status)
-                )
-                send_sysex_to_ketron(_ketron_outport, data)
-                if verbose:
-                    print(f"[LAUNCHKEY-DAW-FILTER] NOTE -> FOOTSWITCH {name} {'ON' if is_on else 'OFF'}")
-                if is_on and not state_manager.disable_realtime_display:
-                    show_temp_display(daw_outport, "FOOTSWITCH", name, verbose)
-            elif rtype == "TABS" and name in TABS_LOOKUP:
-                val = TABS_LOOKUP[name]
-                data = sysex_tabs(val, status)
-                send_sysex_to_ketron(_ketron_outport, data)
-                if verbose:
-                    print(f"[LAUNCHKEY-DAW-FILTER] NOTE -> TABS {name} {'ON' if is_on else 'OFF'}")
-                if is_on and not state_manager.disable_realtime_display:
-                    show_temp_display(daw_outport, "TABS", name, verbose)
-            elif rtype == "MOUSE":
-                x = rule.get("X")
-                y = rule.get("Y")
-                if x is None or y is None:
-                    logger.warning(
-                        "Regola MOUSE priva di coordinate per nota %s canale %s", msg.note, msg.channel
-                    )
-                elif is_on:
-                    _mouse_press(x, y)
-                    if verbose:
-                        print(f"[LAUNCHKEY-DAW-FILTER] NOTE -> MOUSE PRESS {x},{y}")
-                    if not state_manager.disable_realtime_display:
-                        show_temp_display(
-                            daw_outport,
-                            "MOUSE",
-                            f"{x},{y}",
-                            verbose,
-                        )
-                else:
-                    _mouse_release(x, y)
-                    if verbose:
-                        print(f"[LAUNCHKEY-DAW-FILTER] NOTE -> MOUSE RELEASE {x},{y}")
-            elif rtype == "PIANOTEQ":
-                if is_on:
-                    mode = rule.get("mode")  # "full", "full-solo", "split", "split-solo"
-                    octave_shift = rule.get("octave_shift", 0)
-                    active = state_manager.set_pianoteq_mode(mode, octave_shift)
-                    color = rule.get("color_on", rule.get("color")) if active else rule.get("color_off", 0)
-                    _send_color(daw_outport, "NOTE", msg.note, color, rule.get("colormode", "static"))
-                    if verbose:
-                        print(f"[LAUNCHKEY-DAW-FILTER] NOTE -> PIANOTEQ mode={mode} shift={octave_shift} active={active}")
-                _handle_pressed_feedback(daw_outport, "NOTE", msg.note, rule, is_on)
-                return
-            elif rtype == "PIANOTEQ_PRESET":
-                if is_on:
-                    preset = rule.get("preset")
-                    if preset:
-                        state_manager.load_pianoteq_preset(preset)
-                        if verbose:
-                            print(f"[LAUNCHKEY-DAW-FILTER] NOTE -> PIANOTEQ_PRESET {preset}")
-                    else:
-                        logger.warning("PIANOTEQ_PRESET senza campo 'preset' (nota %s)", msg.note)
-                _handle_pressed_feedback(daw_outport, "NOTE", msg.note, rule, is_on)
-                return
+def _compile_group(section, pid, group_id, mode, groups):
+    """Prebuild the LED updates sent when ``pid`` is selected in its group."""
 
-            if is_on:
-                group_id = rule.get("group")
-                if group_id is not None:
-                    _apply_group_colors(
-                        daw_outport,
-                        "NOTE",
-                        msg.note,
-                        group_id,
-                        rule.get("colormode", "static"),
-                    )
-            _handle_pressed_feedback(daw_outport, "NOTE", msg.note, rule, is_on)
-        elif verbose:
-            print(
-                f"[LAUNCHKEY-DAW-FILTER] Nessuna regola per nota {msg.note} canale {msg.channel}"
-            )
+    group = groups.get(int(group_id))
+    if not group:
+        return ()
+
+    colors = [_build_color(section, pid, group.get("on_color"), mode)]
+    for sec, member_pid in group.get("members", []):
+        if sec == section and member_pid == pid:
+            continue
+        colors.append(_build_color(sec, member_pid, group.get("off_color"), mode))
+    return tuple(c for c in colors if c is not None)
+
+
+def _compile_feedback(section, pid, rule, mode):
+    """Return the ``color_pressed`` feedback callable for a rule."""
+
+    pressed = _build_color(section, pid, rule.get("color_pressed"), mode)
+    if pressed is None:
+        return _no_feedback
+
+    key = pressed[0]
+    fallback = _build_color(section, pid, 0, mode)
+
+    def feedback(outport, is_on):
+        if is_on:
+            _PRESSED_ACTIVE.add(key)
+            _emit_color(outport, pressed, remember=False)
+        elif key in _PRESSED_ACTIVE:
+            _emit_color(outport, _COLOR_STATE.get(key, fallback), remember=False)
+            _PRESSED_ACTIVE.discard(key)
+
+    return feedback
+
+
+def _no_feedback(outport, is_on):
+    return None
+
+
+def _compile_rule(section, pid, rule, groups):
+    """Turn a single NOTE/CC rule into a dispatch handler.
 
-    elif msg.type == "control_change":
-        rule = LAUNCHKEY_FILTERS["CC"].get(msg.channel, {}).get(msg.control)
-        if rule:
-            is_on = msg.value > 0
-            rtype = rule.get("type")
-            name = rule.get("name")
-            if rtype == "CUSTOM" and name in CUSTOM_SYSEX_LOOKUP:
+    The handler signature is ``(msg, is_on, daw_outport, ketron_outport,
+    state_manager, verbose)``.
+    """
+
+    rtype = rule.get("type")
+    name = rule.get("name")
+    mode = rule.get("colormode", "static")
+    label = "NOTE" if section == "NOTE" else f"CC {pid}"
+    feedback = _compile_feedback(section, pid, rule, mode)
+    group_id = rule.get("group")
+    group = _compile_group(section, pid, group_id, mode, groups) if group_id is not None else ()
+
+    def finish(daw_outport, is_on):
+        if is_on:
+            for color in group:
+                _stage_color(color)
+        feedback(daw_outport, is_on)
+        _LEDS.flush(daw_outport)
+
+    # Regole non riconosciute: per le NOTE si applicano comunque gruppo e
+    # feedback, per i CC solo il feedback (come il filtro originale).
+    def fallthrough(msg, is_on, daw_outport, ketron_outport, state_manager, verbose):
+        finish(daw_outport, is_on)
+
+    def feedback_only(msg, is_on, daw_outport, ketron_outport, state_manager, verbose):
+        feedback(daw_outport, is_on)
+
+    default = fallthrough if section == "NOTE" else feedback_only
+
+    if rtype == "CUSTOM":
+        custom = CUSTOM_SYSEX_LOOKUP.get(name)
+        if custom is None:
+            return default
+        if "switch_map" in custom:
+            on_msg = custom_sysex(name, "on")
+            off_msg = custom_sysex(name, "off")
+            on_color = _build_color(section, pid, rule.get("color_on"), mode)
+            off_color = _build_color(section, pid, rule.get("color_off"), mode)
+
+            def custom_toggle(msg, is_on, daw_outport, ketron_outport, state_manager, verbose):
                 if is_on:
-                    custom = CUSTOM_SYSEX_LOOKUP[name]
                     state = CUSTOM_TOGGLE_STATES.get(name, False)
-                    action = "on" if not state else "off"
-                    param = custom["switch_map"][action]
-                    data = sysex_custom(custom["format"], param)
-                    send_sysex_to_ketron(_ketron_outport, data)
-                    color_key = "color_on" if action == "on" else "color_off"
-                    _send_color(
-                        daw_outport,
-                        "CC",
-                        msg.control,
-                        rule.get(color_key),
-                        rule.get("colormode", "static"),
-                    )
+                    out = off_msg if state else on_msg
+                    if out is not None:
+                        ketron_outport.send(out)
+                    _emit_color(daw_outport, off_color if state else on_color)
                     CUSTOM_TOGGLE_STATES[name] = not state
                     if verbose:
-                        print(
-                            f"[LAUNCHKEY-DAW-FILTER] CC {msg.control} -> CUSTOM {name} {action.upper()}"
+                        verbose_logger.debug(
+                            "[LAUNCHKEY-DAW-FILTER] %s -> CUSTOM %s %s",
+                            label, name, "OFF" if state else "ON",
                         )
                     if not state_manager.disable_realtime_display:
                         show_temp_display(daw_outport, "CUSTOM", name, verbose)
-                _handle_pressed_feedback(
-                    daw_outport, "CC", msg.control, rule, is_on
+                feedback(daw_outport, is_on)
+
+            return custom_toggle
+
+        if section == "NOTE" and "levels" in custom:
+            levels = tuple(
+                (
+                    lvl["min"],
+                    lvl["max"],
+                    tuple(sysex_message(data) for data in lvl["sysex"]),
+                    _build_color(section, pid, lvl.get("color"), mode),
+                    lvl.get("name", name),
                 )
-                return
-            if rtype == "MOUSE":
-                x = rule.get("X")
-                y = rule.get("Y")
-                if x is None or y is None:
-                    logger.warning(
-                        "Regola MOUSE priva di coordinate per CC %s canale %s", msg.control, msg.channel
-                    )
-                elif is_on:
-                    _mouse_press(x, y)
-                    if verbose:
-                        print(f"[LAUNCHKEY-DAW-FILTER] CC {msg.control} -> MOUSE PRESS {x},{y}")
-                    if not state_manager.disable_realtime_display:
-                        show_temp_display(
-                            daw_outport,
-                            "MOUSE",
-                            f"{x},{y}",
-                            verbose,
-                        )
+                for lvl in custom["levels"]
+            )
+
+            def custom_levels(msg, is_on, daw_outport, ketron_outport, state_manager, verbose):
+                velocity = msg.velocity if msg.type == "note_on" else 0
+                for low, high, sysex_msgs, color, disp_name in levels:
+                    if low <= velocity <= high:
+                        break
                 else:
-                    _mouse_release(x, y)
-                    if verbose:
-                        print(f"[LAUNCHKEY-DAW-FILTER] CC {msg.control} -> MOUSE RELEASE {x},{y}")
-                if is_on:
-                    group_id = rule.get("group")
-                    if group_id is not None:
-                        _apply_group_colors(
-                            daw_outport,
-                            "CC",
-                            msg.control,
-                            group_id,
-                            rule.get("colormode", "static"),
-                        )
-            elif rtype in ("FOOTSWITCH", "TABS"):
-                status = 0x7F if is_on else 0x00
-                if rtype == "FOOTSWITCH" and name in FOOTSWITCH_LOOKUP:
-                    val = FOOTSWITCH_LOOKUP[name]
-                    data = (
-                        sysex_footswitch_ext(val, status)
-                        if val > 0x7F
-                        else sysex_footswitch_std(val, status)
-                    )
-                    send_sysex_to_ketron(_ketron_outport, data)
-                    if verbose:
-                        print(
-                            f"[LAUNCHKEY-DAW-FILTER] CC {msg.control} -> FOOTSWITCH {name}"
-                        )
-                    if msg.value > 0 and not state_manager.disable_realtime_display:
-                        show_temp_display(daw_outport, "FOOTSWITCH", name, verbose)
-                elif rtype == "TABS" and name in TABS_LOOKUP:
-                    val = TABS_LOOKUP[name]
-                    data = sysex_tabs(val, status)
-                    send_sysex_to_ketron(_ketron_outport, data)
-                    if verbose:
-                        print(
-                            f"[LAUNCHKEY-DAW-FILTER] CC {msg.control} -> TABS {name}"
-                        )
-                    if msg.value > 0 and not state_manager.disable_realtime_display:
-                        show_temp_display(daw_outport, "TABS", name, verbose)
+                    finish(daw_outport, is_on)
+                    return
+                for out in sysex_msgs:
+                    ketron_outport.send(out)
                 if is_on:
-                    group_id = rule.get("group")
-                    if group_id is not None:
-                        _apply_group_colors(
-                            daw_outport,
-                            "CC",
-                            msg.control,
-                            group_id,
-                            rule.get("colormode", "static"),
-                        )
-            elif rtype == "CC" and "newval" in rule:
-                _ketron_outport.send(msg)
-                dup_msg = msg.copy(control=rule["newval"], channel=0)
-                _ketron_outport.send(dup_msg)
+                    for group_color in group:
+                        _stage_color(group_color)
+                _emit_color(daw_outport, color)
                 if verbose:
-                    print(
-                        f"[LAUNCHKEY-DAW-FILTER] CC duplicato {msg.control}->{rule['newval']}"
+                    verbose_logger.debug(
+                        "[LAUNCHKEY-DAW-FILTER] NOTE -> CUSTOM %s (vel %s)",
+                        disp_name, velocity,
                     )
-            elif rtype == "PIANOTEQ":
-                if is_on:
-                    mode = rule.get("mode")
-                    octave_shift = rule.get("octave_shift", 0)
-                    active = state_manager.set_pianoteq_mode(mode, octave_shift)
-                    color = rule.get("color_on", rule.get("color")) if active else rule.get("color_off", 0)
-                    _send_color(daw_outport, "CC", msg.control, color, rule.get("colormode", "static"))
-                    if verbose:
-                        print(f"[LAUNCHKEY-DAW-FILTER] CC {msg.control} -> PIANOTEQ mode={mode} shift={octave_shift} active={active}")
-                _handle_pressed_feedback(daw_outport, "CC", msg.control, rule, is_on)
-                return
-            elif rtype == "PIANOTEQ_PRESET":
-                if is_on:
-                    preset = rule.get("preset")
-                    if preset:
-                        state_manager.load_pianoteq_preset(preset)
-                        if verbose:
-                            print(f"[LAUNCHKEY-DAW-FILTER] CC {msg.control} -> PIANOTEQ_PRESET {preset}")
-                    else:
-                        logger.warning("PIANOTEQ_PRESET senza campo 'preset' (CC %s)", msg.control)
-                _handle_pressed_feedback(daw_outport, "CC", msg.control, rule, is_on)
-                return
-            _handle_pressed_feedback(daw_outport, "CC", msg.control, rule, is_on)
-        elif verbose:
-            print(
-                f"[LAUNCHKEY-DAW-FILTER] Nessuna regola per CC {msg.control} canale {msg.channel}"
+                if not state_manager.disable_realtime_display:
+                    show_temp_display(daw_outport, "CUSTOM", disp_name, verbose)
+                feedback(daw_outport, is_on)
+
+            return custom_levels
+
+        return default
+
+    if rtype in ("FOOTSWITCH", "TABS"):
+        lookup = footswitch_sysex if rtype == "FOOTSWITCH" else tabs_sysex
+        on_msg = lookup(name, True)
+        off_msg = lookup(name, False)
+        if on_msg is None:
+            return fallthrough
+
+        def ketron_button(msg, is_on, daw_outport, ketron_outport, state_manager, verbose):
+            ketron_outport.send(on_msg if is_on else off_msg)
+            if verbose:
+                verbose_logger.debug(
+                    "[LAUNCHKEY-DAW-FILTER] %s -> %s %s %s",
+                    label, rtype, name, "ON" if is_on else "OFF",
+                )
+            if is_on and not state_manager.disable_realtime_display:
+                show_temp_display(daw_outport, rtype, name, verbose)
+            finish(daw_outport, is_on)
+
+        return ketron_button
+
+    if rtype == "MOUSE":
+        x = rule.get("X")
+        y = rule.get("Y")
+        if x is None or y is None:
+            logger.warning(
+                "Regola MOUSE priva di coordinate per %s %s", section, pid
             )
+            return fallthrough
+        coords = _mouse_coords(x, y)
+        if coords is None:
+            return fallthrough
+        px, py = coords
+        disp = f"{x},{y}"
+
+        def mouse(msg, is_on, daw_outport, ketron_outport, state_manager, verbose):
+            # Import differito: il client IPC serve solo con regole MOUSE.
+            from mouse_ipc import send_mouse_press, send_mouse_release
+
+            if is_on:
+                send_mouse_press(px, py, logger=logger)
+                if verbose:
+                    verbose_logger.debug("[LAUNCHKEY-DAW-FILTER] %s -> MOUSE PRESS %s", label, disp)
+                if not state_manager.disable_realtime_display:
+                    show_temp_display(daw_outport, "MOUSE", disp, verbose)
+            else:
+                send_mouse_release(px, py, logger=logger)
+                if verbose:
+                    verbose_logger.debug("[LAUNCHKEY-DAW-FILTER] %s -> MOUSE RELEASE %s", label, disp)
+            finish(daw_outport, is_on)
+
+        return mouse
+
+    if rtype == "CC" and section == "CC" and "newval" in rule:
+        newval = rule["newval"]
+
+        def cc_duplicate(msg, is_on, daw_outport, ketron_outport, state_manager, verbose):
+            ketron_outport.send(msg)
+            ketron_outport.send(msg.copy(control=newval, channel=0))
+            if verbose:
+                verbose_logger.debug("[LAUNCHKEY-DAW-FILTER] CC duplicato %s->%s", msg.control, newval)
+            feedback(daw_outport, is_on)
+
+        return cc_duplicate
+
+    if rtype == "PIANOTEQ":
+        pianoteq_mode = rule.get("mode")  # "full", "full-solo", "split", "split-solo"
+        octave_shift = rule.get("octave_shift", 0)
+        on_color = _build_color(section, pid, rule.get("color_on", rule.get("color")), mode)
+        off_color = _build_color(section, pid, rule.get("color_off", 0), mode)
+
+        def pianoteq(msg, is_on, daw_outport, ketron_outport, state_manager, verbose):
+            if is_on:
+                active = state_manager.set_pianoteq_mode(pianoteq_mode, octave_shift)
+                _emit_color(daw_outport, on_color if active else off_color)
+                if verbose:
+                    verbose_logger.debug(
+                        "[LAUNCHKEY-DAW-FILTER] %s -> PIANOTEQ mode=%s shift=%s active=%s",
+                        label, pianoteq_mode, octave_shift, active,
+                    )
+            feedback(daw_outport, is_on)
+
+        return pianoteq
+
+    if rtype == "PIANOTEQ_PRESET":
+        preset = rule.get("preset")
+        if not preset:
+            logger.warning("PIANOTEQ_PRESET senza campo 'preset' (%s %s)", section, pid)
+            return feedback_only
+
+        def pianoteq_preset(msg, is_on, daw_outport, ketron_outport, state_manager, verbose):
+            if is_on:
+                state_manager.load_pianoteq_preset(preset)
+                if verbose:
+                    verbose_logger.debug("[LAUNCHKEY-DAW-FILTER] %s -> PIANOTEQ_PRESET %s", label, preset)
+            feedback(daw_outport, is_on)
+
+        return pianoteq_preset
+
+    return default
+
+
+def _compile_launchkey_filters(filters, groups=None):
+    """Compile ``filters`` into ``{"NOTE": table, "CC": table}``.
+
+    Each table is a list of 16 channels, each a list of 128 handlers (or
+    ``None`` where no rule is defined).  ``groups`` defaults to
+    ``LAUNCHKEY_GROUPS`` as set by :func:`_load_launchkey_filters`.
+    """
+
+    if groups is None:
+        groups = LAUNCHKEY_GROUPS
+    dispatch = {}
+    for section in ("NOTE", "CC"):
+        table = [[None] * 128 for _ in range(16)]
+        for chan, id_map in filters.get(section, {}).items():
+            for pid, rule in id_map.items():
+                try:
+                    ch = int(chan)
+                    num = int(pid)
+                except (TypeError, ValueError):
+                    ch = num = -1
+                if not (0 <= ch <= 15 and 0 <= num <= 127):
+                    logger.warning(
+                        "Regola Launchkey ignorata: %s canale %s id %s fuori range",
+                        section,
+                        chan,
+                        pid,
+                    )
+                    continue
+                table[ch][num] = _compile_rule(section, num, rule, groups)
+        dispatch[section] = table
+    return dispatch
+
+
+LAUNCHKEY_DISPATCH = _compile_launchkey_filters(LAUNCHKEY_FILTERS)
+
+# File osservato da StateManager per il ricaricamento a caldo.
+CONFIG_PATH = _config_path
+
+
+def _push_config_diff(outport, old_colors, old_lcd):
+    """Send only the LEDs and LCD names whose configuration changed."""
+
+    new_colors, new_lcd = _build_init_frame()
+    old = {color[0]: color for color in old_colors}
+    for color in new_colors:
+        prev = old.pop(color[0], None)
+        if prev is None or prev[1:3] != color[1:3]:
+            _stage_color(color)
+    # Controlli che non hanno più un colore: LED spento.
+    for section, pid in old:
+        _stage_color(_build_color(section, pid, 0))
+    leds = _LEDS.flush(outport)
+
+    sent_lcd = {msg.data for msg in old_lcd}
+    names = 0
+    for msg in new_lcd:
+        if msg.data not in sent_lcd:
+            outport.send(msg)
+            names += 1
+    return leds, names
+
+
+def reload_config(path=None):
+    """Reparse launchkey_config.json and swap in the compiled tables.
+
+    The new file is parsed and compiled off to the side; the dispatch table
+    is then replaced with a single assignment, so a message being handled
+    finishes with the rules it started with.  On any error the running
+    configuration is kept.  With the DAW port open only the changed LED
+    colours and ``lcd_index`` names are sent.  Returns True on success.
+    """
+
+    global LAUNCHKEY_FILTERS, LAUNCHKEY_GROUPS, LAUNCHKEY_DISPATCH
+    path = path or CONFIG_PATH
+    try:
+        filters, groups = config_cache.load("launchkey", path, _read_parsed_config)
+        dispatch = _compile_launchkey_filters(filters, groups)
+    except Exception as exc:
+        logger.error("Configurazione Launchkey '%s' non valida, resta quella attuale: %s", path, exc)
+        return False
+
+    old_colors, old_lcd = _build_init_frame()
+    LAUNCHKEY_FILTERS = filters
+    LAUNCHKEY_GROUPS = groups
+    LAUNCHKEY_DISPATCH = dispatch
+
+    outport = _daw_outport_obj
+    leds = names = 0
+    if outport is not None:
+        try:
+            leds, names = _push_config_diff(outport, old_colors, old_lcd)
+        except Exception as exc:
+            logger.error("Errore nell'aggiornamento dei LED del Launchkey: %s", exc)
+    rules = sum(len(ids) for ch_map in filters.values() for ids in ch_map.values())
+    logger.info(
+        "Configurazione Launchkey ricaricata: %d regole, %d LED e %d nomi LCD aggiornati",
+        rules, leds, names,
+    )
+    return True
+
+
+def filter_and_translate_launchkey_daw_msg(msg, daw_outport, state_manager, verbose=False):
+    """Filtro dedicato per la porta DAW del Launchkey."""
+
+    # Handle condiviso del registro porte di StateManager.
+    ketron_outport = state_manager.get_ketron_output()
+    if ketron_outport is None:
+        if verbose:
+            verbose_logger.debug("[LAUNCHKEY-DAW-FILTER] Porta Ketron non collegata")
+        return
+
+    if verbose:
+        verbose_logger.debug("[LAUNCHKEY-DAW-FILTER] Ricevuto: %s", msg)
+
+    mtype = msg.type
+    if mtype == "note_on" or mtype == "note_off":
+        handler = LAUNCHKEY_DISPATCH["NOTE"][msg.channel][msg.note]
+        is_on = mtype == "note_on" and msg.velocity > 0
+    elif mtype == "control_change":
+        handler = LAUNCHKEY_DISPATCH["CC"][msg.channel][msg.control]
+        is_on = msg.value > 0
     else:
         if verbose:
-            print(f"[LAUNCHKEY-DAW-FILTER] Messaggio ignorato: {msg}")
+            verbose_logger.debug("[LAUNCHKEY-DAW-FILTER] Messaggio ignorato: %s", msg)
+        return
+
+    if handler is None:
+        if verbose:
+            if mtype == "control_change":
+                verbose_logger.debug(
+                    "[LAUNCHKEY-DAW-FILTER] Nessuna regola per CC %s canale %s",
+                    msg.control, msg.channel,
+                )
+            else:
+                verbose_logger.debug(
+                    "[LAUNCHKEY-DAW-FILTER] Nessuna regola per nota %s canale %s",
+                    msg.note, msg.channel,
+                )
+        return
 
+    handler(msg, is_on, daw_outport, ketron_outport, state_manager, verbose)
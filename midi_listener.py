@@ -0,0 +1,188 @@
+"""Loop di ascolto condiviso per le porte MIDI di ingresso.
+
+Modalità disponibili (``[midi] listener_mode`` in ``armonix.conf``):
+
+``poll``
+    Comportamento storico: ``iter_pending()`` seguito da una pausa di 1 ms.
+``callback``
+    Ogni messaggio viene consegnato dalla callback di input di rtmidi non
+    appena arriva; il thread del listener resta bloccato sull'evento di stop
+    e non consuma CPU quando nessuno suona.
+``raw``
+    Come ``callback``, ma i byte ricevuti da python-rtmidi vengono passati
+    prima a un gestore "raw" che inoltra il traffico da non tradurre (note,
+    aftertouch...) senza creare oggetti ``mido.Message``; solo i messaggi
+    che il gestore rifiuta vengono decodificati.  Senza gestore raw equivale
+    a ``callback``.
+
+Con le statistiche di latenza attive ogni messaggio viene marcato con
+l'istante in cui rtmidi lo consegna (vedi :func:`latency.arrived`); in
+modalità ``poll`` una callback rtmidi mette i messaggi marcati in una coda
+locale che il ciclo di polling svuota come farebbe con ``iter_pending()``.
+"""
+
+import collections
+import logging
+import time
+
+import mido
+
+import latency
+
+logger = logging.getLogger(__name__)
+
+LISTENER_MODES = ("poll", "callback", "raw")
+DEFAULT_LISTENER_MODE = "poll"
+
+POLL_INTERVAL = 0.001
+
+
+def normalize_listener_mode(mode):
+    """Restituisce ``mode`` se valido, altrimenti :data:`DEFAULT_LISTENER_MODE`."""
+    mode = (mode or "").strip().lower()
+    return mode if mode in LISTENER_MODES else DEFAULT_LISTENER_MODE
+
+
+def _deliver(handler, msg, arrival):
+    """Chiama ``handler(msg)`` con ``arrival`` come istante di ricezione."""
+    if arrival is None:  # statistiche disattivate
+        return handler(msg)
+    latency.arrived(arrival)
+    try:
+        return handler(msg)
+    finally:
+        latency.arrived(None)
+
+
+def _listen_raw(inport, handler, raw_handler, stop):
+    """Installa una callback python-rtmidi direttamente sulla porta mido.
+
+    Restituisce False se la porta non espone l'oggetto rtmidi (backend
+    diverso): il chiamante ripiega sulla modalità ``callback``.
+    """
+    rt = getattr(inport, "_rt", None)
+    if rt is None:
+        return False
+
+    def _callback(event, _data):
+        if stop.is_set():
+            return
+        arrival = latency.now()
+        data = event[0]
+        if _deliver(raw_handler, data, arrival):
+            return
+        try:
+            msg = mido.Message.from_bytes(data)
+        except ValueError:
+            return
+        _deliver(handler, msg, arrival)
+
+    # Il setter di mido svuota la coda interna e blocca la sua callback;
+    # poi si sostituisce la callback rtmidi con quella raw.
+    inport.callback = handler
+    rt.cancel_callback()
+    rt.set_callback(_callback)
+    try:
+        stop.wait()
+    finally:
+        # Ripristina la callback di mido (e quindi la coda) prima della chiusura.
+        inport.callback = None
+    return True
+
+
+def _listen_poll_stamped(inport, handler, stop):
+    """Polling con i messaggi marcati all'arrivo (statistiche di latenza).
+
+    Restituisce False se la porta non espone l'oggetto rtmidi.
+    """
+    rt = getattr(inport, "_rt", None)
+    if rt is None:
+        return False
+    pending = collections.deque()
+
+    def _callback(event, _data):
+        arrival = latency.now()
+        try:
+            msg = mido.Message.from_bytes(event[0])
+        except ValueError:
+            return
+        pending.append((arrival, msg))
+
+    # Come in _listen_raw: i messaggi già nella coda di mido passano nella
+    # coda locale, poi la callback rtmidi viene sostituita.
+    inport.callback = lambda msg: pending.append((latency.now(), msg))
+    rt.cancel_callback()
+    rt.set_callback(_callback)
+    try:
+        while not stop.is_set():
+            while pending and not stop.is_set():
+                arrival, msg = pending.popleft()
+                _deliver(handler, msg, arrival)
+            time.sleep(POLL_INTERVAL)
+    finally:
+        inport.callback = None
+    return True
+
+
+def listen(inport, handler, stop, mode=DEFAULT_LISTENER_MODE, raw_handler=None):
+    """Consegna ogni messaggio di ``inport`` a ``handler`` finché ``stop`` non è impostato.
+
+    In modalità ``callback`` la funzione installa ``handler`` come callback
+    della porta (i messaggi già in coda vengono consegnati subito da mido) e
+    si blocca su ``stop.wait()``; all'uscita la callback viene rimossa prima
+    che il chiamante chiuda la porta.  In modalità ``poll`` riproduce il
+    ciclo ``iter_pending``/``sleep`` originale.
+
+    In modalità ``raw`` ``raw_handler(data)`` riceve la lista di byte
+    originale e restituisce True se ha già gestito il messaggio.
+    """
+    if mode == "raw":
+        if raw_handler is not None:
+            try:
+                if _listen_raw(inport, handler, raw_handler, stop):
+                    return
+            except (AttributeError, NotImplementedError, ValueError) as exc:
+                logger.warning(
+                    "Callback raw non supportata su %s (%s): uso la callback mido",
+                    getattr(inport, "name", inport),
+                    exc,
+                )
+        mode = "callback"
+
+    if mode == "callback":
+        def _callback(msg):
+            if not stop.is_set():
+                _deliver(handler, msg, latency.now())
+
+        try:
+            inport.callback = _callback
+        except (AttributeError, NotImplementedError, ValueError) as exc:
+            logger.warning(
+                "Callback MIDI non supportata su %s (%s): uso il polling",
+                getattr(inport, "name", inport),
+                exc,
+            )
+        else:
+            try:
+                stop.wait()
+            finally:
+                inport.callback = None
+            return
+
+    if latency.is_enabled():
+        try:
+            if _listen_poll_stamped(inport, handler, stop):
+                return
+        except (AttributeError, NotImplementedError, ValueError) as exc:
+            logger.warning(
+                "Callback rtmidi non disponibile su %s (%s): latenza misurata dal filtro",
+                getattr(inport, "name", inport),
+                exc,
+            )
+
+    while not stop.is_set():
+        for msg in inport.iter_pending():
+            if stop.is_set():
+                break
+            handler(msg)
+        time.sleep(POLL_INTERVAL)
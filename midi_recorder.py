@@ -0,0 +1,415 @@
+"""Registrazione e riproduzione delle sessioni MIDI di Armonix.
+
+Il registratore cattura con timestamp l'ingresso delle sorgenti (porta
+master, porta DAW, pedali, Bluetooth, tastierino) e l'uscita verso la
+Ketron e la porta virtuale di Pianoteq, e li scrive in un file binario
+compatto in sola aggiunta.  Sul percorso critico :func:`record` fa solo un
+``put`` su una coda: codifica e scrittura avvengono in un thread dedicato.
+
+Formato del file::
+
+    header  : b"ARMXREC" + versione (1 byte) + inizio wall-clock (<d)
+    record  : tempo dall'inizio della sessione in secondi (<d),
+              sorgente (B), lunghezza (<H), payload
+
+Ogni avvio del registratore scrive un nuovo header, anche quando il file
+esiste già (``record_file`` senza placeholder strftime): il file è una
+sequenza di sessioni.  Prima di aggiungere, un record troncato in coda
+(spegnimento durante la scrittura) viene tagliato; in lettura
+:func:`read_session` si risincronizza comunque sull'header successivo.
+
+Il payload è il messaggio MIDI in byte; per i pedali è ``valore + nome``
+e per il tastierino ``premuto + keycode``.
+
+Riproduzione da riga di comando::
+
+    python -m midi_recorder info sessione.armrec
+    python -m midi_recorder replay sessione.armrec [--speed 0] [--dry-run]
+
+``--speed 0`` riproduce il più velocemente possibile; ``--dry-run`` usa
+porte di uscita finte invece della Ketron e di Pianoteq.
+"""
+
+import argparse
+import collections
+import importlib
+import logging
+import queue
+import struct
+import sys
+import threading
+import time
+
+import mido
+
+import latency
+
+MAGIC = b"ARMXREC"
+VERSION = 1
+_HEADER = struct.Struct("<d")
+_HEADER_SIZE = len(MAGIC) + 1 + _HEADER.size
+_RECORD = struct.Struct("<dBH")
+
+# Codici delle sorgenti: il bit alto indica un'uscita.
+INPUT_SOURCES = {"master": 1, "daw": 2, "pedal": 3, "ble": 4, "keypad": 5}
+OUTPUT_SOURCES = {"ketron": 0x81, "pianoteq": 0x82}
+SOURCE_CODES = {**INPUT_SOURCES, **OUTPUT_SOURCES}
+SOURCE_NAMES = {code: name for name, code in SOURCE_CODES.items()}
+
+_PEDAL = INPUT_SOURCES["pedal"]
+_KEYPAD = INPUT_SOURCES["keypad"]
+
+_clock = time.perf_counter
+_recorder = None
+
+logger = logging.getLogger(__name__)
+
+# ``time`` è in secondi dall'inizio della prima sessione del file;
+# ``session`` è l'indice della sessione (0 per la prima).
+RecordedEvent = collections.namedtuple(
+    "RecordedEvent", "time source data session", defaults=(0,)
+)
+
+
+def _encode(code, payload):
+    if code == _PEDAL:
+        pedal_key, value = payload
+        return bytes([value & 0x7F]) + pedal_key.encode()
+    if code == _KEYPAD:
+        keycode, is_down = payload
+        return bytes([1 if is_down else 0]) + str(keycode).encode()
+    if isinstance(payload, mido.Message):
+        return bytes(payload.bytes())
+    return bytes(payload)
+
+
+def _decode(code, payload):
+    if code == _PEDAL:
+        return payload[1:].decode(), payload[0]
+    if code == _KEYPAD:
+        return payload[1:].decode(), bool(payload[0])
+    return mido.Message.from_bytes(payload)
+
+
+def _parse(blob):
+    """Divide ``blob`` in sessioni ``[(inizio wall-clock, [(t, code, payload)])]``.
+
+    Restituisce anche l'offset di fine dell'ultimo header o record completo.
+    Un record troncato o che si sovrappone a un header successivo viene
+    scartato e la lettura riprende dall'header seguente.
+    """
+    sessions = []
+    pos = end = 0
+    size = _RECORD.size
+    while pos < len(blob):
+        if blob.startswith(MAGIC, pos):
+            if pos + _HEADER_SIZE > len(blob):
+                break
+            (wall,) = _HEADER.unpack_from(blob, pos + len(MAGIC) + 1)
+            sessions.append((wall, []))
+            pos = end = pos + _HEADER_SIZE
+            continue
+        if not sessions:
+            break
+        nxt = pos + size
+        if nxt <= len(blob):
+            t, code, length = _RECORD.unpack_from(blob, pos)
+            nxt += length
+        if nxt > len(blob) or blob.find(MAGIC, pos + 1, nxt + len(MAGIC) - 1) != -1:
+            pos = blob.find(MAGIC, pos + 1)
+            if pos == -1:
+                break
+            continue
+        sessions[-1][1].append((t, code, blob[pos + size:nxt]))
+        pos = end = nxt
+    return sessions, end
+
+
+def _prepare_append(f):
+    """Verifica il file esistente aperto in ``f`` e taglia l'eventuale coda troncata."""
+    f.seek(0)
+    blob = f.read()
+    sessions, end = _parse(blob)
+    if not sessions:
+        raise ValueError(f"{f.name}: non è una registrazione Armonix")
+    if end < len(blob):
+        logger.warning(
+            "Registrazione %s: scartati %d byte incompleti in coda", f.name, len(blob) - end
+        )
+        f.truncate(end)
+
+
+class SessionRecorder:
+    """Scrive gli eventi registrati su file da un thread dedicato."""
+
+    def __init__(self, path):
+        self.path = path
+        self._queue = queue.SimpleQueue()
+        self._file = open(path, "a+b")
+        try:
+            if self._file.tell():
+                _prepare_append(self._file)
+            # Header di sessione: i tempi dei record ripartono da qui.
+            self._t0 = _clock()
+            self._file.write(MAGIC + bytes([VERSION]) + _HEADER.pack(time.time()))
+            self._file.flush()
+        except BaseException:
+            self._file.close()
+            raise
+        self.written = 0
+        self._thread = threading.Thread(target=self._run, daemon=True, name="midi-recorder")
+        self._thread.start()
+
+    def put(self, code, payload):
+        self._queue.put((_clock(), code, payload))
+
+    def _write(self, item, out):
+        t, code, payload = item
+        try:
+            data = _encode(code, payload)
+        except Exception:
+            return
+        out.append(_RECORD.pack(t - self._t0, code, len(data)))
+        out.append(data)
+        self.written += 1
+
+    def _run(self):
+        get = self._queue.get
+        get_nowait = self._queue.get_nowait
+        while True:
+            item = get()
+            if item is None:
+                break
+            chunks = []
+            self._write(item, chunks)
+            # Svuota la coda: un'unica scrittura per raffica di messaggi.
+            stop = False
+            while True:
+                try:
+                    item = get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                self._write(item, chunks)
+            self._file.write(b"".join(chunks))
+            self._file.flush()
+            if stop:
+                break
+        self._file.close()
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join(timeout=2)
+
+
+def start_recording(path):
+    """Avvia la registrazione su ``path`` (i placeholder strftime vengono espansi)."""
+    global _recorder
+    stop_recording()
+    path = time.strftime(path)
+    try:
+        _recorder = SessionRecorder(path)
+    except (OSError, ValueError) as exc:
+        logger.error("Registrazione sessione MIDI disattivata: %s", exc)
+        return None
+    logger.info("Registrazione sessione MIDI su %s", path)
+    return _recorder
+
+
+def stop_recording():
+    global _recorder
+    recorder, _recorder = _recorder, None
+    if recorder is not None:
+        recorder.close()
+        logger.info("Registrazione sessione MIDI chiusa (%d eventi)", recorder.written)
+
+
+def is_recording():
+    return _recorder is not None
+
+
+def record(source, payload):
+    """Registra un evento di ``source`` (no-op se la registrazione è spenta)."""
+    recorder = _recorder
+    if recorder is None:
+        return
+    code = SOURCE_CODES.get(source)
+    if code is not None:
+        recorder.put(code, payload)
+
+
+def read_session(path):
+    """Restituisce gli eventi di una registrazione come :class:`RecordedEvent`.
+
+    I tempi delle sessioni successive alla prima sono spostati secondo il
+    loro inizio wall-clock e restano monotoni anche se l'orologio di sistema
+    è tornato indietro tra un avvio e l'altro.  Un record troncato (es.
+    spegnimento durante la scrittura) viene ignorato.
+    """
+    with open(path, "rb") as f:
+        blob = f.read()
+    if not blob.startswith(MAGIC):
+        raise ValueError(f"{path}: non è una registrazione Armonix")
+    sessions, _end = _parse(blob)
+    events = []
+    first_wall = sessions[0][0]
+    last = 0.0
+    for index, (wall, records) in enumerate(sessions):
+        offset = max(wall - first_wall, last)
+        for t, code, payload in records:
+            name = SOURCE_NAMES.get(code)
+            if name is None:
+                continue
+            try:
+                data = _decode(code, payload)
+            except (ValueError, UnicodeDecodeError):
+                continue
+            events.append(RecordedEvent(offset + t, name, data, index))
+        if records:
+            last = max(last, offset + records[-1][0])
+    return events
+
+
+class NullPort:
+    """Porta di uscita finta per le riproduzioni ``--dry-run``."""
+
+    name = label = "replay"
+
+    def __init__(self):
+        self.count = 0
+
+    def open(self):
+        return True
+
+    def send(self, msg):
+        self.count += 1
+
+    def send_bytes(self, data):
+        self.count += 1
+
+    def invalidate(self):
+        pass
+
+
+def replay(events, state_manager, speed=1.0, sources=None):
+    """Reinietta gli ingressi registrati in ``state_manager``.
+
+    ``speed`` 1.0 rispetta i tempi originali, 2.0 va al doppio, 0 il più
+    velocemente possibile.  La pausa tra una sessione e la successiva (motore
+    spento) non viene riprodotta.  Restituisce ``(eventi riprodotti, secondi)``.
+    """
+    sources = set(sources or INPUT_SOURCES)
+    inputs = [ev for ev in events if ev.source in sources]
+    if not inputs:
+        return 0, 0.0
+    first = inputs[0].time
+    session = inputs[0].session
+    start = base = _clock()
+    for ev in inputs:
+        if ev.session != session:
+            session = ev.session
+            first = ev.time
+            base = _clock()
+        if speed > 0:
+            delay = (ev.time - first) / speed - (_clock() - base)
+            if delay > 0:
+                time.sleep(delay)
+        try:
+            state_manager.replay_input(ev.source, ev.data)
+        except Exception:
+            logger.exception("Errore nella riproduzione dell'evento %s", ev)
+    return len(inputs), _clock() - start
+
+
+def _cmd_info(args):
+    events = read_session(args.file)
+    counts = collections.Counter(ev.source for ev in events)
+    duration = events[-1].time - events[0].time if events else 0.0
+    sessions = events[-1].session + 1 if events else 0
+    print(f"{args.file}: {len(events)} eventi in {duration:.1f} s, sessioni: {sessions}")
+    for name, n in sorted(counts.items()):
+        print(f"  {name:<9} {n}")
+    return 0
+
+
+def _cmd_replay(args):
+    from configuration import load_config
+    from services_common import create_state_manager
+
+    if args.verbose:
+        logging.basicConfig(level=logging.DEBUG, format="%(message)s")
+    config = load_config(args.config)
+    master = args.master or config.master
+    if args.dry_run:
+        # La porta finta sostituisce la porta virtuale "Armonix" prima che
+        # StateManager o i filtri provino ad aprirla: nessun rtmidi/ALSA.
+        sink = NullPort()
+        master_module = importlib.import_module(f"{master}_midi_filter")
+        if hasattr(master_module, "_armonix_virtual_out"):
+            master_module._armonix_virtual_out = sink
+    state_manager = create_state_manager(
+        verbose=args.verbose,
+        master=master,
+        disable_realtime_display=True,
+        master_port_keyword=config.midi.master_port_keyword,
+        ketron_port_keyword=config.midi.ketron_port_keyword,
+        ble_port_keyword=config.midi.bluetooth_port_keyword,
+        keypad_device=config.keypad_device,
+        # Nessun listener reale: gli ingressi arrivano solo dalla registrazione.
+        enable_midi_io=False,
+        pianoteq_config=config.pianoteq,
+        pedals_config=config.pedals,
+        latency_stats=config.midi.latency_stats,
+        port_polling=not args.dry_run,
+    )
+    if args.dry_run:
+        state_manager.output_ports.register(sink.name, sink)
+        state_manager.ketron_port = sink.name
+    else:
+        state_manager.poll_ports()
+        if not state_manager.ketron_port:
+            print("Porta Ketron non trovata: usa --dry-run per riprodurre senza hardware")
+            return 1
+
+    events = read_session(args.file)
+    sources = args.sources.split(",") if args.sources else None
+    count, elapsed = replay(events, state_manager, speed=args.speed, sources=sources)
+    rate = count / elapsed if elapsed > 0 else 0.0
+    print(f"Riprodotti {count} eventi in {elapsed:.3f} s ({rate:.0f} eventi/s)")
+    if args.dry_run:
+        print(f"Messaggi in uscita: {sink.count}")
+    if state_manager.latency_report():
+        for line in latency.format_report():
+            print(line)
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m midi_recorder",
+        description="Ispeziona e riproduce le registrazioni MIDI di Armonix",
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    info = sub.add_parser("info", help="riepilogo di una registrazione")
+    info.add_argument("file")
+    info.set_defaults(func=_cmd_info)
+
+    rep = sub.add_parser("replay", help="riproduce una registrazione attraverso StateManager")
+    rep.add_argument("file")
+    rep.add_argument("--speed", type=float, default=1.0, help="1 = tempo reale, 0 = il più veloce possibile")
+    rep.add_argument("--sources", help="sorgenti da riprodurre, separate da virgola (default: tutte)")
+    rep.add_argument("--dry-run", action="store_true", help="porte di uscita finte, nessun hardware")
+    rep.add_argument("--master", help="driver master (default: quello di armonix.conf)")
+    rep.add_argument("--config", help="percorso di armonix.conf")
+    rep.add_argument("--verbose", action="store_true")
+    rep.set_defaults(func=_cmd_replay)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,330 @@
+"""Traccia circolare in memoria del traffico MIDI.
+
+Ogni messaggio ricevuto (master, DAW, pedali, tastierino, Bluetooth) e ogni
+invio alla Ketron o a Pianoteq occupano un record compatto in un buffer
+preallocato di dimensione fissa: nessuna allocazione e nessun I/O sul
+percorso critico.  Quando il buffer è pieno i record più vecchi vengono
+sovrascritti, quindi resta sempre disponibile il traffico degli ultimi
+secondi.
+
+Formato di un record (``<dBBBBBBB``)::
+
+    tempo (perf_counter), sorgente, destinazione, decisione,
+    status, dato 1, dato 2, lunghezza del messaggio
+
+Per pedali e tastierino ``status`` è 0, ``dato 1`` il valore (o premuto)
+e ``dato 2`` l'indice del nome del pedale/tasto.
+
+La decisione dell'ingresso viene aggiornata a fine elaborazione:
+``inoltrato`` se ha prodotto almeno un invio, ``scartato`` se no,
+``errore`` se il filtro ha sollevato un'eccezione.
+
+Il contenuto si scrive su file con :func:`dump`: con ``kill -USR2 <pid>``,
+automaticamente alla prima eccezione di un filtro (al più una volta ogni
+:data:`ERROR_DUMP_INTERVAL` secondi) oppure da riga di comando::
+
+    python -m midi_trace dump [--pid PID]
+"""
+
+import argparse
+import collections
+import glob
+import os
+import signal
+import struct
+import subprocess
+import sys
+import threading
+import time
+
+import mido
+
+DEFAULT_SIZE = 4096
+DUMP_PATTERN = "/tmp/armonix-trace-{pid}-%Y%m%d-%H%M%S.txt"
+ERROR_DUMP_INTERVAL = 10.0
+
+_RECORD = struct.Struct("<dBBBBBBB")
+
+SOURCES = {"master": 1, "daw": 2, "pedal": 3, "ble": 4, "keypad": 5}
+DESTINATIONS = {"ketron": 1, "pianoteq": 2}
+SOURCE_NAMES = {code: name for name, code in SOURCES.items()}
+DEST_NAMES = {code: name for name, code in DESTINATIONS.items()}
+
+PENDING, FORWARDED, DROPPED, ERROR, SENT = range(5)
+DECISION_NAMES = ("in corso", "inoltrato", "scartato", "errore", "inviato")
+# Ingresso ripreso dal percorso decodificato (listener raw): non mostrato.
+DISCARDED = 0xFF
+
+TraceRecord = collections.namedtuple(
+    "TraceRecord", "time source dest decision status data length"
+)
+
+_clock = time.perf_counter
+_local = threading.local()
+_buffer = None
+_names = {}
+_last_error_dump = float("-inf")
+
+
+class TraceBuffer:
+    """Buffer circolare preallocato di record a dimensione fissa."""
+
+    def __init__(self, size=DEFAULT_SIZE):
+        self.size = size
+        self._data = bytearray(_RECORD.size * size)
+        self._lock = threading.Lock()
+        self._next = 0
+        # Riferimento tra clock monotono e wall-clock per il dump.
+        self.t0 = _clock()
+        self.wall0 = time.time()
+
+    def add(self, source, dest, decision, status, d1, d2, length):
+        with self._lock:
+            index = self._next
+            self._next = index + 1
+        _RECORD.pack_into(
+            self._data,
+            (index % self.size) * _RECORD.size,
+            _clock(), source, dest, decision, status, d1, d2, length,
+        )
+        return index
+
+    def set_decision(self, index, decision):
+        if self._next - index > self.size:
+            return  # record già sovrascritto
+        # Il byte della decisione segue tempo, sorgente e destinazione.
+        self._data[(index % self.size) * _RECORD.size + 10] = decision
+
+    def records(self):
+        """Record presenti, dal più vecchio al più recente."""
+        end = self._next
+        start = max(0, end - self.size)
+        out = []
+        for index in range(start, end):
+            t, src, dst, dec, status, d1, d2, length = _RECORD.unpack_from(
+                self._data, (index % self.size) * _RECORD.size
+            )
+            if dec != DISCARDED:
+                out.append(TraceRecord(t, src, dst, dec, status, (d1, d2), length))
+        return out
+
+
+def enable(size=DEFAULT_SIZE):
+    """Attiva la traccia con ``size`` record (0 = disattivata)."""
+    global _buffer
+    _buffer = TraceBuffer(size) if size > 0 else None
+
+
+def disable():
+    global _buffer
+    _buffer = None
+
+
+def is_enabled():
+    return _buffer is not None
+
+
+def _name_index(name):
+    index = _names.get(name)
+    if index is None:
+        if len(_names) >= 255:
+            return 0
+        index = _names[name] = len(_names) + 1
+    return index
+
+
+def _fields(data):
+    """``(status, d1, d2, length)`` di un messaggio mido, di byte o di una tupla."""
+    if isinstance(data, mido.Message):
+        data = data.bytes()
+    elif isinstance(data, tuple):
+        name, value = data
+        return 0, int(value) & 0xFF, _name_index(str(name)), 0
+    length = len(data)
+    if not length:
+        return 0, 0, 0, 0
+    d1 = data[1] if length > 1 else 0
+    d2 = data[2] if length > 2 else 0
+    return data[0], d1, d2, min(length, 255)
+
+
+def begin(source, data):
+    """Registra un ingresso; i successivi :func:`sent` del thread vi si riferiscono."""
+    buf = _buffer
+    if buf is None:
+        return
+    code = SOURCES.get(source, 0)
+    status, d1, d2, length = _fields(data)
+    _local.index = buf.add(code, 0, PENDING, status, d1, d2, length)
+    _local.source = code
+    _local.sent = 0
+
+
+def sent(dest, data):
+    """Registra un invio verso ``dest`` (``ketron``, ``pianoteq``...)."""
+    buf = _buffer
+    if buf is None:
+        return
+    status, d1, d2, length = _fields(data)
+    buf.add(
+        getattr(_local, "source", 0), DESTINATIONS.get(dest, 0), SENT, status, d1, d2, length
+    )
+    _local.sent = getattr(_local, "sent", 0) + 1
+
+
+def end(error=False):
+    """Chiude l'ingresso corrente fissandone la decisione."""
+    buf = _buffer
+    if buf is None:
+        return
+    index = getattr(_local, "index", None)
+    if index is None:
+        return
+    if error:
+        decision = ERROR
+    else:
+        decision = FORWARDED if _local.sent else DROPPED
+    buf.set_decision(index, decision)
+    _local.index = None
+    _local.source = 0
+
+
+def discard():
+    """Annulla l'ingresso corrente (verrà registrato di nuovo da un altro percorso)."""
+    buf = _buffer
+    index = getattr(_local, "index", None)
+    if buf is None or index is None:
+        return
+    buf.set_decision(index, DISCARDED)
+    _local.index = None
+
+
+def fail(logger=None):
+    """Segna l'ingresso corrente come ``errore`` e scrive la traccia (vedi :func:`dump_on_error`)."""
+    if _buffer is None:
+        return
+    end(error=True)
+    dump_on_error(logger)
+
+
+def _describe(record):
+    if record.status == 0 and record.length == 0:
+        names = {index: name for name, index in _names.items()}
+        return f"{names.get(record.data[1], '?')}={record.data[0]}"
+    status = record.status
+    parts = [f"{status:02X}"]
+    if record.length > 1:
+        parts.append(f"{record.data[0]:02X}")
+    if record.length > 2:
+        parts.append(f"{record.data[1]:02X}")
+    text = " ".join(parts)
+    if status == 0xF0:
+        text += f" ... ({record.length} byte)"
+    return text
+
+
+def format_records(buf=None):
+    """Righe di testo leggibili per il contenuto della traccia."""
+    buf = buf or _buffer
+    if buf is None:
+        return []
+    lines = []
+    for rec in buf.records():
+        wall = buf.wall0 + (rec.time - buf.t0)
+        stamp = time.strftime("%H:%M:%S", time.localtime(wall)) + f".{int(wall * 1e6) % 1000000:06d}"
+        src = SOURCE_NAMES.get(rec.source, "-")
+        arrow = f"{src} -> {DEST_NAMES.get(rec.dest, '?')}" if rec.dest else src
+        lines.append(f"{stamp}  {arrow:<18} {DECISION_NAMES[rec.decision]:<9} {_describe(rec)}")
+    return lines
+
+
+def dump(path=None):
+    """Scrive la traccia su file; restituisce il percorso o None se disattivata."""
+    buf = _buffer
+    if buf is None:
+        return None
+    path = path or time.strftime(DUMP_PATTERN.format(pid=os.getpid()))
+    lines = format_records(buf)
+    with open(path, "w") as f:
+        f.write(f"# Traccia MIDI Armonix, pid {os.getpid()}, {len(lines)} record\n")
+        for line in lines:
+            f.write(line + "\n")
+    return path
+
+
+def dump_on_error(logger=None):
+    """Dump dopo un'eccezione in un filtro (limitato a uno ogni ``ERROR_DUMP_INTERVAL`` s)."""
+    global _last_error_dump
+    if _buffer is None:
+        return None
+    now = _clock()
+    if now - _last_error_dump < ERROR_DUMP_INTERVAL:
+        return None
+    _last_error_dump = now
+    try:
+        path = dump()
+    except OSError as exc:
+        if logger is not None:
+            logger.error("Impossibile scrivere la traccia MIDI: %s", exc)
+        return None
+    if logger is not None:
+        logger.warning("Traccia MIDI scritta in %s", path)
+    return path
+
+
+def _find_service_pid():
+    try:
+        result = subprocess.run(
+            # Sorgenti (armonix_service.py) e script installati (armonix-engine).
+            ["pgrep", "-f", r"armonix_(gui_)?service|armonix-(engine|gui)"],
+            capture_output=True,
+            text=True,
+        )
+    except FileNotFoundError:
+        return None
+    own = os.getpid()
+    for line in result.stdout.split():
+        if line.isdigit() and int(line) != own:
+            return int(line)
+    return None
+
+
+def _cmd_dump(args):
+    pid = args.pid or _find_service_pid()
+    if pid is None:
+        print("Servizio Armonix non trovato: indica il pid con --pid")
+        return 1
+    pattern = DUMP_PATTERN.format(pid=pid).split("%", 1)[0] + "*"
+    before = set(glob.glob(pattern))
+    try:
+        os.kill(pid, signal.SIGUSR2)
+    except OSError as exc:
+        print(f"Impossibile inviare SIGUSR2 al pid {pid}: {exc}")
+        return 1
+    deadline = time.monotonic() + args.timeout
+    while time.monotonic() < deadline:
+        new = sorted(set(glob.glob(pattern)) - before)
+        if new:
+            print(new[-1])
+            return 0
+        time.sleep(0.05)
+    print(f"Nessuna traccia scritta dal pid {pid} (trace_size = 0?)")
+    return 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m midi_trace",
+        description="Scarica la traccia MIDI in memoria di un servizio Armonix",
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+    dmp = sub.add_parser("dump", help="chiede al servizio di scrivere la traccia su file")
+    dmp.add_argument("--pid", type=int, help="pid del servizio (default: cercato con pgrep)")
+    dmp.add_argument("--timeout", type=float, default=2.0)
+    dmp.set_defaults(func=_cmd_dump)
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
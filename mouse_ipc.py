@@ -1,18 +1,39 @@
-"""Mouse control IPC helpers for Armonix."""
+"""Mouse control IPC helpers for Armonix.
+
+Protocollo: ogni comando è un oggetto JSON su una riga terminata da
+``\n`` (``{"action": "press", "x": 100, "y": 50}``); una singola scrittura
+può contenere più righe.  Il client tiene la connessione aperta e si
+riconnette da solo; il server gestisce più client con un selector.  Un
+oggetto JSON senza ``\n`` finale seguito dalla chiusura della connessione
+(vecchi client) viene comunque eseguito.
+
+I clic vengono iniettati da un backend scelto all'avvio del server, dal più
+veloce al più lento: XTest (connessione X11 persistente via ``libXtst``)
+oppure due processi ``xdotool`` per evento.  Un processo ``xdotool -``
+persistente non è utilizzabile: in modalità script xdotool legge stdin fino
+a EOF prima di eseguire qualsiasi comando.
+"""
 
 from __future__ import annotations
 
+import ctypes
+import ctypes.util
 import json
 import logging
 import os
+import selectors
 import socket
 import subprocess
 import threading
-from typing import Optional
+from typing import Callable, Dict, Iterable, Optional, Tuple
 
 
 SOCKET_PATH = "/tmp/armonix-mouse.sock"
 
+# Comandi ammessi e limite del buffer per client (righe troppo lunghe = client non valido).
+MOUSE_ACTIONS = ("press", "release")
+MAX_BUFFER = 64 * 1024
+
 
 def _ensure_logger(logger: Optional[logging.Logger]) -> logging.Logger:
     if logger is not None:
@@ -20,13 +41,117 @@ def _ensure_logger(logger: Optional[logging.Logger]) -> logging.Logger:
     return logging.getLogger("armonix.mouse")
 
 
+def encode_commands(commands: Iterable[Tuple[str, int, int]]) -> bytes:
+    """Codifica ``(action, x, y)`` come righe JSON pronte per una sola ``sendall``."""
+    return b"".join(
+        json.dumps({"action": action, "x": int(x), "y": int(y)}).encode("utf-8") + b"\n"
+        for action, x, y in commands
+    )
+
+
+class MouseInjector:
+    """Backend che muove il puntatore e preme/rilascia il tasto sinistro."""
+
+    name = "none"
+
+    def button(self, x: int, y: int, down: bool) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class XTestInjector(MouseInjector):
+    """Eventi XTest su una connessione X11 aperta una volta sola (ctypes)."""
+
+    name = "xtest"
+
+    def __init__(self, display_name: Optional[str] = None):
+        xlib_path = ctypes.util.find_library("X11")
+        xtst_path = ctypes.util.find_library("Xtst")
+        if not xlib_path or not xtst_path:
+            raise OSError("libX11/libXtst non disponibili")
+        self._xlib = ctypes.CDLL(xlib_path)
+        self._xtst = ctypes.CDLL(xtst_path)
+        self._xlib.XOpenDisplay.restype = ctypes.c_void_p
+        self._xlib.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        self._xlib.XFlush.argtypes = [ctypes.c_void_p]
+        self._xlib.XCloseDisplay.argtypes = [ctypes.c_void_p]
+        self._xtst.XTestFakeMotionEvent.argtypes = [
+            ctypes.c_void_p, ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_ulong,
+        ]
+        self._xtst.XTestFakeButtonEvent.argtypes = [
+            ctypes.c_void_p, ctypes.c_uint, ctypes.c_int, ctypes.c_ulong,
+        ]
+        name = display_name.encode() if display_name else None
+        self._display = self._xlib.XOpenDisplay(name)
+        if not self._display:
+            raise OSError("impossibile aprire il display X11")
+
+    def button(self, x: int, y: int, down: bool) -> None:
+        # screen -1 = schermo corrente, delay 0 = immediato.
+        self._xtst.XTestFakeMotionEvent(self._display, -1, x, y, 0)
+        self._xtst.XTestFakeButtonEvent(self._display, 1, 1 if down else 0, 0)
+        self._xlib.XFlush(self._display)
+
+    def close(self) -> None:
+        if self._display:
+            self._xlib.XCloseDisplay(self._display)
+            self._display = None
+
+
+class XdotoolInjector(MouseInjector):
+    """Due processi ``xdotool`` per evento (comportamento storico)."""
+
+    name = "xdotool"
+
+    def button(self, x: int, y: int, down: bool) -> None:
+        button_action = "mousedown" if down else "mouseup"
+        subprocess.run(["xdotool", "mousemove", str(x), str(y)], check=True)
+        subprocess.run(["xdotool", button_action, "1"], check=True)
+
+
+# Backend in ordine di preferenza (dal più veloce).
+INJECTORS: Dict[str, Callable[[], MouseInjector]] = {
+    "xtest": XTestInjector,
+    "xdotool": XdotoolInjector,
+}
+
+
+def create_injector(
+    preferred: Optional[Iterable[str]] = None, logger: Optional[logging.Logger] = None
+) -> MouseInjector:
+    """Restituisce il primo backend di ``preferred`` (default: tutti) che si avvia."""
+    log = _ensure_logger(logger)
+    for name in preferred or INJECTORS:
+        factory = INJECTORS.get(name)
+        if factory is None:
+            log.warning("Backend mouse sconosciuto: %s", name)
+            continue
+        try:
+            injector = factory()
+        except Exception as exc:
+            log.debug("Backend mouse %s non disponibile: %s", name, exc)
+            continue
+        log.info("Backend mouse: %s", injector.name)
+        return injector
+    return XdotoolInjector()
+
+
 class MouseCommandServer:
-    """Background server executing mouse commands via xdotool."""
+    """Background server executing mouse commands through a :class:`MouseInjector`."""
 
-    def __init__(self, socket_path: str = SOCKET_PATH, logger: Optional[logging.Logger] = None):
+    def __init__(
+        self,
+        socket_path: str = SOCKET_PATH,
+        logger: Optional[logging.Logger] = None,
+        injector: Optional[MouseInjector] = None,
+    ):
         self.socket_path = socket_path
         self.logger = _ensure_logger(logger)
+        self.injector = injector
         self._server_socket: Optional[socket.socket] = None
+        self._selector: Optional[selectors.BaseSelector] = None
         self._thread: Optional[threading.Thread] = None
         self._stop_event = threading.Event()
 
@@ -37,6 +162,8 @@ class MouseCommandServer:
             return
 
         self._stop_event.clear()
+        if self.injector is None:
+            self.injector = create_injector(logger=self.logger)
 
         if self.socket_path:
             try:
@@ -52,10 +179,13 @@ class MouseCommandServer:
             os.chmod(self.socket_path, 0o666)
         except OSError as exc:
             self.logger.warning("Impossibile impostare i permessi del socket %s: %s", self.socket_path, exc)
-        server_socket.listen(1)
-        server_socket.settimeout(1.0)
+        server_socket.listen(8)
+        server_socket.setblocking(False)
         self._server_socket = server_socket
 
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(server_socket, selectors.EVENT_READ, None)
+
         self._thread = threading.Thread(target=self._serve_forever, name="ArmonixMouseServer", daemon=True)
         self._thread.start()
         self.logger.debug("Mouse IPC server avviato su %s", self.socket_path)
@@ -64,18 +194,20 @@ class MouseCommandServer:
         """Stop the server and clean up resources."""
 
         self._stop_event.set()
-        if self._server_socket is not None:
-            try:
-                self._server_socket.shutdown(socket.SHUT_RDWR)
-            except OSError:
-                pass
-            self._server_socket.close()
-            self._server_socket = None
-
         if self._thread is not None:
             self._thread.join(timeout=1.0)
             self._thread = None
 
+        if self._selector is not None:
+            for key in list(self._selector.get_map().values()):
+                key.fileobj.close()
+            self._selector.close()
+            self._selector = None
+        self._server_socket = None
+        if self.injector is not None:
+            self.injector.close()
+            self.injector = None
+
         if self.socket_path:
             try:
                 os.unlink(self.socket_path)
@@ -87,43 +219,88 @@ class MouseCommandServer:
         self.logger.debug("Mouse IPC server arrestato")
 
     def _serve_forever(self) -> None:
-        assert self._server_socket is not None
+        assert self._selector is not None
+        selector = self._selector
         while not self._stop_event.is_set():
             try:
-                client, _ = self._server_socket.accept()
-            except socket.timeout:
-                continue
+                events = selector.select(timeout=0.5)
             except OSError:
                 if self._stop_event.is_set():
                     break
                 self.logger.exception("Errore durante l'attesa di connessioni IPC mouse")
                 break
-
-            with client:
-                try:
-                    payload = client.recv(4096)
-                    if not payload:
-                        continue
-                    message = json.loads(payload.decode("utf-8"))
-                    action = message.get("action")
-                    x = int(message.get("x"))
-                    y = int(message.get("y"))
-                except Exception as exc:  # pragma: no cover - defensive programming
-                    self.logger.warning("Richiesta IPC mouse non valida: %s", exc)
-                    continue
-
-                if action == "press":
-                    self._execute_mouse_command(x, y, down=True)
-                elif action == "release":
-                    self._execute_mouse_command(x, y, down=False)
+            for key, _mask in events:
+                if key.data is None:
+                    self._accept(key.fileobj)
                 else:
-                    self.logger.warning("Azione mouse sconosciuta: %s", action)
+                    self._read(key.fileobj, key.data)
+
+    def _accept(self, server_socket: socket.socket) -> None:
+        try:
+            client, _ = server_socket.accept()
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            self.logger.exception("Errore durante l'accettazione di una connessione IPC mouse")
+            return
+        client.setblocking(False)
+        assert self._selector is not None
+        self._selector.register(client, selectors.EVENT_READ, bytearray())
+
+    def _close_client(self, client: socket.socket) -> None:
+        if self._selector is not None:
+            try:
+                self._selector.unregister(client)
+            except (KeyError, ValueError):
+                pass
+        client.close()
+
+    def _read(self, client: socket.socket, buffer: bytearray) -> None:
+        try:
+            chunk = client.recv(4096)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            chunk = b""
+        if not chunk:
+            # Connessione chiusa: esegue un eventuale comando senza "\n" finale.
+            if buffer.strip():
+                self._handle_line(bytes(buffer))
+            self._close_client(client)
+            return
+        buffer.extend(chunk)
+        while True:
+            end = buffer.find(b"\n")
+            if end < 0:
+                break
+            line = bytes(buffer[:end])
+            del buffer[:end + 1]
+            if line.strip():
+                self._handle_line(line)
+        if len(buffer) > MAX_BUFFER:
+            self.logger.warning("Richiesta IPC mouse troppo lunga: connessione chiusa")
+            self._close_client(client)
+
+    def _handle_line(self, line: bytes) -> None:
+        try:
+            message = json.loads(line.decode("utf-8"))
+            action = message.get("action")
+            x = int(message.get("x"))
+            y = int(message.get("y"))
+        except Exception as exc:  # pragma: no cover - defensive programming
+            self.logger.warning("Richiesta IPC mouse non valida: %s", exc)
+            return
+
+        if action == "press":
+            self._execute_mouse_command(x, y, down=True)
+        elif action == "release":
+            self._execute_mouse_command(x, y, down=False)
+        else:
+            self.logger.warning("Azione mouse sconosciuta: %s", action)
 
     def _execute_mouse_command(self, x: int, y: int, *, down: bool) -> None:
-        button_action = "mousedown" if down else "mouseup"
         try:
-            subprocess.run(["xdotool", "mousemove", str(x), str(y)], check=True)
-            subprocess.run(["xdotool", button_action, "1"], check=True)
+            self.injector.button(x, y, down)
         except Exception as exc:  # pragma: no cover - external dependency
             if down:
                 self.logger.error("Impossibile simulare pressione mouse (%s, %s): %s", x, y, exc)
@@ -131,17 +308,76 @@ class MouseCommandServer:
                 self.logger.error("Impossibile simulare rilascio mouse (%s, %s): %s", x, y, exc)
 
 
+class MouseCommandClient:
+    """Connessione persistente verso :class:`MouseCommandServer`.
+
+    La connessione viene aperta al primo invio e riaperta automaticamente
+    (un tentativo) se il server è stato riavviato.
+    """
+
+    def __init__(self, socket_path: str = SOCKET_PATH, logger: Optional[logging.Logger] = None):
+        self.socket_path = socket_path
+        self.logger = _ensure_logger(logger)
+        self._sock: Optional[socket.socket] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            raise
+        self._sock = sock
+        return sock
+
+    def _disconnect(self) -> None:
+        sock, self._sock = self._sock, None
+        if sock is not None:
+            sock.close()
+
+    def send(self, commands: Iterable[Tuple[str, int, int]], *, logger: Optional[logging.Logger] = None) -> bool:
+        """Invia uno o più comandi ``(action, x, y)`` con una sola scrittura."""
+        log = logger or self.logger
+        payload = encode_commands(commands)
+        if not payload:
+            return True
+        with self._lock:
+            for attempt in (0, 1):
+                try:
+                    sock = self._sock or self._connect()
+                    sock.sendall(payload)
+                    return True
+                except FileNotFoundError:
+                    self._disconnect()
+                    log.error("Socket IPC mouse non disponibile (%s)", self.socket_path)
+                    return False
+                except OSError as exc:
+                    self._disconnect()
+                    if attempt:
+                        log.error("Errore nella comunicazione con il servizio GUI per il mouse: %s", exc)
+        return False
+
+    def close(self) -> None:
+        with self._lock:
+            self._disconnect()
+
+
+_client: Optional[MouseCommandClient] = None
+_client_lock = threading.Lock()
+
+
+def get_mouse_client() -> MouseCommandClient:
+    """Client condiviso usato dai filtri (una connessione per processo)."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = MouseCommandClient()
+        return _client
+
+
 def _send_mouse_command(action: str, x: int, y: int, *, logger: Optional[logging.Logger] = None) -> None:
-    log = _ensure_logger(logger)
-    try:
-        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
-            sock.connect(SOCKET_PATH)
-            payload = json.dumps({"action": action, "x": int(x), "y": int(y)}).encode("utf-8")
-            sock.sendall(payload)
-    except FileNotFoundError:
-        log.error("Socket IPC mouse non disponibile (%s)", SOCKET_PATH)
-    except OSError as exc:
-        log.error("Errore nella comunicazione con il servizio GUI per il mouse: %s", exc)
+    get_mouse_client().send([(action, x, y)], logger=_ensure_logger(logger))
 
 
 def send_mouse_press(x: int, y: int, *, logger: Optional[logging.Logger] = None) -> None:
@@ -15,6 +15,7 @@ if sys.platform == "darwin":
         os.path.expanduser("~/Library/Application Support"), "armonix"
     )
     SYSTEM_CONFIG_DIR = "/Library/Application Support/armonix"
+    USER_CACHE_DIR = os.path.join(os.path.expanduser("~/Library/Caches"), "armonix")
 else:
     # Linux: segue le specifiche XDG.
     USER_CONFIG_DIR = os.path.join(
@@ -22,6 +23,10 @@ else:
         "armonix",
     )
     SYSTEM_CONFIG_DIR = "/etc/armonix"
+    USER_CACHE_DIR = os.path.join(
+        os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")),
+        "armonix",
+    )
 
 # Directory that always contains the pristine configuration files installed
 # together with the Python modules.  Used as last-resort fallback.
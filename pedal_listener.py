@@ -4,10 +4,17 @@ Il dispositivo invia CC standard:
   CC 64 (sustain)   : 0-127  (pedale destro, valore continuo)
   CC 66 (sostenuto) : 0 o 127  (pedale centrale, binario)
   CC 67 (una corda) : 0 o 127  (pedale sinistro, binario)
+
+I pedali con una voce ``"decimation"`` in ``pedals_config.json`` passano da
+:class:`PedalDecimator`: i valori arrivati nello stesso batch di
+``iter_pending`` vengono fusi (vince l'ultimo), poi si applicano banda
+morta e frequenza massima; l'ultimo valore trattenuto viene comunque
+inviato quando il pedale si ferma.
 """
 
 import logging
 import threading
+import time
 
 import mido
 
@@ -21,15 +28,119 @@ CC_TO_PEDAL = {
 }
 
 
+# Attesa del loop tra due batch di iter_pending (secondi).
+POLL_INTERVAL = 0.005
+
+
+class PedalDecimator:
+    """Riduce il flusso di valori di un pedale continuo.
+
+    deadband  : variazioni più piccole di questo valore vengono trattenute
+    max_rate  : massimo numero di invii al secondo (0 = nessun limite)
+    settle_ms : dopo questa pausa senza nuovi valori, il valore trattenuto
+                viene inviato comunque (valore finale garantito)
+
+    Gli estremi 0 e 127 (pedale rilasciato / a fondo) passano sempre subito.
+    """
+
+    def __init__(self, deadband=0, max_rate=0, settle_ms=30):
+        self.deadband = max(0, int(deadband))
+        self.min_interval = 1.0 / max_rate if max_rate and max_rate > 0 else 0.0
+        self.settle = max(0.0, settle_ms / 1000.0)
+        self.last_value = None
+        self.last_sent = float("-inf")
+        self.last_input = float("-inf")
+        self.pending = None
+
+    @classmethod
+    def from_config(cls, cfg):
+        return cls(
+            deadband=cfg.get("deadband", 0),
+            max_rate=cfg.get("max_rate", 0),
+            settle_ms=cfg.get("settle_ms", 30),
+        )
+
+    def carry_over(self, previous):
+        """Riprende lo stato di ``previous`` (ultimo inviato e valore trattenuto)."""
+        if previous is None:
+            return
+        self.last_value = previous.last_value
+        self.last_sent = previous.last_sent
+        self.last_input = previous.last_input
+        self.pending = previous.pending
+
+    def _accept(self, value, now):
+        self.last_value = value
+        self.last_sent = now
+        self.pending = None
+        return value
+
+    def offer(self, value, now):
+        """Restituisce il valore da inviare subito, oppure None se trattenuto."""
+        self.last_input = now
+        if value == self.last_value:
+            self.pending = None
+            return None
+        if value not in (0, 127):
+            if self.last_value is not None and abs(value - self.last_value) < self.deadband:
+                self.pending = value
+                return None
+            if now - self.last_sent < self.min_interval:
+                self.pending = value
+                return None
+        return self._accept(value, now)
+
+    def due(self, now):
+        """Valore trattenuto da inviare ora che il pedale si è fermato (o None)."""
+        if self.pending is None:
+            return None
+        if now - self.last_input < self.settle or now - self.last_sent < self.min_interval:
+            return None
+        return self._accept(self.pending, now)
+
+
 class PedalListener(threading.Thread):
     """Ascolta una porta MIDI e chiama callback(pedal_key, value) per CC 64/66/67."""
 
-    def __init__(self, port_name, callback, stop_event, verbose=False):
+    def __init__(self, port_name, callback, stop_event, verbose=False, decimation=None):
         super().__init__(daemon=True, name="pedal-listener")
         self.port_name = port_name
         self.callback = callback
         self.stop_event = stop_event
         self.verbose = verbose
+        # pedal_key -> PedalDecimator (solo per i pedali configurati)
+        self.decimators = {
+            key: PedalDecimator.from_config(cfg) for key, cfg in (decimation or {}).items()
+        }
+        self._next_decimation = None
+        self._decimation_lock = threading.Lock()
+
+    def set_decimation(self, decimation):
+        """Sostituisce la configurazione di decimazione (es. pedals_config.json ricaricato).
+
+        Il cambio avviene nel thread del listener prima del batch successivo:
+        i nuovi decimatori riprendono ultimo valore inviato e valore
+        trattenuto, e un pedale non più decimato invia subito il valore che
+        stava trattenendo.
+        """
+        with self._decimation_lock:
+            self._next_decimation = dict(decimation or {})
+
+    def _apply_decimation(self):
+        with self._decimation_lock:
+            decimation, self._next_decimation = self._next_decimation, None
+        if decimation is None:
+            return
+        old = self.decimators
+        new = {}
+        for key, cfg in decimation.items():
+            decimator = PedalDecimator.from_config(cfg)
+            decimator.carry_over(old.get(key))
+            new[key] = decimator
+        self.decimators = new
+        for key, decimator in old.items():
+            if key not in new and decimator.pending is not None:
+                self.callback(key, decimator.pending)
 
     def run(self):
         while not self.stop_event.is_set():
@@ -38,15 +149,19 @@ class PedalListener(threading.Thread):
                     if self.verbose:
                         logger.debug("Pedali MIDI: connesso a %s", self.port_name)
                     while not self.stop_event.is_set():
+                        self._apply_decimation()
+                        batch = {}
                         for msg in port.iter_pending():
-                            self._process(msg)
-                        self.stop_event.wait(0.005)
+                            self._process(msg, batch)
+                        if self.decimators:
+                            self._emit_decimated(batch, time.monotonic())
+                        self.stop_event.wait(POLL_INTERVAL)
             except Exception as exc:
                 if not self.stop_event.is_set():
                     logger.warning("Pedali MIDI: errore (%s), riprovo...", exc)
                     self.stop_event.wait(2.0)
 
-    def _process(self, msg):
+    def _process(self, msg, batch):
         if msg.type != "control_change":
             return
         pedal_key = CC_TO_PEDAL.get(msg.control)
@@ -54,4 +169,17 @@ class PedalListener(threading.Thread):
             return
         if self.verbose:
             logger.debug("Pedale %s: %d", pedal_key, msg.value)
+        if pedal_key in self.decimators:
+            # Fusione del batch: conta solo l'ultimo valore ricevuto.
+            batch[pedal_key] = msg.value
+            return
         self.callback(pedal_key, msg.value)
+
+    def _emit_decimated(self, batch, now):
+        for pedal_key, decimator in self.decimators.items():
+            if pedal_key in batch:
+                value = decimator.offer(batch[pedal_key], now)
+            else:
+                value = decimator.due(now)
+            if value is not None:
+                self.callback(pedal_key, value)
@@ -1,49 +1,262 @@
-"""Helper per avviare Pianoteq se non è già in esecuzione."""
+"""Supervisione del processo Pianoteq.
 
+:class:`PianoteqSupervisor` ricorda il PID del Pianoteq avviato da Armonix
+(o trovato una sola volta con ``pgrep``) e ne controlla lo stato senza
+lanciare sottoprocessi: ``waitpid`` non bloccante per il processo figlio,
+``pidfd`` (o ``kill(pid, 0)``) per un processo avviato da altri.  Un thread
+di sonda interroga il server JSON-RPC con backoff e segnala quando
+risponde, così i cambi di modalità non costano nulla una volta che
+Pianoteq è attivo.  Se il processo l'ha avviato Armonix, finché la sonda non
+ha successo le richieste del client condiviso (:func:`pianoteq_rpc.get_client`)
+restano in coda, tenendo solo l'ultima per tipo; un Pianoteq avviato da
+altri potrebbe non avere ``--serve`` e le richieste partono subito.
+"""
+
+import os
+import select
 import shlex
 import subprocess
+import threading
+import time
+import urllib.parse
 
+# Sonda JSON-RPC dopo l'avvio: primo intervallo, fattore di crescita,
+# intervallo massimo e durata complessiva (secondi).
+RPC_PROBE_INITIAL = 0.05
+RPC_PROBE_BACKOFF = 1.5
+RPC_PROBE_MAX_INTERVAL = 1.0
+RPC_PROBE_TIMEOUT = 30.0
 
-def ensure_pianoteq_running(config, logger):
-    """Avvia Pianoteq se non è già in esecuzione.
 
-    Con l'architettura a porta virtuale "Armonix", non è necessario attendere
-    che Pianoteq esponga la propria porta ALSA: le note arrivano alla porta
-    virtuale indipendentemente.  Questa funzione si limita a:
+def serve_address(jsonrpc_url):
+    """Indirizzo ``host:porta`` per ``--serve``, ricavato da ``jsonrpc_url``.
 
-    1. Verificare se il processo è già attivo (pgrep) → True immediato.
-    2. Lanciarlo in background se l'eseguibile è configurato → True immediato.
-    3. Restituire False solo se l'eseguibile non è configurato.
+    Usa le stesse regole di :class:`pianoteq_rpc.PianoteqRpcClient`, così
+    Pianoteq ascolta esattamente dove il client si collega.
     """
-    # 1. Processo già in esecuzione → niente da fare.
-    if config.executable:
+    parts = urllib.parse.urlsplit(jsonrpc_url)
+    return f"{parts.hostname or '127.0.0.1'}:{parts.port or 80}"
+
+
+class PianoteqSupervisor:
+    """Tiene traccia del processo Pianoteq e della disponibilità del suo JSON-RPC."""
+
+    def __init__(self, config, logger):
+        self.config = config
+        self.logger = logger
+        self._lock = threading.Lock()
+        self._proc = None      # Popen se il processo l'abbiamo avviato noi
+        self._pid = None
+        self._pidfd = None
+        self._poller = None
+        self._rpc_ready = threading.Event()
+        self._probe_thread = None
+
+    # --- stato del processo ---------------------------------------------
+
+    @property
+    def pid(self):
+        return self._pid
+
+    def _forget(self):
+        if self._pidfd is not None:
+            try:
+                os.close(self._pidfd)
+            except OSError:
+                pass
+        self._proc = None
+        self._pid = None
+        self._pidfd = None
+        self._poller = None
+        self._rpc_ready.clear()
+
+    def _track(self, pid, proc=None):
+        self._forget()
+        self._proc = proc
+        self._pid = pid
+        if proc is None and hasattr(os, "pidfd_open"):
+            try:
+                self._pidfd = os.pidfd_open(pid)
+                self._poller = select.poll()
+                self._poller.register(self._pidfd, select.POLLIN)
+            except OSError:
+                self._pidfd = None
+                self._poller = None
+
+    def _alive(self):
+        if self._pid is None:
+            return False
+        if self._proc is not None:
+            # waitpid(WNOHANG): raccoglie anche lo zombie se è terminato.
+            return self._proc.poll() is None
+        if self._poller is not None:
+            # Il pidfd diventa leggibile quando il processo termina.
+            return not self._poller.poll(0)
+        try:
+            os.kill(self._pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    def is_running(self):
+        """True se il processo tracciato è vivo (nessun sottoprocesso lanciato)."""
+        with self._lock:
+            if self._pid is not None and not self._alive():
+                self.logger.info("Processo Pianoteq (pid %s) terminato", self._pid)
+                self._forget()
+            return self._pid is not None
+
+    @property
+    def rpc_ready(self):
+        """True quando il server JSON-RPC ha risposto almeno una volta."""
+        return self._rpc_ready.is_set() and self.is_running()
+
+    def wait_rpc_ready(self, timeout=None):
+        return self._rpc_ready.wait(timeout)
+
+    # --- ricerca e avvio ----------------------------------------------------
+
+    def _find_existing(self):
+        """Cerca un Pianoteq già attivo con pgrep (una volta, finché resta vivo)."""
         try:
             result = subprocess.run(
-                ["pgrep", "-f", config.executable],
+                ["pgrep", "-f", self.config.executable],
                 capture_output=True,
+                text=True,
             )
-            if result.returncode == 0:
-                logger.debug("Processo Pianoteq già in esecuzione.")
-                return True
         except FileNotFoundError:
-            pass  # pgrep non disponibile, prosegui con l'avvio diretto
-
-    if not config.executable:
-        logger.warning("Pianoteq executable non configurato")
-        return False
-
-    # 2. Avvia Pianoteq in background senza attendere la porta ALSA.
-    extra = shlex.split(config.options) if config.options.strip() else []
-    cmd = [config.executable, "--serve", "127.0.0.1:8081"] + extra
-    logger.info("Avvio Pianoteq: %s", " ".join(cmd))
-    try:
-        subprocess.Popen(
-            cmd,
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
+            return None  # pgrep non disponibile, prosegui con l'avvio diretto
+        if result.returncode != 0:
+            return None
+        own = os.getpid()
+        for line in result.stdout.split():
+            try:
+                pid = int(line)
+            except ValueError:
+                continue
+            if pid != own:
+                return pid
+        return None
+
+    def _launch(self):
+        extra = shlex.split(self.config.options) if self.config.options.strip() else []
+        cmd = [self.config.executable, "--serve", serve_address(self.config.jsonrpc_url)] + extra
+        self.logger.info("Avvio Pianoteq: %s", " ".join(cmd))
+        try:
+            proc = subprocess.Popen(
+                cmd,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+        except Exception as exc:
+            self.logger.error("Impossibile avviare Pianoteq: %s", exc)
+            return False
+        self._track(proc.pid, proc)
+        return True
+
+    def ensure_running(self):
+        """Avvia Pianoteq se non è già in esecuzione.
+
+        Con un processo già tracciato e vivo la risposta arriva dalla memoria.
+        Con l'architettura a porta virtuale "Armonix" non serve attendere la
+        porta ALSA di Pianoteq; False solo se l'eseguibile non è configurato
+        o l'avvio fallisce.
+        """
+        if self.is_running():
+            return True
+        if not self.config.executable:
+            self.logger.warning("Pianoteq executable non configurato")
+            return False
+        with self._lock:
+            if self._pid is None:
+                pid = self._find_existing()
+                if pid is not None:
+                    self.logger.debug("Processo Pianoteq già in esecuzione (pid %s).", pid)
+                    self._track(pid)
+                elif not self._launch():
+                    return False
+            launched = self._proc is not None
+        self._start_probe(hold=launched)
+        return True
+
+    def _start_probe(self, hold):
+        if self._rpc_ready.is_set():
+            return
+        if self._probe_thread is not None and self._probe_thread.is_alive():
+            return
+        from pianoteq_rpc import get_client
+
+        # Le richieste arrivate prima che --serve sia in ascolto aspettano,
+        # ma solo se l'abbiamo avviato noi: un Pianoteq esterno senza
+        # --serve le terrebbe bloccate per RPC_PROBE_TIMEOUT.
+        if hold:
+            get_client(self.config.jsonrpc_url).hold()
+        self._probe_thread = threading.Thread(
+            target=self._probe, daemon=True, name="pianoteq-probe"
         )
-    except Exception as exc:
-        logger.error("Impossibile avviare Pianoteq: %s", exc)
-        return False
+        self._probe_thread.start()
+
+    def _probe(self):
+        from pianoteq_rpc import PianoteqRpcClient, RpcError, get_client
+
+        client = PianoteqRpcClient(self.config.jsonrpc_url, timeout=1.0, logger=self.logger)
+        started = time.monotonic()
+        deadline = started + RPC_PROBE_TIMEOUT
+        interval = RPC_PROBE_INITIAL
+        try:
+            while time.monotonic() < deadline and self.is_running():
+                try:
+                    client.call("getInfo")
+                except RpcError:
+                    time.sleep(interval)
+                    interval = min(interval * RPC_PROBE_BACKOFF, RPC_PROBE_MAX_INTERVAL)
+                    continue
+                self._rpc_ready.set()
+                self.logger.info(
+                    "Pianoteq JSON-RPC pronto (pid %s) dopo %.2f s",
+                    self._pid,
+                    time.monotonic() - started,
+                )
+                return
+            if self.is_running():
+                self.logger.warning(
+                    "Pianoteq JSON-RPC non risponde dopo %.0f s", RPC_PROBE_TIMEOUT
+                )
+        finally:
+            client.close()
+            # Pronto o no, le richieste trattenute ripartono (in caso di
+            # errore verranno loggate dal client); senza hold non fa nulla.
+            get_client(self.config.jsonrpc_url).release()
+
+
+_supervisors = {}
+_supervisors_lock = threading.Lock()
+
+
+def get_supervisor(config, logger):
+    """Supervisore condiviso per l'eseguibile configurato."""
+    with _supervisors_lock:
+        key = (config.executable, config.options, config.jsonrpc_url)
+        supervisor = _supervisors.get(key)
+        if supervisor is None:
+            supervisor = _supervisors[key] = PianoteqSupervisor(config, logger)
+        return supervisor
+
+
+def ensure_pianoteq_running(config, logger):
+    """Avvia Pianoteq se non è già in esecuzione (vedi :class:`PianoteqSupervisor`)."""
+    return get_supervisor(config, logger).ensure_running()
+
 
-    return True
+def prelaunch_pianoteq(config, logger):
+    """Avvia Pianoteq in background all'avvio del motore (opzione ``prelaunch``)."""
+    thread = threading.Thread(
+        target=ensure_pianoteq_running,
+        args=(config, logger),
+        daemon=True,
+        name="pianoteq-prelaunch",
+    )
+    thread.start()
+    return thread
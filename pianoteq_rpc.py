@@ -1,33 +1,201 @@
-"""Client JSON-RPC minimale per Pianoteq."""
+"""Client JSON-RPC per Pianoteq.
 
+:class:`PianoteqRpcClient` mantiene una connessione HTTP persistente
+(keep-alive) verso il server JSON-RPC di Pianoteq ed esegue le richieste su
+un thread worker, così i listener MIDI non restano bloccati in attesa della
+risposta.  Le richieste con la stessa chiave si sostituiscono finché sono in
+coda: se arrivano più cambi di preset mentre Pianoteq è occupato, viene
+caricato solo l'ultimo.  Durante l'avvio di Pianoteq la coda può essere
+trattenuta (:meth:`PianoteqRpcClient.hold`) finché il server non risponde.
+"""
+
+import collections
+import http.client
+import itertools
 import json
 import logging
-import urllib.request
+import threading
+import urllib.parse
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_URL = "http://127.0.0.1:8081/jsonrpc"
 
-def load_preset(url, preset_name, timeout=2.0):
-    """Invia loadPreset a Pianoteq via JSON-RPC. Restituisce True se riuscito."""
-    payload = json.dumps({
-        "jsonrpc": "2.0",
-        "method": "loadPreset",
-        "params": [preset_name],
-        "id": 1,
-    }).encode()
-    try:
-        req = urllib.request.Request(
-            url,
-            data=payload,
-            headers={"Content-Type": "application/json"},
-        )
-        with urllib.request.urlopen(req, timeout=timeout) as resp:
-            result = json.loads(resp.read())
-        if "error" in result:
-            logger.error("Pianoteq loadPreset errore: %s", result["error"])
+
+class RpcError(Exception):
+    """Errore restituito da Pianoteq o problema di connessione."""
+
+
+class PianoteqRpcClient:
+    """Connessione JSON-RPC persistente con worker e coda "vince l'ultimo"."""
+
+    def __init__(self, url=DEFAULT_URL, timeout=2.0, logger=None):
+        self.url = url
+        self.timeout = timeout
+        self.logger = logger or logging.getLogger(__name__)
+        parts = urllib.parse.urlsplit(url)
+        self._host = parts.hostname or "127.0.0.1"
+        self._port = parts.port or 80
+        self._path = parts.path or "/"
+        self._conn = None
+        self._conn_lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+        self._pending = collections.OrderedDict()
+        self._cond = threading.Condition()
+        self._worker = None
+        self._closed = False
+        self._held = False
+
+    # --- chiamate sincrone -------------------------------------------------
+
+    def _connection(self):
+        if self._conn is None:
+            self._conn = http.client.HTTPConnection(self._host, self._port, timeout=self.timeout)
+        return self._conn
+
+    def _drop_connection(self):
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            conn.close()
+
+    def call(self, method, params=None):
+        """Esegue ``method`` e restituisce ``result``; solleva :class:`RpcError`."""
+        payload = json.dumps({
+            "jsonrpc": "2.0",
+            "method": method,
+            "params": params or [],
+            "id": next(self._ids),
+        }).encode()
+        headers = {"Content-Type": "application/json", "Connection": "keep-alive"}
+        with self._conn_lock:
+            # Un secondo tentativo se la connessione tenuta aperta è stata
+            # chiusa dal server (Pianoteq riavviato, timeout keep-alive...).
+            for attempt in (0, 1):
+                try:
+                    conn = self._connection()
+                    conn.request("POST", self._path, body=payload, headers=headers)
+                    resp = conn.getresponse()
+                    body = resp.read()
+                    if resp.getheader("Connection", "").lower() == "close":
+                        self._drop_connection()
+                    break
+                except (http.client.HTTPException, OSError) as exc:
+                    self._drop_connection()
+                    if attempt:
+                        raise RpcError(f"Pianoteq JSON-RPC non raggiungibile: {exc}") from exc
+        try:
+            reply = json.loads(body)
+        except ValueError as exc:
+            raise RpcError(f"Risposta JSON-RPC non valida: {exc}") from exc
+        if "error" in reply:
+            raise RpcError(f"Pianoteq {method} errore: {reply['error']}")
+        return reply.get("result")
+
+    def load_preset(self, preset_name):
+        """Carica ``preset_name`` in modo sincrono. Restituisce True se riuscito."""
+        try:
+            self.call("loadPreset", [preset_name])
+        except RpcError as exc:
+            self.logger.error("%s", exc)
             return False
-        logger.info("Pianoteq preset caricato: %s", preset_name)
+        self.logger.info("Pianoteq preset caricato: %s", preset_name)
         return True
-    except Exception as exc:
-        logger.error("Pianoteq JSON-RPC non raggiungibile: %s", exc)
-        return False
+
+    # --- worker --------------------------------------------------------------
+
+    def submit(self, method, params=None, callback=None, key=None):
+        """Accoda una richiesta per il worker.
+
+        ``callback(ok, result)`` viene chiamata dal worker con il risultato
+        (o con il messaggio d'errore).  Una richiesta con la stessa ``key``
+        ancora in coda viene sostituita da questa.
+        """
+        key = key if key is not None else object()
+        with self._cond:
+            if self._closed:
+                return
+            self._pending[key] = (method, params, callback)
+            self._ensure_worker()
+            self._cond.notify()
+
+    def load_preset_async(self, preset_name, callback=None):
+        """Cambio preset non bloccante: vince l'ultima richiesta in coda."""
+
+        def done(ok, result):
+            if ok:
+                self.logger.info("Pianoteq preset caricato: %s", preset_name)
+            else:
+                self.logger.error("%s", result)
+            if callback is not None:
+                callback(ok, preset_name)
+
+        self.submit("loadPreset", [preset_name], done, key="loadPreset")
+
+    def set_parameters_async(self, parameters, callback=None):
+        """``setParameters`` non bloccante (lista di ``{"id": ..., "text"/"normalized_value": ...}``)."""
+        self.submit("setParameters", {"list": parameters}, callback, key="setParameters")
+
+    def hold(self):
+        """Trattiene le richieste in coda (es. Pianoteq in avvio)."""
+        with self._cond:
+            self._held = True
+
+    def release(self):
+        """Riprende l'esecuzione delle richieste trattenute (solo l'ultima per chiave)."""
+        with self._cond:
+            self._held = False
+            self._cond.notify()
+
+    @property
+    def held(self):
+        return self._held
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, daemon=True, name="pianoteq-rpc")
+            self._worker.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while (not self._pending or self._held) and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                _key, (method, params, callback) = self._pending.popitem(last=False)
+            try:
+                ok, result = True, self.call(method, params)
+            except RpcError as exc:
+                ok, result = False, str(exc)
+            if callback is not None:
+                try:
+                    callback(ok, result)
+                except Exception:
+                    self.logger.exception("Errore nella callback JSON-RPC di Pianoteq")
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._pending.clear()
+            self._cond.notify_all()
+        with self._conn_lock:
+            self._drop_connection()
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(url=DEFAULT_URL, timeout=2.0):
+    """Client condiviso per ``url`` (una connessione persistente per server)."""
+    with _clients_lock:
+        client = _clients.get(url)
+        if client is None:
+            client = _clients[url] = PianoteqRpcClient(url, timeout=timeout)
+        return client
+
+
+def load_preset(url, preset_name, timeout=2.0):
+    """Invia loadPreset a Pianoteq via JSON-RPC. Restituisce True se riuscito."""
+    return get_client(url, timeout).load_preset(preset_name)
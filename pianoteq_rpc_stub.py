@@ -0,0 +1,140 @@
+"""Server JSON-RPC locale che imita Pianoteq, per provare Armonix senza Pianoteq.
+
+Uso::
+
+    python -m pianoteq_rpc_stub --port 8081 --delay 0.5
+
+Risponde a ``loadPreset``, ``setParameters``, ``getInfo`` e
+``getListOfPresets`` su una connessione HTTP/1.1 keep-alive; ``--delay``
+simula un Pianoteq lento nel caricare i preset.  In codice::
+
+    with StubPianoteqServer(delay=0.2) as server:
+        client = PianoteqRpcClient(server.url)
+"""
+
+import argparse
+import http.server
+import json
+import socket
+import threading
+import time
+
+DEFAULT_PRESETS = ("NY Steinway D Classical", "Grand C. Bechstein", "Steinway Model D")
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        self.server.stub.connections.append(self.connection)
+
+    def do_POST(self):
+        stub = self.server.stub
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            request = json.loads(self.rfile.read(length))
+        except ValueError:
+            request = {}
+        reply = {"jsonrpc": "2.0", "id": request.get("id")}
+        method = request.get("method")
+        params = request.get("params") or []
+        stub.requests.append((method, params))
+
+        if method == "loadPreset":
+            if stub.delay:
+                time.sleep(stub.delay)
+            name = params[0] if params else None
+            if name in stub.presets:
+                stub.current_preset = name
+                reply["result"] = None
+            else:
+                reply["error"] = {"code": -32602, "message": f"preset not found: {name}"}
+        elif method == "setParameters":
+            stub.parameters.append(params)
+            reply["result"] = None
+        elif method == "getInfo":
+            reply["result"] = [{"current_preset": {"name": stub.current_preset}}]
+        elif method == "getListOfPresets":
+            reply["result"] = [{"name": name} for name in stub.presets]
+        else:
+            reply["error"] = {"code": -32601, "message": f"method not found: {method}"}
+
+        body = json.dumps(reply).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class StubPianoteqServer:
+    """Server JSON-RPC finto avviato su un thread in background."""
+
+    def __init__(self, host="127.0.0.1", port=0, delay=0.0, presets=DEFAULT_PRESETS):
+        self.delay = delay
+        self.presets = list(presets)
+        self.current_preset = self.presets[0] if self.presets else None
+        self.requests = []
+        self.parameters = []
+        # Socket di ogni connessione accettata (una per client keep-alive).
+        self.connections = []
+        self._httpd = http.server.ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.stub = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/jsonrpc"
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever, daemon=True, name="pianoteq-stub"
+        )
+        self._thread.start()
+        return self
+
+    def drop_connections(self):
+        """Chiude dal lato server le connessioni aperte (come un Pianoteq riavviato)."""
+        for conn in self.connections:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def stop(self):
+        self.drop_connections()
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Server JSON-RPC finto di Pianoteq")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--delay", type=float, default=0.0, help="ritardo di loadPreset in secondi")
+    args = parser.parse_args(argv)
+
+    server = StubPianoteqServer(args.host, args.port, delay=args.delay)
+    print(f"Pianoteq finto in ascolto su {server.url}")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
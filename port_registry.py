@@ -0,0 +1,169 @@
+"""Registro condiviso delle porte MIDI di uscita.
+
+Ogni destinazione (es. la porta Ketron) viene aperta una sola volta e
+condivisa da tutte le sorgenti: listener master, porta DAW, pedali, bridge
+BLE e tastierino.  Gli invii sono serializzati da un lock per porta, così più
+thread non scrivono mai contemporaneamente sullo stesso handle ALSA.
+"""
+
+import logging
+import threading
+import time
+
+import mido
+
+import latency
+import midi_recorder
+import midi_trace
+
+
+class SharedOutputPort:
+    """Handle thread-safe verso una porta MIDI di uscita.
+
+    La porta mido sottostante viene aperta al primo uso e, dopo
+    :meth:`invalidate` (hotplug) o un errore di invio, riaperta
+    automaticamente alla scrittura successiva.  Se l'apertura fallisce gli
+    invii non ritentano prima di :attr:`retry_interval` secondi o di un
+    :meth:`invalidate`: ogni tentativo crea un client rtmidi ed enumera le
+    porte, troppo per il thread MIDI a ogni messaggio.
+    """
+
+    retry_interval = 2.0
+
+    def __init__(self, name, logger, label=None):
+        self.name = name
+        # Nome breve della destinazione usato nelle statistiche di latenza.
+        self.label = label or name
+        self._logger = logger
+        self._lock = threading.Lock()
+        self._port = None
+        self._open_failed = False
+        self._retry_at = 0.0
+
+    def _open_locked(self):
+        try:
+            self._port = mido.open_output(self.name, exclusive=False)
+        except Exception as exc:
+            # Logga solo il primo fallimento per non inondare il journal
+            # a ogni messaggio mentre la porta è assente.
+            if not self._open_failed:
+                self._logger.error("Impossibile aprire la porta MIDI %s: %s", self.name, exc)
+            self._open_failed = True
+            self._port = None
+            self._retry_at = time.monotonic() + self.retry_interval
+        else:
+            if self._open_failed:
+                self._logger.info("Porta MIDI %s riaperta", self.name)
+            self._open_failed = False
+        return self._port
+
+    def _port_for_send_locked(self):
+        port = self._port
+        if port is None and time.monotonic() >= self._retry_at:
+            port = self._open_locked()
+        return port
+
+    def _close_locked(self):
+        port, self._port = self._port, None
+        if port is not None:
+            try:
+                port.close()
+            except Exception:
+                pass
+
+    @property
+    def is_open(self):
+        return self._port is not None
+
+    def open(self):
+        """Apre la porta se necessario; restituisce True se è utilizzabile."""
+        with self._lock:
+            return (self._port or self._open_locked()) is not None
+
+    def send(self, msg):
+        with self._lock:
+            port = self._port_for_send_locked()
+            if port is None:
+                return
+            try:
+                port.send(msg)
+                latency.sent(self.label)
+                midi_recorder.record(self.label, msg)
+                midi_trace.sent(self.label, msg)
+            except Exception as exc:
+                self._logger.error("Errore di invio sulla porta MIDI %s: %s", self.name, exc)
+                self._close_locked()
+
+    def send_bytes(self, data):
+        """Invia byte MIDI già codificati senza creare un ``mido.Message``.
+
+        Con il backend rtmidi i byte vanno direttamente a ``send_message``;
+        con altri backend vengono decodificati e inviati normalmente.
+        """
+        with self._lock:
+            port = self._port_for_send_locked()
+            if port is None:
+                return
+            try:
+                rt = getattr(port, "_rt", None)
+                if rt is not None:
+                    rt.send_message(data)
+                else:
+                    port.send(mido.Message.from_bytes(data))
+                latency.sent(self.label)
+                midi_recorder.record(self.label, data)
+                midi_trace.sent(self.label, data)
+            except Exception as exc:
+                self._logger.error("Errore di invio sulla porta MIDI %s: %s", self.name, exc)
+                self._close_locked()
+
+    def invalidate(self):
+        """Chiude la porta mido; verrà riaperta al prossimo invio, senza attesa."""
+        with self._lock:
+            self._close_locked()
+            self._retry_at = 0.0
+
+
+class OutputPortRegistry:
+    """Un :class:`SharedOutputPort` per nome di porta, creato su richiesta."""
+
+    def __init__(self, logger=None):
+        self.logger = logger or logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._ports = {}
+
+    def get(self, name, label=None):
+        """Restituisce l'handle condiviso per ``name`` (None se ``name`` è vuoto).
+
+        L'handle non viene aperto qui: lo apre il primo invio.
+        """
+        if not name:
+            return None
+        with self._lock:
+            handle = self._ports.get(name)
+            if handle is None:
+                handle = SharedOutputPort(name, self.logger, label)
+                self._ports[name] = handle
+        return handle
+
+    def register(self, name, handle):
+        """Installa un handle già pronto per ``name`` (es. una porta finta in replay)."""
+        with self._lock:
+            self._ports[name] = handle
+
+    def invalidate(self, name=None):
+        """Invalida la porta ``name`` (o tutte se ``name`` è None)."""
+        with self._lock:
+            if name is None:
+                handles = list(self._ports.values())
+            else:
+                handles = [self._ports[name]] if name in self._ports else []
+        for handle in handles:
+            handle.invalidate()
+
+    def close_all(self):
+        with self._lock:
+            handles = list(self._ports.values())
+            self._ports.clear()
+        for handle in handles:
+            handle.invalidate()
@@ -0,0 +1,107 @@
+"""Istantanea delle porte MIDI per un singolo giro di polling.
+
+``mido.get_input_names()``/``get_output_names()`` creano ogni volta un client
+ALSA temporaneo ed elencano tutte le porte: costo che cresce con il numero di
+porte BLE e virtuali presenti.  :class:`PortSnapshot` enumera una sola volta
+per ciclo (le uscite solo se qualcuno le chiede) e risponde a tutte le
+ricerche per parola chiave dalla memoria.
+"""
+
+import re
+
+import mido
+
+
+class KeywordMatcher:
+    """Trova, per ogni parola chiave, il primo nome di porta che la contiene.
+
+    L'espressione regolare con tutte le parole chiave viene compilata una
+    volta sola e scarta in un passaggio i nomi che non interessano.
+    """
+
+    def __init__(self, keywords):
+        self.keywords = tuple(dict.fromkeys(k for k in keywords if k))
+        self._pattern = (
+            re.compile("|".join(re.escape(k) for k in self.keywords))
+            if self.keywords
+            else None
+        )
+
+    def match(self, names):
+        """Restituisce ``{keyword: primo nome che la contiene}``."""
+        found = {}
+        if self._pattern is None:
+            return found
+        pending = list(self.keywords)
+        search = self._pattern.search
+        for name in names:
+            if not search(name):
+                continue
+            for keyword in list(pending):
+                if keyword in name:
+                    found[keyword] = name
+                    pending.remove(keyword)
+            if not pending:
+                break
+        return found
+
+
+class PortSnapshot:
+    """Elenco delle porte MIDI preso una volta per ciclo di polling.
+
+    ``added`` e ``removed`` riportano le porte di ingresso comparse o sparite
+    rispetto allo snapshot ``previous``.
+    """
+
+    def __init__(
+        self,
+        matcher,
+        previous=None,
+        get_inputs=mido.get_input_names,
+        get_outputs=mido.get_output_names,
+    ):
+        self._matcher = matcher
+        self._get_outputs = get_outputs
+        self.inputs = tuple(get_inputs())
+        self._outputs = None
+        self._found_inputs = matcher.match(self.inputs)
+        self._found_outputs = None
+
+        before = set(previous.inputs) if previous is not None else set()
+        now = set(self.inputs)
+        self.added = tuple(n for n in self.inputs if n not in before)
+        self.removed = tuple(
+            n for n in (previous.inputs if previous is not None else ()) if n not in now
+        )
+
+    @property
+    def outputs(self):
+        if self._outputs is None:
+            self._outputs = tuple(self._get_outputs())
+            self._found_outputs = self._matcher.match(self._outputs)
+        return self._outputs
+
+    @property
+    def changed(self):
+        return bool(self.added or self.removed)
+
+    @staticmethod
+    def _find(names, found, keyword):
+        if not keyword:
+            return None
+        if keyword in found:
+            return found[keyword]
+        # Parola chiave non registrata nel matcher: ricerca lineare, poi cache.
+        for name in names:
+            if keyword in name:
+                found[keyword] = name
+                return name
+        found[keyword] = None
+        return None
+
+    def find_input(self, keyword):
+        return self._find(self.inputs, self._found_inputs, keyword)
+
+    def find_output(self, keyword):
+        outputs = self.outputs
+        return self._find(outputs, self._found_outputs, keyword)
@@ -0,0 +1,186 @@
+"""Notifiche di hotplug delle porte MIDI.
+
+Invece di aspettare il prossimo giro di polling (fino a 1 secondo), un
+watcher segnala subito a :class:`StateManager` che l'elenco delle porte è
+cambiato.  Backend disponibili (``[midi] hotplug`` in ``armonix.conf``):
+
+``alsa``
+    Si iscrive alla porta ``System:Announce`` (0:1) del sequencer ALSA e
+    reagisce agli eventi ``PORT_START``/``PORT_EXIT``/``PORT_CHANGE``.
+    Richiede il pacchetto opzionale ``alsa-midi``.
+``auto``
+    Come ``alsa`` quando disponibile, altrimenti solo polling.
+``poll``
+    Nessun watcher: resta il polling periodico, che rimane comunque attivo
+    come fallback anche con gli altri backend.
+
+:class:`VirtualPortWatcher` è un sostituto locale per i test: crea e
+rimuove porte MIDI virtuali e notifica il callback come farebbe ALSA.
+"""
+
+import logging
+import sys
+import threading
+
+HOTPLUG_BACKENDS = ("auto", "alsa", "poll")
+
+# Gli eventi di una stessa connessione USB (client + porte) arrivano a
+# raffica: si attende questo intervallo per notificarli in un'unica volta.
+COALESCE_WINDOW = 0.02
+
+
+class PortWatcher:
+    """Interfaccia comune dei watcher: ``start(on_change)`` / ``stop()``."""
+
+    name = "none"
+
+    def __init__(self, logger=None):
+        self.logger = logger or logging.getLogger(__name__)
+        self._on_change = None
+
+    def start(self, on_change):
+        self._on_change = on_change
+
+    def stop(self):
+        self._on_change = None
+
+    def _notify(self):
+        callback = self._on_change
+        if callback is None:
+            return
+        try:
+            callback()
+        except Exception:
+            self.logger.exception("Errore nella notifica di hotplug MIDI")
+
+
+class AlsaSeqPortWatcher(PortWatcher):
+    """Watcher basato sugli eventi di annuncio del sequencer ALSA."""
+
+    name = "alsa"
+
+    def __init__(self, logger=None, client_name="armonix-portwatch"):
+        super().__init__(logger)
+        # Import qui: alsa-midi è una dipendenza opzionale e solo Linux.
+        import alsa_midi
+
+        self._alsa = alsa_midi
+        self._client = alsa_midi.SequencerClient(client_name)
+        self._port = self._client.create_port("announce", caps=alsa_midi.WRITE_PORT)
+        self._port.connect_from((0, 1))  # System:Announce
+        self._events = {
+            alsa_midi.EventType.PORT_START,
+            alsa_midi.EventType.PORT_EXIT,
+            alsa_midi.EventType.PORT_CHANGE,
+        }
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self, on_change):
+        super().start(on_change)
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, daemon=True, name="alsa-port-watch"
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        thread = self._thread
+        if thread:
+            thread.join(timeout=1)
+        self._thread = None
+        try:
+            self._client.close()
+        except Exception:
+            pass
+        super().stop()
+
+    def _is_hotplug(self, event):
+        return event is not None and event.type in self._events
+
+    def _run(self):
+        client = self._client
+        while not self._stop_event.is_set():
+            try:
+                event = client.event_input(timeout=0.5)
+            except Exception as exc:
+                if not self._stop_event.is_set():
+                    self.logger.warning("Watcher ALSA: errore (%s), torno al solo polling", exc)
+                return
+            if not self._is_hotplug(event):
+                continue
+            # Raccogli il resto della raffica prima di notificare.
+            while True:
+                try:
+                    extra = client.event_input(timeout=COALESCE_WINDOW)
+                except Exception:
+                    break
+                if extra is None:
+                    break
+            self.logger.debug("Watcher ALSA: elenco porte MIDI cambiato")
+            self._notify()
+
+
+class VirtualPortWatcher(PortWatcher):
+    """Sostituto locale del watcher ALSA per i test.
+
+    :meth:`add_port` apre una porta MIDI virtuale (o registra soltanto il
+    nome se ``open_ports`` è False) e :meth:`remove_port` la chiude; entrambi
+    notificano il callback come un evento di annuncio ALSA.
+    """
+
+    name = "virtual"
+
+    def __init__(self, logger=None, open_ports=True):
+        super().__init__(logger)
+        self.open_ports = open_ports
+        self.ports = {}
+
+    def add_port(self, name, output=False):
+        port = None
+        if self.open_ports:
+            import mido
+
+            opener = mido.open_output if output else mido.open_input
+            port = opener(name, virtual=True)
+        self.ports[name] = port
+        self._notify()
+        return port
+
+    def remove_port(self, name):
+        port = self.ports.pop(name, None)
+        if port is not None:
+            port.close()
+        self._notify()
+
+    def announce(self):
+        """Simula un evento di annuncio senza toccare le porte."""
+        self._notify()
+
+    def stop(self):
+        for name in list(self.ports):
+            port = self.ports.pop(name)
+            if port is not None:
+                port.close()
+        super().stop()
+
+
+def create_port_watcher(backend="auto", logger=None):
+    """Crea il watcher richiesto; None significa "solo polling"."""
+    logger = logger or logging.getLogger(__name__)
+    backend = (backend or "auto").strip().lower()
+    if backend == "poll":
+        return None
+    if backend == "auto" and not sys.platform.startswith("linux"):
+        return None
+    try:
+        return AlsaSeqPortWatcher(logger=logger)
+    except ImportError:
+        if backend == "alsa":
+            logger.warning("Hotplug ALSA richiesto ma il modulo alsa-midi non è installato: uso il polling")
+    except Exception as exc:
+        logger.warning("Impossibile avviare il watcher ALSA (%s): uso il polling", exc)
+    return None
@@ -2,11 +2,16 @@
 
 from __future__ import annotations
 
+import atexit
 import logging
 import os
-from logging.handlers import SysLogHandler
+import queue
+import signal
+import threading
+from logging.handlers import QueueHandler, QueueListener, SysLogHandler
 from typing import Optional
 
+import midi_trace
 from statemanager import StateManager
 
 
@@ -32,25 +37,103 @@ class LoggerWriter:
         """Flush placeholder for compatibility. / Svuota il buffer (se richiesto) per compatibilità."""
 
 
+# Record in attesa prima di iniziare a scartarli (syslog bloccato o lento).
+LOG_QUEUE_SIZE = 10000
+
+
+class BoundedQueueHandler(QueueHandler):
+    """Non-blocking queue handler that counts dropped records. / Handler a coda non bloccante che conta i record scartati.
+
+    The calling thread (often a MIDI listener) only enqueues the record:
+    message formatting and the syslog write happen in the
+    :class:`~logging.handlers.QueueListener` thread.
+    """
+
+    def __init__(self, log_queue: "queue.Queue[logging.LogRecord]") -> None:
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._unreported = 0
+        self._dropped_lock = threading.Lock()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Stesso processo: il record viaggia intatto e viene formattato dal
+        # thread del listener, non da quello MIDI.
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+                self._unreported += 1
+            return
+        if self._unreported:
+            with self._dropped_lock:
+                lost, self._unreported = self._unreported, 0
+            try:
+                self.queue.put_nowait(
+                    logging.makeLogRecord(
+                        {
+                            "name": record.name,
+                            "levelno": logging.WARNING,
+                            "levelname": "WARNING",
+                            "msg": "Logging: %d record scartati (coda piena)",
+                            "args": (lost,),
+                        }
+                    )
+                )
+            except queue.Full:
+                with self._dropped_lock:
+                    self._unreported += lost
+
+
+_log_listener: Optional[QueueListener] = None
+_log_handler: Optional[BoundedQueueHandler] = None
+
+
+def dropped_log_records() -> int:
+    """Records discarded because the log queue was full. / Record scartati per coda piena."""
+
+    return _log_handler.dropped if _log_handler is not None else 0
+
+
+def stop_logging() -> None:
+    """Flush and stop the background log thread. / Svuota e ferma il thread di logging."""
+
+    global _log_listener
+    listener, _log_listener = _log_listener, None
+    if listener is not None:
+        listener.stop()
+
+
 def configure_logging(verbose: bool) -> logging.Logger:
-    """Prepare the root Armonix logger. / Prepara il logger principale di Armonix."""
+    """Prepare the root Armonix logger. / Prepara il logger principale di Armonix.
+
+    Handlers (syslog, console) run in a background thread fed by a bounded
+    queue, so logging never blocks the MIDI threads.
+    """
+
+    global _log_listener, _log_handler
 
     logger = logging.getLogger("armonix")
     logger.setLevel(logging.DEBUG if verbose else logging.INFO)
 
     for handler in list(logger.handlers):
         logger.removeHandler(handler)
+    stop_logging()
 
+    handlers = []
     formatter = logging.Formatter("armonix[%(process)d]: %(message)s")
 
     try:
         syslog_handler = SysLogHandler(address="/dev/log")
         syslog_handler.setFormatter(formatter)
-        logger.addHandler(syslog_handler)
+        handlers.append(syslog_handler)
     except OSError:
         stream_handler = logging.StreamHandler()
         stream_handler.setFormatter(formatter)
-        logger.addHandler(stream_handler)
+        handlers.append(stream_handler)
 
     if verbose:
         console = logging.StreamHandler()
@@ -58,7 +141,13 @@ def configure_logging(verbose: bool) -> logging.Logger:
         console.setFormatter(
             logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
         )
-        logger.addHandler(console)
+        handlers.append(console)
+
+    _log_handler = BoundedQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    _log_listener = QueueListener(_log_handler.queue, *handlers, respect_handler_level=True)
+    _log_listener.start()
+    atexit.register(stop_logging)
+    logger.addHandler(_log_handler)
 
     logger.propagate = False
     return logger
@@ -89,6 +178,11 @@ def create_state_manager(
     enable_midi_io: bool,
     pianoteq_config=None,
     pedals_config=None,
+    listener_mode: Optional[str] = None,
+    hotplug: str = "auto",
+    latency_stats: bool = False,
+    port_polling: bool = True,
+    config_reload: bool = False,
     parent_logger: Optional[logging.Logger] = None,
 ) -> StateManager:
     """Instantiate :class:`StateManager`. / Crea un'istanza di :class:`StateManager`."""
@@ -109,10 +203,41 @@ def create_state_manager(
         enable_midi_io=enable_midi_io,
         pianoteq_config=pianoteq_config,
         pedals_config=pedals_config,
+        listener_mode=listener_mode,
+        hotplug=hotplug,
+        latency_stats=latency_stats,
+        port_polling=port_polling,
+        config_reload=config_reload,
         logger=state_logger,
     )
 
 
+def install_latency_signal(state_manager: StateManager) -> None:
+    """Dump latency stats on SIGUSR1. / Scrive le statistiche di latenza nel log con SIGUSR1."""
+
+    if not hasattr(signal, "SIGUSR1"):
+        return
+    signal.signal(signal.SIGUSR1, lambda _signum, _frame: state_manager.log_latency_report())
+
+
+def install_trace_signal(logger: logging.Logger) -> None:
+    """Dump the MIDI trace on SIGUSR2. / Scrive la traccia MIDI su file con SIGUSR2."""
+
+    if not hasattr(signal, "SIGUSR2"):
+        return
+
+    def _dump(_signum, _frame) -> None:
+        try:
+            path = midi_trace.dump()
+        except OSError as exc:
+            logger.error("Impossibile scrivere la traccia MIDI: %s", exc)
+            return
+        if path:
+            logger.info("Traccia MIDI scritta in %s", path)
+
+    signal.signal(signal.SIGUSR2, _dump)
+
+
 def ensure_session_credentials(logger: logging.Logger, session) -> bool:
     """Drop privileges to match the session user. / Riduce i privilegi per allinearsi all'utente della sessione."""
 
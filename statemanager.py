@@ -1,21 +1,53 @@
-import json
 import logging
 import mido
 import os
-import re
 import sys
 import threading
 import time
 import importlib
 
-try:
-    from PyQt5 import QtCore  # type: ignore
-    QT_AVAILABLE = True
-except ImportError:  # pragma: no cover - PyQt5 is optional
-    QtCore = None
-    QT_AVAILABLE = False
+import config_cache
+import latency
+import midi_recorder
+import midi_trace
+from midi_listener import listen, normalize_listener_mode
+from port_registry import OutputPortRegistry
+from port_snapshot import KeywordMatcher, PortSnapshot
+from port_watch import create_port_watcher
 
-class StateManager(QtCore.QObject if QT_AVAILABLE else object):
+
+def _running_qt_core():
+    """Modulo QtCore se il processo ha una QCoreApplication, altrimenti None.
+
+    PyQt5 non viene importato qui: il motore headless non lo usa.  Se
+    un'applicazione Qt esiste, PyQt5 è già stato importato da chi l'ha creata.
+    """
+    qtcore = sys.modules.get("PyQt5.QtCore")
+    if qtcore is None or qtcore.QCoreApplication.instance() is None:
+        return None
+    return qtcore
+
+
+def _make_poll_bridge(qtcore, callback):
+    """QObject il cui segnale ``requested`` esegue ``callback`` nel thread Qt."""
+
+    class PollBridge(qtcore.QObject):
+        # Emesso dal thread del watcher di hotplug: la connessione in coda
+        # esegue il callback nel thread Qt principale.
+        requested = qtcore.pyqtSignal()
+
+        def __init__(self):
+            super().__init__()
+            self.requested.connect(self._run)
+
+        @qtcore.pyqtSlot()
+        def _run(self):
+            callback()
+
+    return PollBridge()
+
+
+class StateManager:
     def __init__(
         self,
         verbose=False,
@@ -28,9 +60,14 @@ class StateManager(QtCore.QObject if QT_AVAILABLE else object):
         enable_midi_io=True,
         pianoteq_config=None,
         pedals_config=None,
+        listener_mode=None,
+        hotplug="auto",
+        port_watcher=None,
+        latency_stats=False,
+        port_polling=True,
+        config_reload=False,
         logger=None,
     ):
-        super().__init__()
         self.logger = logger or logging.getLogger(__name__)
         self.verbose = verbose
         self.master = master
@@ -44,7 +81,13 @@ class StateManager(QtCore.QObject if QT_AVAILABLE else object):
         self.ketron_port_keyword = ketron_port_keyword or "MIDI Gadget"
         self.ble_port_keyword = ble_port_keyword or "Bluetooth"
         self.midi_io_enabled = enable_midi_io
+        self.listener_mode = normalize_listener_mode(listener_mode)
+        if latency_stats:
+            latency.enable()
         self.ledbar = None
+        # Handle di uscita condivisi (uno per destinazione) usati da tutte
+        # le sorgenti: master, DAW, pedali, BLE e tastierino.
+        self.output_ports = OutputPortRegistry(logger=self.logger)
         self.master_port = None
         self.ketron_port = None
         self.ble_port = None
@@ -66,9 +109,19 @@ class StateManager(QtCore.QObject if QT_AVAILABLE else object):
         self.pianoteq_mode = None         # None | "full" | "full-solo" | "split" | "split-solo"
         self.pianoteq_octave_shift = 0    # semitoni applicati alle note verso Pianoteq (es. -12)
         # Apri subito la porta virtuale "Armonix" così altri software la vedono
-        # anche prima che una modalità Pianoteq venga attivata.
-        if hasattr(self.master_module, "get_pianoteq_virtual_out"):
+        # anche prima che una modalità Pianoteq venga attivata.  Con porte
+        # fisse (riproduzione, test) la porta si apre solo al primo uso.
+        if port_polling and hasattr(self.master_module, "get_pianoteq_virtual_out"):
             self.master_module.get_pianoteq_virtual_out()
+        if (
+            enable_midi_io
+            and port_polling
+            and pianoteq_config
+            and pianoteq_config.enabled
+            and pianoteq_config.prelaunch
+        ):
+            from pianoteq_manager import prelaunch_pianoteq
+            prelaunch_pianoteq(pianoteq_config, self.logger)
 
         # Pedali MIDI
         self.pedals_config = pedals_config
@@ -76,10 +129,22 @@ class StateManager(QtCore.QObject if QT_AVAILABLE else object):
         self.pedal_port = None
         self.pedal_listener = None
         self.pedal_stop_event = threading.Event()
-        self._pedal_ketron_out = None       # porte aperte e cachate per i pedali
-        self._pedal_ketron_out_name = None
         self._pedal_midi_cfg = self._load_pedal_midi_config()
 
+        # Un'unica enumerazione delle porte per ciclo di polling: tutte le
+        # parole chiave (comprese quelle del modulo master) in un matcher.
+        self._port_matcher = KeywordMatcher(
+            [
+                self.master_port_keyword,
+                self.ketron_port_keyword,
+                self.ble_port_keyword,
+                self.pedals_config.port_keyword if self.pedals_config else None,
+                *getattr(self.master_module, "PORT_KEYWORDS", ()),
+            ]
+        )
+        self.port_snapshot = None
+        self._cycle_snapshot = None
+
         # Bluetooth MIDI (LED B)
         self.ble_connected = False
         self.ble_listener_thread = None
@@ -88,16 +153,36 @@ class StateManager(QtCore.QObject if QT_AVAILABLE else object):
         # Avvia il timer/thread di polling DOPO aver inizializzato tutti gli
         # attributi, per evitare AttributeError se il thread parte troppo presto.
         self.timer = None
-        if QT_AVAILABLE and QtCore.QCoreApplication.instance() is not None:
-            self.timer = QtCore.QTimer()
+        self._poll_bridge = None
+        self._poll_wakeup = threading.Event()
+        self._poll_lock = threading.Lock()
+        self.port_watcher = None
+        self.config_watcher = None
+        if not port_polling:
+            # Porte fisse (es. riproduzione di una registrazione): nessun
+            # polling né watcher, poll_ports va chiamato esplicitamente.
+            return
+        qtcore = _running_qt_core()
+        if qtcore is not None:
+            self.timer = qtcore.QTimer()
             self.timer.timeout.connect(self.poll_ports)
             self.timer.start(1000)  # Ogni secondo
+            self._poll_bridge = _make_poll_bridge(qtcore, self.poll_ports)
         else:
             self._polling_thread = threading.Thread(
                 target=self._polling_loop, daemon=True
             )
             self._polling_thread.start()
 
+        # Notifiche di hotplug: il polling resta attivo come fallback.
+        self.port_watcher = port_watcher or create_port_watcher(hotplug, self.logger)
+        if self.port_watcher is not None:
+            self.port_watcher.start(self.request_poll)
+            self.logger.info("Hotplug MIDI: watcher %s attivo", self.port_watcher.name)
+
+        if config_reload and enable_midi_io:
+            self.start_config_watcher()
+
 
     def set_ledbar(self, ledbar):
         self.ledbar = ledbar
@@ -107,9 +192,33 @@ class StateManager(QtCore.QObject if QT_AVAILABLE else object):
     def _polling_loop(self):
         while True:
             self.poll_ports()
-            time.sleep(1)
+            self._poll_wakeup.wait(1)
+            self._poll_wakeup.clear()
+
+    def request_poll(self):
+        """Chiede un giro di poll_ports immediato (es. da un watcher di hotplug)."""
+        if self._poll_bridge is not None:
+            self._poll_bridge.requested.emit()
+        else:
+            self._poll_wakeup.set()
 
     def poll_ports(self):
+        with self._poll_lock:
+            snapshot = PortSnapshot(self._port_matcher, previous=self.port_snapshot)
+            if snapshot.changed and self.port_snapshot is not None and self.verbose:
+                self.logger.debug(
+                    "Porte MIDI aggiunte: %s, rimosse: %s",
+                    list(snapshot.added),
+                    list(snapshot.removed),
+                )
+            self.port_snapshot = snapshot
+            self._cycle_snapshot = snapshot
+            try:
+                self._poll_ports()
+            finally:
+                self._cycle_snapshot = None
+
+    def _poll_ports(self):
         master_port = self.find_port(self.master_port_keyword)
         ketron_port = self.find_port(self.ketron_port_keyword)
         ble_port = self.find_port(self.ble_port_keyword)
@@ -122,6 +231,15 @@ class StateManager(QtCore.QObject if QT_AVAILABLE else object):
                     "TROVATA" if master_port else "NO",
                     "TROVATA" if ketron_port else "NO",
                 )
+            if self.ketron_port and ketron_port != self.ketron_port:
+                # Hotplug: l'handle condiviso verso la vecchia porta va
+                # chiuso e riaperto al prossimo uso.
+                self.output_ports.invalidate(self.ketron_port)
+            if ketron_port and ketron_port != self.ketron_port:
+                # Porta Ketron comparsa: si azzera l'attesa tra i tentativi
+                # e la si apre qui, fuori dal thread MIDI.
+                self.output_ports.invalidate(ketron_port)
+                self.output_ports.get(ketron_port, label="ketron").open()
             self.master_port = master_port
             self.ketron_port = ketron_port
 
@@ -207,21 +325,37 @@ class StateManager(QtCore.QObject if QT_AVAILABLE else object):
         if self.ledbar:
             self.ledbar.update()
 
+    def _current_snapshot(self):
+        # Durante poll_ports si usa lo snapshot del ciclo; fuori dal ciclo
+        # se ne prende uno nuovo per non restituire nomi di porte vecchi.
+        snapshot = self._cycle_snapshot
+        if snapshot is None:
+            snapshot = PortSnapshot(self._port_matcher)
+        return snapshot
+
     def find_port(self, keyword):
         if not keyword:
             return None
-        for port_name in mido.get_input_names():
-            if keyword in port_name:
-                return port_name
-        return None
+        return self._current_snapshot().find_input(keyword)
 
     def find_output_port(self, keyword):
         if not keyword:
             return None
-        for port_name in mido.get_output_names():
-            if keyword in port_name:
-                return port_name
-        return None
+        return self._current_snapshot().find_output(keyword)
+
+    def get_ketron_output(self):
+        """Handle condiviso verso la porta Ketron (None se non collegata)."""
+        return self.output_ports.get(self.ketron_port, label="ketron")
+
+    def latency_report(self):
+        """Statistiche di latenza per percorso/destinazione (vuote se disattivate)."""
+        return latency.report()
+
+    def log_latency_report(self):
+        if not latency.is_enabled():
+            return
+        for line in latency.format_report():
+            self.logger.info("[LATENZA] %s", line)
 
     def get_led_states(self):
         return self.led_states
@@ -292,7 +426,11 @@ class StateManager(QtCore.QObject if QT_AVAILABLE else object):
         return self.pianoteq_mode
 
     def load_pianoteq_preset(self, preset_name):
-        """Carica un preset Pianoteq via JSON-RPC (solo se una modalità Pianoteq è attiva)."""
+        """Carica un preset Pianoteq via JSON-RPC (solo se una modalità Pianoteq è attiva).
+
+        La richiesta è asincrona; se ne arrivano altre prima che Pianoteq
+        risponda, viene caricata solo l'ultima.
+        """
         if not self.pianoteq_mode:
             self.logger.warning("load_pianoteq_preset: nessuna modalità Pianoteq attiva")
             return
@@ -301,10 +439,15 @@ class StateManager(QtCore.QObject if QT_AVAILABLE else object):
             if self.pianoteq_config
             else "http://127.0.0.1:8081/jsonrpc"
         )
-        from pianoteq_rpc import load_preset
-        ok = load_preset(url, preset_name)
-        if ok and hasattr(self.master_module, "show_temp_pianoteq_display"):
-            self.master_module.show_temp_pianoteq_display(preset_name, self.verbose)
+        from pianoteq_rpc import get_client
+
+        def on_loaded(ok, name):
+            if ok and hasattr(self.master_module, "show_temp_pianoteq_display"):
+                self.master_module.show_temp_pianoteq_display(name, self.verbose)
+
+        # Non blocca il listener chiamante: la richiesta parte dal worker
+        # RPC e il display viene aggiornato dalla callback.
+        get_client(url).load_preset_async(preset_name, on_loaded)
 
     def on_keypad_event(self, scancode, keycode, is_down):
         if not self.midi_io_enabled:
@@ -315,8 +458,18 @@ class StateManager(QtCore.QObject if QT_AVAILABLE else object):
             return
         # Qui richiama la tua callback
         from keypad_midi_callback import keypad_midi_callback
-        with mido.open_output(self.ketron_port, exclusive=False) as outport:
+        midi_recorder.record("keypad", (keycode, is_down))
+        midi_trace.begin("keypad", (keycode, is_down))
+        latency.begin("keypad")
+        try:
+            outport = self.get_ketron_output()
             keypad_midi_callback(keycode, is_down, outport, verbose=self.verbose, state_manager=self)
+        except Exception:
+            midi_trace.fail(self.logger)
+            raise
+        finally:
+            latency.end()
+        midi_trace.end()
 
     def start_keypad_listener(self):
         if not self.midi_io_enabled:
@@ -346,21 +499,74 @@ class StateManager(QtCore.QObject if QT_AVAILABLE else object):
 
     # -------- Pedali seriali methods --------
 
+    @staticmethod
+    def _read_pedal_midi_config(path):
+        """Legge e valida pedals_config.json; solleva un'eccezione se non valido."""
+        data = config_cache.read_json(path)
+        if not isinstance(data, dict) or not all(isinstance(v, dict) for v in data.values()):
+            raise ValueError("atteso un oggetto con una voce per pedale")
+        return data
+
     def _load_pedal_midi_config(self):
         """Carica pedals_config.json; ritorna None se non trovato o non valido."""
         from paths import get_config_path
         path = get_config_path("pedals_config.json")
         try:
-            with open(path) as f:
-                raw = f.read()
-            # Rimuovi commenti stile // e # (come nel loader del launchkey)
-            raw = re.sub(r"//.*", "", raw)
-            raw = re.sub(r"#.*", "", raw)
-            return json.loads(raw)
+            return config_cache.load("pedals", path, self._read_pedal_midi_config)
         except Exception as exc:
             self.logger.warning("pedals_config.json non trovato o non valido: %s", exc)
             return None
 
+    def reload_pedal_config(self, path=None):
+        """Ricarica pedals_config.json mantenendo quello attuale se non valido."""
+        from paths import get_config_path
+        path = path or get_config_path("pedals_config.json")
+        try:
+            cfg = config_cache.load("pedals", path, self._read_pedal_midi_config)
+        except Exception as exc:
+            self.logger.error("pedals_config.json non valido, resta quello attuale: %s", exc)
+            return False
+        # Sostituzione in un solo assegnamento: on_pedal_event legge il
+        # dizionario una volta per evento.
+        self._pedal_midi_cfg = cfg
+        listener = self.pedal_listener
+        if listener is not None:
+            listener.set_decimation(self._pedal_decimation_config())
+        self.logger.info("pedals_config.json ricaricato")
+        return True
+
+    # -------- Ricaricamento configurazione --------
+    def start_config_watcher(self):
+        """Osserva i file di configurazione e li ricarica quando cambiano."""
+        if self.config_watcher is not None:
+            return
+        from config_watch import ConfigWatcher
+        from paths import get_config_path
+        import keypad_midi_callback
+
+        watcher = ConfigWatcher(self.logger)
+        master_path = getattr(self.master_module, "CONFIG_PATH", None)
+        master_reload = getattr(self.master_module, "reload_config", None)
+        if master_path and master_reload:
+            watcher.watch(master_path, master_reload)
+        watcher.watch(keypad_midi_callback.CONFIG_PATH, keypad_midi_callback.reload_config)
+        watcher.watch(get_config_path("pedals_config.json"), self.reload_pedal_config)
+        watcher.start()
+        self.config_watcher = watcher
+
+    def stop_config_watcher(self):
+        watcher, self.config_watcher = self.config_watcher, None
+        if watcher is not None:
+            watcher.stop()
+
+    def _pedal_decimation_config(self):
+        """Restituisce ``{pedal_key: {deadband, max_rate, settle_ms}}`` da pedals_config.json."""
+        decimation = {}
+        for pedal_key, cfg in (self._pedal_midi_cfg or {}).items():
+            if isinstance(cfg, dict) and isinstance(cfg.get("decimation"), dict):
+                decimation[pedal_key] = cfg["decimation"]
+        return decimation
+
     def _build_pedal_msgs(self, pedal_key, value, dest):
         """Costruisce la lista di mido.Message o (dest, bytes) SysEx per un pedale.
 
@@ -408,32 +614,37 @@ class StateManager(QtCore.QObject if QT_AVAILABLE else object):
             midi_msgs, sysex_list = self._build_pedal_msgs(pedal_key, value, dest)
             for msg in midi_msgs:
                 port_obj.send(msg)
+                if dest == "pianoteq":
+                    latency.sent("pianoteq")
+                    midi_recorder.record("pianoteq", msg)
+                    midi_trace.sent("pianoteq", msg)
             for data in sysex_list:
-                port_obj.send(mido.Message("sysex", data=data))
-
-        # Ketron: sempre, eccetto in modalità full-solo
-        if self.ketron_port and self.pianoteq_mode != "full-solo":
-            if self._pedal_ketron_out_name != self.ketron_port:
-                if self._pedal_ketron_out:
-                    try:
-                        self._pedal_ketron_out.close()
-                    except Exception:
-                        pass
-                try:
-                    self._pedal_ketron_out = mido.open_output(self.ketron_port, exclusive=False)
-                    self._pedal_ketron_out_name = self.ketron_port
-                except Exception as exc:
-                    self.logger.error("Pedali: impossibile aprire porta Ketron: %s", exc)
-                    self._pedal_ketron_out = None
-                    self._pedal_ketron_out_name = None
-            if self._pedal_ketron_out:
-                _send_to(self._pedal_ketron_out, "evm")
-
-        # Pianoteq: se una modalità è attiva, usa la porta virtuale "Armonix"
-        if self.pianoteq_mode and hasattr(self.master_module, "get_pianoteq_virtual_out"):
-            vport = self.master_module.get_pianoteq_virtual_out()
-            if vport:
-                _send_to(vport, "pianoteq")
+                msg = mido.Message("sysex", data=data)
+                port_obj.send(msg)
+                if dest == "pianoteq":
+                    latency.sent("pianoteq")
+                    midi_recorder.record("pianoteq", msg)
+                    midi_trace.sent("pianoteq", msg)
+
+        midi_recorder.record("pedal", (pedal_key, value))
+        midi_trace.begin("pedal", (pedal_key, value))
+        latency.begin("pedal")
+        try:
+            # Ketron: sempre, eccetto in modalità full-solo
+            if self.ketron_port and self.pianoteq_mode != "full-solo":
+                _send_to(self.get_ketron_output(), "evm")
+
+            # Pianoteq: se una modalità è attiva, usa la porta virtuale "Armonix"
+            if self.pianoteq_mode and hasattr(self.master_module, "get_pianoteq_virtual_out"):
+                vport = self.master_module.get_pianoteq_virtual_out()
+                if vport:
+                    _send_to(vport, "pianoteq")
+        except Exception:
+            midi_trace.fail(self.logger)
+            raise
+        finally:
+            latency.end()
+        midi_trace.end()
 
     def start_pedal_listener(self):
         if not self.midi_io_enabled:
@@ -447,6 +658,7 @@ class StateManager(QtCore.QObject if QT_AVAILABLE else object):
             self.on_pedal_event,
             self.pedal_stop_event,
             verbose=self.verbose,
+            decimation=self._pedal_decimation_config(),
         )
         self.pedal_listener.start()
         if self.verbose:
@@ -470,14 +682,19 @@ class StateManager(QtCore.QObject if QT_AVAILABLE else object):
         def ble_listener():
             import time
             try:
-                with mido.open_input(self.ble_port) as port_in, \
-                     mido.open_output(self.ketron_port, exclusive=False) as port_out:
+                port_out = self.get_ketron_output()
+                with mido.open_input(self.ble_port) as port_in:
                     if self.verbose:
                         self.logger.debug("[BLE] In ascolto sulla porta Bluetooth MIDI.")
                     for msg in port_in:
                         if self.ble_listener_stop.is_set():
                             break
+                        midi_recorder.record("ble", msg)
+                        midi_trace.begin("ble", msg)
+                        latency.begin("ble")
                         port_out.send(msg)
+                        latency.end()
+                        midi_trace.end()
                         if self.verbose:
                             self.logger.debug("[BLE] Ricevuto e inoltrato: %s", msg)
             except Exception as e:
@@ -500,6 +717,9 @@ class StateManager(QtCore.QObject if QT_AVAILABLE else object):
             return  # già attivo
         self.master_listener_stop = threading.Event()
         filter_func = getattr(self.master_module, "filter_and_translate_msg")
+        # Percorso veloce opzionale (listener_mode = raw): byte inoltrati
+        # senza creare mido.Message per il traffico che non va tradotto.
+        raw_filter = getattr(self.master_module, "filter_raw_msg", None)
 
         def master_listener():
             # Capture the stop event locally so that a subsequent
@@ -514,33 +734,121 @@ class StateManager(QtCore.QObject if QT_AVAILABLE else object):
                     self.ketron_port,
                 )
             try:
-                with mido.open_input(self.master_port) as inport, mido.open_output(self.ketron_port, exclusive=False) as outport:
+                outport = self.get_ketron_output()
+                with mido.open_input(self.master_port) as inport:
                     if self.verbose:
-                        self.logger.debug("[MASTER] In ascolto su %s.", self.master)
-                    while not stop.is_set():
-                        for msg in inport.iter_pending():
-                            if stop.is_set():
-                                break
+                        self.logger.debug(
+                            "[MASTER] In ascolto su %s (modalità %s).",
+                            self.master,
+                            self.listener_mode,
+                        )
+
+                    def handle(msg):
+                        midi_recorder.record("master", msg)
+                        midi_trace.begin("master", msg)
+                        latency.begin("master")
+                        try:
+                            if self.verbose:
+                                self.logger.debug("[MASTER-DEBUG] Ricevuto: %s", msg)
+                            filter_func(
+                                msg,
+                                outport,
+                                self,
+                                armonix_enabled=(self.state == "ready"),
+                                state=self.state,
+                                verbose=self.verbose
+                            )
+                        except Exception as err:
+                            self.logger.exception("[MASTER-FILTER] Errore nel filtro: %s", err)
+                            midi_trace.fail(self.logger)
+                        finally:
+                            latency.end()
+                        midi_trace.end()
+
+                    raw_handler = None
+                    if raw_filter is not None:
+                        def raw_handler(data):
+                            midi_trace.begin("master", data)
+                            latency.begin("master")
                             try:
-                                if self.verbose:
-                                    self.logger.debug("[MASTER-DEBUG] Ricevuto: %s", msg)
-                                filter_func(
-                                    msg,
+                                handled = raw_filter(
+                                    data,
                                     outport,
                                     self,
                                     armonix_enabled=(self.state == "ready"),
-                                    state=self.state,
-                                    verbose=self.verbose
+                                    verbose=self.verbose,
                                 )
                             except Exception as err:
-                                self.logger.exception("[MASTER-FILTER] Errore nel filtro: %s", err)
-                        time.sleep(0.001)
+                                self.logger.exception("[MASTER-FILTER] Errore nel filtro raw: %s", err)
+                                midi_trace.fail(self.logger)
+                                handled = True
+                            finally:
+                                latency.end()
+                            # I messaggi rifiutati vengono registrati da handle().
+                            if handled:
+                                midi_recorder.record("master", data)
+                                midi_trace.end()
+                            else:
+                                midi_trace.discard()
+                            return handled
+
+                    listen(inport, handle, stop, self.listener_mode, raw_handler)
             except Exception as e:
                 self.logger.exception("[MASTER] Errore: %s", e)
 
         self.master_listener_thread = threading.Thread(target=master_listener, daemon=True)
         self.master_listener_thread.start()
 
+    # -------- Riproduzione registrazioni --------
+    def replay_input(self, source, data):
+        """Reinietta un ingresso registrato da :mod:`midi_recorder`.
+
+        ``source`` è ``master``, ``daw``, ``pedal``, ``ble`` o ``keypad``;
+        Armonix viene considerato attivo indipendentemente dallo stato delle
+        porte, così la riproduzione funziona anche senza hardware.
+        """
+        if source == "master":
+            latency.begin("master")
+            try:
+                self.master_module.filter_and_translate_msg(
+                    data,
+                    self.get_ketron_output(),
+                    self,
+                    armonix_enabled=True,
+                    state="ready",
+                    verbose=self.verbose,
+                )
+            finally:
+                latency.end()
+        elif source == "daw":
+            daw_filter = getattr(self.master_module, "filter_and_translate_launchkey_daw_msg", None)
+            if daw_filter is None:
+                return
+            daw_out = getattr(self.master_module, "_daw_outport_obj", None)
+            latency.begin("daw")
+            try:
+                daw_filter(data, daw_out or midi_recorder.NullPort(), self, verbose=self.verbose)
+            finally:
+                latency.end()
+        elif source == "pedal":
+            self.on_pedal_event(*data)
+        elif source == "keypad":
+            from keypad_midi_callback import keypad_midi_callback
+            keycode, is_down = data
+            latency.begin("keypad")
+            try:
+                keypad_midi_callback(
+                    keycode, is_down, self.get_ketron_output(), verbose=self.verbose, state_manager=self
+                )
+            finally:
+                latency.end()
+        elif source == "ble":
+            outport = self.get_ketron_output()
+            if outport is not None:
+                latency.begin("ble")
+                outport.send(data)
+                latency.end()
+
     def stop_master_listener(self):
         if hasattr(self, "master_listener_stop") and self.master_listener_stop:
             self.master_listener_stop.set()
@@ -1,11 +1,12 @@
 # sysex_utils.py
 
-import mido
+import functools
 
-def send_sysex_to_ketron(outport, data_bytes):
-    """Invia un messaggio Sysex al Ketron tramite la porta MIDI aperta."""
-    msg = mido.Message("sysex", data=data_bytes)
-    outport.send(msg)
+from mido.frozen import FrozenMessage
+
+from footswitch_lookup import FOOTSWITCH_LOOKUP
+from tabs_lookup import TABS_LOOKUP
+from custom_sysex_lookup import CUSTOM_SYSEX_LOOKUP
 
 def sysex_tabs(tab_value, status):
     """
@@ -38,3 +39,92 @@ def sysex_custom(format_list, param_value):
       return [0x26, 0x7B, 0x25, 0x05, 0x7F]
     """
     return [b if b != "switch" else param_value for b in format_list]
+
+
+# --- Cache dei messaggi precompilati ---------------------------------------
+#
+# I messaggi Sysex dei lookup FOOTSWITCH/TABS/CUSTOM vengono costruiti una
+# sola volta (alla prima richiesta) come ``FrozenMessage`` immutabili, insieme
+# al relativo buffer di byte grezzo (F0 ... F7).  I driver li ottengono per
+# nome senza allocare liste né rivalidare i dati a ogni pressione.
+# Gli altri messaggi costruiti con sysex_message (livelli dei pad, program
+# map del Fantom) passano da una cache LRU limitata: i dati arrivano dai
+# file di configurazione e un ricaricamento non deve farla crescere.
+
+_SYSEX_CACHE_SIZE = 256
+_NAMED_CACHE = None
+
+
+@functools.lru_cache(maxsize=_SYSEX_CACHE_SIZE)
+def _frozen_sysex(key):
+    return FrozenMessage("sysex", data=key)
+
+
+def sysex_message(data_bytes):
+    """Restituisce il messaggio Sysex immutabile (in cache) per ``data_bytes``."""
+    return _frozen_sysex(tuple(data_bytes))
+
+
+def _cache_entry(data_bytes):
+    msg = sysex_message(data_bytes)
+    return msg, bytes(msg.bin())
+
+
+def _build_named_cache():
+    footswitch = {}
+    for name, value in FOOTSWITCH_LOOKUP.items():
+        build = sysex_footswitch_ext if value > 0x7F else sysex_footswitch_std
+        footswitch[name] = (_cache_entry(build(value, 0x7F)), _cache_entry(build(value, 0x00)))
+
+    tabs = {}
+    for name, value in TABS_LOOKUP.items():
+        tabs[name] = (_cache_entry(sysex_tabs(value, 0x7F)), _cache_entry(sysex_tabs(value, 0x00)))
+
+    custom = {}
+    for name, entry in CUSTOM_SYSEX_LOOKUP.items():
+        if "format" not in entry or "switch_map" not in entry:
+            continue
+        custom[name] = {
+            action: _cache_entry(sysex_custom(entry["format"], param))
+            for action, param in entry["switch_map"].items()
+        }
+
+    return {"FOOTSWITCH": footswitch, "TABS": tabs, "CUSTOM": custom}
+
+
+def _named_cache():
+    global _NAMED_CACHE
+    if _NAMED_CACHE is None:
+        _NAMED_CACHE = _build_named_cache()
+    return _NAMED_CACHE
+
+
+def footswitch_sysex(name, pressed=True, raw=False):
+    """
+    Sysex FOOTSWITCH precompilato per ``name`` (None se sconosciuto).
+    Usa il formato esteso per i valori oltre 0x7F, quello standard altrimenti.
+    Con ``raw=True`` restituisce i byte grezzi invece del messaggio.
+    """
+    entry = _named_cache()["FOOTSWITCH"].get(name)
+    if entry is None:
+        return None
+    return entry[0 if pressed else 1][1 if raw else 0]
+
+
+def tabs_sysex(name, pressed=True, raw=False):
+    """Sysex TABS precompilato per ``name`` (None se sconosciuto)."""
+    entry = _named_cache()["TABS"].get(name)
+    if entry is None:
+        return None
+    return entry[0 if pressed else 1][1 if raw else 0]
+
+
+def custom_sysex(name, action, raw=False):
+    """
+    Sysex CUSTOM precompilato per ``name`` e la chiave ``action`` della sua
+    ``switch_map`` (es. "on", "off", "toggle").  None se non definito.
+    """
+    entry = _named_cache()["CUSTOM"].get(name, {}).get(action)
+    if entry is None:
+        return None
+    return entry[1 if raw else 0]
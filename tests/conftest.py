@@ -0,0 +1,10 @@
+"""Configurazione comune dei test pytest."""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# La cache delle configurazioni non deve finire nella home di chi esegue i test.
+os.environ.setdefault("XDG_CACHE_HOME", tempfile.mkdtemp(prefix="armonix-test-cache-"))
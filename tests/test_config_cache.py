@@ -0,0 +1,49 @@
+"""Cache delle configurazioni: invalidazione su file, versione e loader."""
+
+import config_cache
+
+
+def _counting_loader(calls):
+    def loader(path):
+        calls.append(path)
+        return {"calls": len(calls)}
+
+    return loader
+
+
+def test_cache_hit_until_file_changes(tmp_path):
+    path = tmp_path / "pedals_config.json"
+    path.write_text("{}")
+    calls = []
+    loader = _counting_loader(calls)
+    assert config_cache.load("test", str(path), loader) == {"calls": 1}
+    assert config_cache.load("test", str(path), loader) == {"calls": 1}
+
+    path.write_text('{"a": 1}')
+    assert config_cache.load("test", str(path), loader) == {"calls": 2}
+
+
+def test_new_armonix_version_invalidates(tmp_path, monkeypatch):
+    path = tmp_path / "launchkey_config.json"
+    path.write_text("{}")
+    calls = []
+    loader = _counting_loader(calls)
+    config_cache.load("test", str(path), loader)
+
+    monkeypatch.setattr(config_cache, "__version__", "99.0.0")
+    assert config_cache.load("test", str(path), loader) == {"calls": 2}
+
+
+def test_changed_loader_module_invalidates(tmp_path, monkeypatch):
+    path = tmp_path / "keypad_config.json"
+    path.write_text("{}")
+    calls = []
+    loader = _counting_loader(calls)
+    config_cache.load("test", str(path), loader)
+
+    # Stesso file e stessa versione, ma modulo del loader aggiornato.
+    monkeypatch.setitem(
+        config_cache._loader_stamps, loader.__module__, ("loader.py", 1, 1)
+    )
+    assert config_cache.load("test", str(path), loader) == {"calls": 2}
+    assert config_cache.load("test", str(path), loader) == {"calls": 2}
@@ -0,0 +1,41 @@
+"""fantom_config.json: voci senza tipo, cache e ricaricamento."""
+
+import json
+
+import fantom_midi_filter as fantom
+
+
+def _write(path, entries):
+    path.write_text(
+        "// configurazione di prova\n" + json.dumps({"PROGRAM_CHANGE": entries})
+    )
+
+
+def test_entry_without_type_is_not_mapped(tmp_path):
+    cfg = tmp_path / "fantom_config.json"
+    _write(cfg, [
+        {"msb": 0, "lsb": 0, "program": 1},
+        {"msb": 0, "lsb": 0, "program": 2, "type": "PIANOTEQ", "mode": "full"},
+        {"msb": "x", "lsb": 0, "program": 3, "type": "PIANOTEQ", "mode": "full"},
+    ])
+    actions = fantom._load_program_actions(str(cfg))
+    assert list(actions) == [(0, 0, 2)]
+
+
+def test_reload_swaps_actions_and_keeps_them_on_error(tmp_path, monkeypatch):
+    cfg = tmp_path / "fantom_config.json"
+    _write(cfg, [{"msb": 0, "lsb": 0, "program": 5, "type": "PIANOTEQ", "mode": "full"}])
+    monkeypatch.setattr(fantom, "_PROGRAM_ACTIONS", {})
+    assert fantom.reload_config(str(cfg))
+    assert list(fantom.program_change_mapping()) == [(0, 0, 5)]
+
+    cfg.write_text("{ non valido")
+    assert not fantom.reload_config(str(cfg))
+    assert list(fantom.program_change_mapping()) == [(0, 0, 5)]
+
+
+def test_key_pressed_reports_unmapped_entry(tmp_path, monkeypatch):
+    cfg = tmp_path / "fantom_config.json"
+    _write(cfg, [{"msb": 0, "lsb": 0, "program": 1}])
+    monkeypatch.setattr(fantom, "_PROGRAM_ACTIONS", fantom._load_program_actions(str(cfg)))
+    assert not fantom.key_pressed((0, 0, 1), None, None, verbose=False)
@@ -0,0 +1,150 @@
+"""Latenza misurata dall'istante di consegna di rtmidi (midi_listener + latency)."""
+
+import threading
+import time
+
+import mido
+import pytest
+
+import latency
+from midi_listener import listen
+
+
+class FakeRtMidiIn:
+    def __init__(self):
+        self.callback = None
+
+    def cancel_callback(self):
+        self.callback = None
+
+    def set_callback(self, func):
+        self.callback = func
+
+    def deliver(self, data):
+        """Simula il thread di rtmidi che consegna un messaggio."""
+        self.callback((list(data), 0.0), None)
+
+
+class FakeInput:
+    name = "Fake In"
+
+    def __init__(self):
+        self._rt = FakeRtMidiIn()
+        self._callback = None
+
+    @property
+    def callback(self):
+        return self._callback
+
+    @callback.setter
+    def callback(self, func):
+        self._callback = func
+
+    def iter_pending(self):
+        return iter(())
+
+
+@pytest.fixture
+def stats():
+    latency.disable()
+    yield latency.enable()
+    latency.disable()
+
+
+def _run_listener(inport, handler, mode, raw_handler=None):
+    stop = threading.Event()
+    thread = threading.Thread(
+        target=listen, args=(inport, handler, stop, mode, raw_handler), daemon=True
+    )
+    thread.start()
+    # In modalità callback mido consegna tramite inport.callback, altrimenti
+    # la callback installata è direttamente quella di rtmidi.
+    target = inport if mode == "callback" else inport._rt
+    deadline = time.monotonic() + 1.0
+    while target.callback is None and time.monotonic() < deadline:
+        time.sleep(0.001)
+    return stop, thread
+
+
+def _filter(delay):
+    def handle(msg):
+        latency.begin("master")
+        time.sleep(delay)
+        latency.sent("ketron")
+        latency.end()
+    return handle
+
+
+def test_poll_mode_counts_queueing_delay(stats):
+    inport = FakeInput()
+    started = threading.Event()
+    first = [True]
+
+    def handle(msg):
+        latency.begin("master")
+        if first[0]:
+            first[0] = False
+            started.set()
+            time.sleep(0.03)  # filtro lento: il secondo messaggio resta in coda
+        latency.sent("ketron")
+        latency.end()
+
+    stop, thread = _run_listener(inport, handle, "poll")
+    inport._rt.deliver([0x90, 60, 100])
+    assert started.wait(1.0)
+    inport._rt.deliver([0x80, 60, 0])
+    time.sleep(0.1)
+    stop.set()
+    thread.join(1.0)
+
+    summary = stats.report()["master -> ketron"]
+    assert summary["count"] == 2
+    # Entrambi includono i 30 ms: il primo nel filtro, il secondo in coda.
+    assert summary["p50_us"] >= 20000
+
+
+def test_raw_mode_stamps_before_raw_handler(stats):
+    inport = FakeInput()
+
+    def raw_handler(data):
+        latency.begin("master")
+        latency.sent("ketron")
+        latency.end()
+        return data[0] & 0xF0 == 0x90
+
+    decoded = []
+
+    def handle(msg):
+        decoded.append(msg)
+        _filter(0.0)(msg)
+
+    stop, thread = _run_listener(inport, handle, "raw", raw_handler)
+    inport._rt.deliver([0x90, 60, 100])
+    inport._rt.deliver([0xB0, 64, 127])
+    stop.set()
+    thread.join(1.0)
+
+    assert [m.type for m in decoded] == ["control_change"]
+    assert stats.report()["master -> ketron"]["count"] == 3
+    assert getattr(latency._local, "arrival", None) is None
+
+
+def test_begin_without_arrival_measures_filter_only(stats):
+    latency.arrived(None)
+    latency.begin("pedal")
+    latency.sent("ketron")
+    latency.end()
+    assert stats.report()["pedal -> ketron"]["max_us"] < 10000
+
+
+def test_disabled_stats_skip_stamping():
+    latency.disable()
+    assert latency.now() is None
+    inport = FakeInput()
+    seen = []
+    stop, thread = _run_listener(inport, seen.append, "callback")
+    inport.callback(mido.Message("note_on", note=60))
+    stop.set()
+    thread.join(1.0)
+    assert len(seen) == 1
+    assert latency.report() == {}
@@ -0,0 +1,98 @@
+"""Registrazione e riproduzione --dry-run senza porte MIDI reali."""
+
+import mido
+
+import launchkey_midi_filter
+import midi_recorder
+
+
+def test_dry_run_replay_opens_no_midi_port(tmp_path, monkeypatch, capsys):
+    path = str(tmp_path / "session.armrec")
+    midi_recorder.start_recording(path)
+    midi_recorder.record("master", mido.Message("note_on", note=60, velocity=100))
+    midi_recorder.record("master", mido.Message("note_off", note=60))
+    midi_recorder.record("ble", mido.Message("control_change", control=64, value=127))
+    midi_recorder.stop_recording()
+
+    opened = []
+
+    def no_real_ports(*args, **kwargs):
+        opened.append((args, kwargs))
+        raise AssertionError("porta MIDI reale aperta durante --dry-run")
+
+    # Ripristinata a fine test: --dry-run vi installa la porta finta.
+    monkeypatch.setattr(launchkey_midi_filter, "_armonix_virtual_out", None)
+    monkeypatch.setattr(mido, "open_output", no_real_ports)
+    monkeypatch.setattr(mido, "open_input", no_real_ports)
+
+    status = midi_recorder.main(
+        ["replay", path, "--dry-run", "--speed", "0", "--master", "launchkey"]
+    )
+    out = capsys.readouterr().out
+    assert status == 0
+    assert opened == []
+    assert "Riprodotti 3 eventi" in out
+    assert "Messaggi in uscita: 3" in out
+
+
+def _record_session(path, notes, monkeypatch, wall):
+    monkeypatch.setattr(midi_recorder.time, "time", lambda: wall)
+    recorder = midi_recorder.start_recording(path)
+    assert recorder is not None
+    for note in notes:
+        midi_recorder.record("master", mido.Message("note_on", note=note))
+    midi_recorder.stop_recording()
+
+
+def test_appending_sessions_keeps_times_monotonic(tmp_path, monkeypatch, capsys):
+    path = str(tmp_path / "session.armrec")
+    _record_session(path, [60, 61, 62], monkeypatch, wall=1000.0)
+    _record_session(path, [70, 71], monkeypatch, wall=1600.0)
+    # Orologio di sistema tornato indietro tra i due avvii.
+    _record_session(path, [80], monkeypatch, wall=500.0)
+
+    events = midi_recorder.read_session(path)
+    assert [ev.data.note for ev in events] == [60, 61, 62, 70, 71, 80]
+    assert [ev.session for ev in events] == [0, 0, 0, 1, 1, 2]
+    times = [ev.time for ev in events]
+    assert times == sorted(times)
+    assert times[3] >= 600.0
+    assert times[5] >= times[4]
+
+    assert midi_recorder.main(["info", path]) == 0
+    assert "6 eventi" in capsys.readouterr().out
+
+
+def test_append_after_truncated_record_keeps_new_events(tmp_path, monkeypatch):
+    path = str(tmp_path / "session.armrec")
+    _record_session(path, [60, 61], monkeypatch, wall=1000.0)
+    # Spegnimento durante la scrittura: l'ultimo record resta a metà.
+    with open(path, "rb+") as f:
+        f.truncate(len(f.read()) - 2)
+    _record_session(path, [70, 71], monkeypatch, wall=1010.0)
+
+    events = midi_recorder.read_session(path)
+    assert [ev.data.note for ev in events] == [60, 70, 71]
+    assert [ev.session for ev in events] == [0, 1, 1]
+
+
+def test_read_resyncs_on_next_session_header(tmp_path, monkeypatch):
+    path = str(tmp_path / "session.armrec")
+    _record_session(path, [60], monkeypatch, wall=1000.0)
+    # Record troncato scritto da una versione senza controllo della coda.
+    with open(path, "ab") as f:
+        f.write(midi_recorder._RECORD.pack(0.5, 1, 3) + b"\x90")
+        f.write(midi_recorder.MAGIC + bytes([midi_recorder.VERSION]))
+        f.write(midi_recorder._HEADER.pack(1005.0))
+        f.write(midi_recorder._RECORD.pack(0.1, 1, 3) + bytes([0x90, 72, 64]))
+
+    events = midi_recorder.read_session(path)
+    assert [ev.data.note for ev in events] == [60, 72]
+
+
+def test_foreign_file_is_not_appended(tmp_path):
+    path = tmp_path / "notes.txt"
+    path.write_bytes(b"non una registrazione")
+    assert midi_recorder.start_recording(str(path)) is None
+    assert not midi_recorder.is_recording()
+    assert path.read_bytes() == b"non una registrazione"
@@ -0,0 +1,55 @@
+"""Decimazione dei pedali: cambio di configurazione senza perdere il valore trattenuto."""
+
+import threading
+
+from pedal_listener import PedalDecimator, PedalListener
+
+
+def _listener(decimation):
+    sent = []
+    listener = PedalListener(
+        "Pedali", lambda key, value: sent.append((key, value)), threading.Event(),
+        decimation=decimation,
+    )
+    return listener, sent
+
+
+def test_reload_keeps_pending_value():
+    listener, sent = _listener({"right": {"deadband": 10, "settle_ms": 30}})
+    listener._emit_decimated({"right": 60}, now=0.0)
+    listener._emit_decimated({"right": 64}, now=0.01)  # dentro la banda morta
+    assert sent == [("right", 60)]
+
+    listener.set_decimation({"right": {"deadband": 20, "settle_ms": 30}})
+    listener._apply_decimation()
+    decimator = listener.decimators["right"]
+    assert decimator.deadband == 20
+    assert (decimator.last_value, decimator.pending) == (60, 64)
+
+    # Il pedale si ferma: il valore finale arriva comunque.
+    listener._emit_decimated({}, now=0.1)
+    assert sent == [("right", 60), ("right", 64)]
+
+
+def test_pedal_no_longer_decimated_flushes_pending():
+    listener, sent = _listener({"right": {"deadband": 10}})
+    listener._emit_decimated({"right": 60}, now=0.0)
+    listener._emit_decimated({"right": 65}, now=0.01)
+
+    listener.set_decimation({})
+    listener._apply_decimation()
+    assert listener.decimators == {}
+    assert sent == [("right", 60), ("right", 65)]
+
+
+def test_apply_without_pending_change_is_noop():
+    listener, _sent = _listener({"right": {"deadband": 10}})
+    before = listener.decimators
+    listener._apply_decimation()
+    assert listener.decimators is before
+
+
+def test_carry_over_from_nothing_keeps_defaults():
+    decimator = PedalDecimator(deadband=5)
+    decimator.carry_over(None)
+    assert decimator.last_value is None and decimator.pending is None
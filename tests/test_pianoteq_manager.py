@@ -0,0 +1,61 @@
+"""PianoteqSupervisor: indirizzo di --serve e richieste trattenute all'avvio."""
+
+import logging
+import subprocess
+import sys
+import types
+
+import pytest
+
+import pianoteq_manager
+from pianoteq_manager import PianoteqSupervisor, serve_address
+from pianoteq_rpc import get_client
+
+
+def test_serve_address_follows_jsonrpc_url():
+    assert serve_address("http://127.0.0.1:8081/jsonrpc") == "127.0.0.1:8081"
+    assert serve_address("http://localhost:9000/jsonrpc") == "localhost:9000"
+
+
+@pytest.fixture
+def sleeper():
+    proc = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+    yield proc
+    proc.kill()
+    proc.wait()
+
+
+def _supervisor(url):
+    config = types.SimpleNamespace(executable="pianoteq", options="", jsonrpc_url=url)
+    return PianoteqSupervisor(config, logging.getLogger("test"))
+
+
+def test_external_pianoteq_does_not_hold_requests(sleeper, monkeypatch):
+    url = "http://127.0.0.1:9/external"
+    sup = _supervisor(url)
+    monkeypatch.setattr(sup, "_find_existing", lambda: sleeper.pid)
+    assert sup.ensure_running()
+    assert not get_client(url).held
+
+
+def test_own_launch_holds_until_probe_ends(sleeper, monkeypatch):
+    url = "http://127.0.0.1:9/own"
+    sup = _supervisor(url)
+    monkeypatch.setattr(sup, "_find_existing", lambda: None)
+    launched = []
+
+    def fake_launch():
+        launched.append(serve_address(url))
+        sup._track(sleeper.pid, sleeper)
+        return True
+
+    monkeypatch.setattr(sup, "_launch", fake_launch)
+    monkeypatch.setattr(pianoteq_manager, "RPC_PROBE_MAX_INTERVAL", 0.05)
+    assert sup.ensure_running()
+    assert launched == ["127.0.0.1:9"]
+    assert get_client(url).held
+
+    # Processo terminato: la sonda si ferma e rilascia le richieste.
+    sleeper.kill()
+    sup._probe_thread.join(2.0)
+    assert not get_client(url).held
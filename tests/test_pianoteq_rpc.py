@@ -0,0 +1,179 @@
+"""Client JSON-RPC di Pianoteq contro StubPianoteqServer."""
+
+import threading
+import time
+import types
+
+import pytest
+
+from pianoteq_rpc import PianoteqRpcClient, RpcError
+from pianoteq_rpc_stub import StubPianoteqServer
+from statemanager import StateManager
+
+PRESETS = ("Preset A", "Preset B", "Preset C", "Preset D")
+
+
+@pytest.fixture
+def server():
+    with StubPianoteqServer(presets=PRESETS) as stub:
+        yield stub
+
+
+@pytest.fixture
+def client(server):
+    rpc = PianoteqRpcClient(server.url, timeout=2.0)
+    yield rpc
+    rpc.close()
+
+
+class Results:
+    """Raccoglie le callback del worker e permette di attenderle."""
+
+    def __init__(self):
+        self.items = []
+        self._cond = threading.Condition()
+
+    def __call__(self, ok, result):
+        with self._cond:
+            self.items.append((ok, result))
+            self._cond.notify_all()
+
+    def wait(self, count, timeout=2.0):
+        with self._cond:
+            return self._cond.wait_for(lambda: len(self.items) >= count, timeout)
+
+
+def test_persistent_connection_is_reused(server, client):
+    for name in PRESETS:
+        assert client.load_preset(name)
+    assert client.call("getInfo") == [{"current_preset": {"name": PRESETS[-1]}}]
+    assert len(server.connections) == 1
+    assert [method for method, _ in server.requests] == ["loadPreset"] * 4 + ["getInfo"]
+
+
+def test_retries_once_after_dropped_connection(server, client):
+    assert client.load_preset("Preset A")
+    server.drop_connections()
+    assert client.load_preset("Preset B")
+    assert server.current_preset == "Preset B"
+    assert len(server.connections) == 2
+
+
+def test_unreachable_server_raises_after_retry(server, client):
+    assert client.load_preset("Preset A")
+    server.stop()
+    with pytest.raises(RpcError):
+        client.call("getInfo")
+
+
+def test_rpc_error_is_reported(client):
+    assert not client.load_preset("Inesistente")
+    with pytest.raises(RpcError):
+        client.call("methodThatDoesNotExist")
+
+
+def test_queued_preset_is_replaced_by_newer_one(server, client):
+    results = Results()
+    client.hold()
+    for name in PRESETS:
+        client.load_preset_async(name, results)
+    client.set_parameters_async([{"id": "Volume", "text": "-6 dB"}], results)
+    client.set_parameters_async([{"id": "Volume", "text": "-3 dB"}], results)
+    assert server.requests == []
+
+    client.release()
+    assert results.wait(2)
+    # Una richiesta sostituita mantiene il suo posto nella coda.
+    assert results.items == [(True, PRESETS[-1]), (True, None)]
+    assert server.requests == [
+        ("loadPreset", [PRESETS[-1]]),
+        ("setParameters", {"list": [{"id": "Volume", "text": "-3 dB"}]}),
+    ]
+    assert server.current_preset == PRESETS[-1]
+
+
+def test_hold_keeps_requests_until_release(server, client):
+    results = Results()
+    client.hold()
+    assert client.held
+    client.load_preset_async("Preset C", results)
+    assert not results.wait(1, timeout=0.3)
+    assert server.requests == []
+
+    client.release()
+    assert not client.held
+    assert results.wait(1)
+    assert results.items == [(True, "Preset C")]
+
+
+def test_slow_preset_load_keeps_only_latest():
+    slow = StubPianoteqServer(presets=PRESETS, delay=0.3).start()
+    rpc = PianoteqRpcClient(slow.url, timeout=2.0)
+    results = Results()
+    try:
+        rpc.load_preset_async(PRESETS[0], results)
+        deadline = time.monotonic() + 1.0
+        while not slow.requests and time.monotonic() < deadline:
+            time.sleep(0.01)
+        # I successivi arrivano mentre Pianoteq carica il primo.
+        for name in PRESETS[1:]:
+            rpc.load_preset_async(name, results)
+        assert results.wait(2)
+        assert [name for _, name in results.items] == [PRESETS[0], PRESETS[-1]]
+        assert [params for _, params in slow.requests] == [[PRESETS[0]], [PRESETS[-1]]]
+    finally:
+        rpc.close()
+        slow.stop()
+
+
+def test_loaded_preset_drives_temp_display(server):
+    shown = Results()
+    master = types.SimpleNamespace(
+        show_temp_pianoteq_display=lambda name, verbose: shown(True, name)
+    )
+    sm = StateManager(
+        master="fantom",
+        enable_midi_io=False,
+        port_polling=False,
+        pianoteq_config=types.SimpleNamespace(
+            enabled=False, prelaunch=False, jsonrpc_url=server.url
+        ),
+    )
+    sm.master_module = master
+    sm.pianoteq_mode = "full"
+
+    sm.load_pianoteq_preset("Preset B")
+    assert shown.wait(1)
+    assert shown.items == [(True, "Preset B")]
+
+    # Preset rifiutato: nessun aggiornamento del display.
+    sm.load_pianoteq_preset("Inesistente")
+    sm.load_pianoteq_preset("Preset D")
+    assert shown.wait(2)
+    assert shown.items[-1] == (True, "Preset D")
+    assert (True, "Inesistente") not in shown.items
+
+
+def test_launchkey_temp_display_shows_preset_name():
+    import launchkey_midi_filter as lk
+
+    class Port:
+        def __init__(self):
+            self.sent = []
+            self.event = threading.Event()
+
+        def send(self, msg):
+            self.sent.append(msg)
+            self.event.set()
+
+    port = Port()
+    previous = lk._daw_outport_obj
+    lk._daw_outport_obj = port
+    try:
+        lk.show_temp_pianoteq_display("Preset B")
+        assert port.event.wait(1.0)
+        text = b"".join(bytes(msg.data) for msg in port.sent if msg.type == "sysex")
+        assert b"Preset B" in text
+    finally:
+        lk._daw_outport_obj = previous
+        lk._display.reset(None)
@@ -0,0 +1,72 @@
+"""Registro delle porte di uscita: apertura pigra e attesa tra i tentativi."""
+
+import logging
+
+import mido
+import pytest
+
+import port_registry
+from port_registry import OutputPortRegistry
+
+
+class FakeOutput:
+    def __init__(self):
+        self.sent = []
+
+    def send(self, msg):
+        self.sent.append(msg)
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def opener(monkeypatch):
+    state = {"calls": 0, "available": False, "now": 100.0, "port": FakeOutput()}
+
+    def open_output(name, exclusive=False):
+        state["calls"] += 1
+        if not state["available"]:
+            raise OSError("porta assente")
+        return state["port"]
+
+    monkeypatch.setattr(mido, "open_output", open_output)
+    monkeypatch.setattr(port_registry.time, "monotonic", lambda: state["now"])
+    return state
+
+
+def test_get_does_not_open(opener):
+    registry = OutputPortRegistry(logging.getLogger("test"))
+    handle = registry.get("KETRON EVENT", label="ketron")
+    assert registry.get("KETRON EVENT") is handle
+    assert opener["calls"] == 0
+    assert not handle.is_open
+
+
+def test_failed_open_backs_off_until_interval(opener):
+    handle = OutputPortRegistry(logging.getLogger("test")).get("KETRON EVENT")
+    msg = mido.Message("note_on", note=60)
+    for _ in range(50):
+        handle.send(msg)
+        handle.send_bytes(bytes([0x90, 60, 64]))
+    assert opener["calls"] == 1
+
+    opener["available"] = True
+    opener["now"] += handle.retry_interval
+    handle.send(msg)
+    assert opener["calls"] == 2
+    assert opener["port"].sent == [msg]
+
+
+def test_invalidate_retries_immediately(opener):
+    registry = OutputPortRegistry(logging.getLogger("test"))
+    handle = registry.get("KETRON EVENT")
+    handle.send(mido.Message("note_on", note=60))
+    assert opener["calls"] == 1
+
+    # La scansione hotplug ritrova la porta.
+    opener["available"] = True
+    registry.invalidate("KETRON EVENT")
+    handle.send(mido.Message("note_on", note=61))
+    assert opener["calls"] == 2
+    assert len(opener["port"].sent) == 1
@@ -0,0 +1,123 @@
+"""Notifiche di hotplug: VirtualPortWatcher -> StateManager.request_poll."""
+
+import logging
+import threading
+import time
+
+import pytest
+
+import port_watch
+from port_watch import VirtualPortWatcher, create_port_watcher
+from statemanager import StateManager
+
+
+class CountingStateManager(StateManager):
+    """StateManager che conta i giri di poll_ports senza toccare le porte reali."""
+
+    def __init__(self, **kwargs):
+        self.polls = 0
+        self.polled = threading.Condition()
+        super().__init__(
+            master="fantom",
+            enable_midi_io=False,
+            hotplug="poll",
+            config_reload=False,
+            **kwargs,
+        )
+
+    def poll_ports(self):
+        with self.polled:
+            self.polls += 1
+            self.polled.notify_all()
+
+    def wait_polls(self, count, timeout):
+        with self.polled:
+            return self.polled.wait_for(lambda: self.polls >= count, timeout)
+
+
+def _started(watcher):
+    sm = CountingStateManager(port_watcher=watcher)
+    # Primo giro del thread di polling, subito all'avvio.
+    assert sm.wait_polls(1, timeout=1.0)
+    return sm
+
+
+def test_announce_triggers_immediate_poll():
+    watcher = VirtualPortWatcher(open_ports=False)
+    sm = _started(watcher)
+    assert sm.port_watcher is watcher
+
+    start = time.monotonic()
+    watcher.add_port("Launchkey MK3 88 LKMK3 MIDI In")
+    # Senza il watcher il prossimo giro arriverebbe dopo 1 s.
+    assert sm.wait_polls(2, timeout=0.5)
+    assert time.monotonic() - start < 0.5
+    assert "Launchkey MK3 88 LKMK3 MIDI In" in watcher.ports
+
+    watcher.remove_port("Launchkey MK3 88 LKMK3 MIDI In")
+    assert sm.wait_polls(3, timeout=0.5)
+    assert watcher.ports == {}
+    watcher.stop()
+
+
+def test_virtual_port_is_visible_to_the_snapshot():
+    mido = pytest.importorskip("mido")
+    pytest.importorskip("rtmidi")
+    watcher = VirtualPortWatcher()
+    sm = _started(watcher)
+    watcher.add_port("Armonix Test Pedal", output=True)
+    assert sm.wait_polls(2, timeout=0.5)
+    assert any("Armonix Test Pedal" in name for name in mido.get_input_names())
+    watcher.stop()
+    assert watcher.ports == {}
+
+
+def test_burst_of_announces_is_coalesced():
+    watcher = VirtualPortWatcher(open_ports=False)
+    sm = _started(watcher)
+    before = sm.polls
+    # Raffica di eventi (client + porte di un dispositivo USB).
+    for _ in range(10):
+        watcher.announce()
+    assert sm.wait_polls(before + 1, timeout=0.5)
+    time.sleep(0.2)
+    # L'evento di risveglio è uno solo: al più un giro extra per la raffica.
+    assert sm.polls - before <= 2
+    watcher.stop()
+
+
+def test_polling_continues_without_watcher():
+    sm = CountingStateManager(port_watcher=None)
+    assert sm.port_watcher is None
+    assert sm.wait_polls(2, timeout=2.5)
+
+
+def test_stopped_watcher_no_longer_notifies():
+    watcher = VirtualPortWatcher(open_ports=False)
+    sm = _started(watcher)
+    watcher.stop()
+    before = sm.polls
+    watcher.announce()
+    assert not sm.wait_polls(before + 1, timeout=0.3)
+
+
+def test_create_port_watcher_falls_back_to_polling(monkeypatch, caplog):
+    assert create_port_watcher("poll") is None
+
+    def missing_alsa(logger=None):
+        raise ImportError("alsa_midi")
+
+    monkeypatch.setattr(port_watch, "AlsaSeqPortWatcher", missing_alsa)
+    monkeypatch.setattr(port_watch.sys, "platform", "linux")
+    with caplog.at_level(logging.WARNING):
+        assert create_port_watcher("alsa") is None
+    assert "alsa-midi" in caplog.text
+
+    def broken_alsa(logger=None):
+        raise OSError("sequencer non disponibile")
+
+    monkeypatch.setattr(port_watch, "AlsaSeqPortWatcher", broken_alsa)
+    assert create_port_watcher("auto") is None
+
+    monkeypatch.setattr(port_watch.sys, "platform", "darwin")
+    assert create_port_watcher("auto") is None